@@ -1,17 +1,42 @@
 from __future__ import annotations
 
+import mmap
+import os
+import re
+import stat
+import string
 import sys
+import threading
+import wsgiref.util
 from base64 import b64decode, b64encode
 from collections import defaultdict
-from collections.abc import Callable, Iterable, Sequence
-from io import BytesIO
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from http.client import responses
+from io import SEEK_END, BytesIO
+from tempfile import SpooledTemporaryFile
+from time import monotonic, perf_counter_ns
 from types import TracebackType
-from typing import Any
-from urllib.parse import unquote, urlencode
+from typing import TYPE_CHECKING, Any, BinaryIO, Literal, NamedTuple, TypeVar, cast
+from urllib.parse import quote_plus, unquote, urlencode
 
-from apig_wsgi.compat import WSGIApplication
+from apig_wsgi import logs
+from apig_wsgi.compat import LambdaHandler, WSGIApplication
+from apig_wsgi.middleware import compose as compose_middleware
+from apig_wsgi.profiling import Profiler
+from apig_wsgi.routing import Router
 
-__all__ = ("make_lambda_handler",)
+if TYPE_CHECKING:
+    from apig_wsgi.coalescing import Coalescer
+    from apig_wsgi.errors import ErrorBoundary
+    from apig_wsgi.limits import RequestLimits
+    from apig_wsgi.memory import MemoryWatchdog
+    from apig_wsgi.middleware import Middleware
+    from apig_wsgi.recording import EventRecorder
+    from apig_wsgi.static import StaticFiles
+
+__all__ = ("EventAdapter", "Timing", "make_lambda_handler")
 
 DEFAULT_NON_BINARY_CONTENT_TYPE_PREFIXES: tuple[str, ...] = (
     "text/",
@@ -26,6 +51,16 @@ DEFAULT_NON_BINARY_CONTENT_TYPE_PREFIXES: tuple[str, ...] = (
 
 RESERVED_URI_CHARACTERS = r"!#$&'()*+,/:;=?@[]%"
 
+# Chunk sizes for spooled bodies, multiples of 4 and 3 so that base64 chunks
+# can be decoded or encoded independently.
+BASE64_DECODE_CHUNK_SIZE = 4 * 64 * 1024
+BASE64_ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+TEXT_ENCODE_CHUNK_SIZE = 64 * 1024
+
+TIMEOUT_BODY = b"Gateway Timeout"
+
+RetainFullEvent = Literal["full", "without_body", "none"]
+
 _ExcInfoType = (
     tuple[type[BaseException], BaseException, TracebackType]
     | tuple[None, None, None]
@@ -34,95 +69,430 @@ _ExcInfoType = (
 
 
 def make_lambda_handler(
-    wsgi_app: WSGIApplication,
+    wsgi_app: WSGIApplication | Mapping[str, WSGIApplication],
     binary_support: bool | None = None,
     non_binary_content_type_prefixes: Iterable[str] | None = None,
-) -> Callable[[dict[str, Any], Any], dict[str, Any]]:
+    *,
+    on_timing: Callable[[Timing], object] | None = None,
+    server_timing: bool = False,
+    deadline_margin_ms: int | None = None,
+    strip_stage: bool = False,
+    static_files: StaticFiles | None = None,
+    retain_full_event: RetainFullEvent = "full",
+    spool_max_size: int | None = None,
+    adapters: Mapping[str, EventAdapter] | None = None,
+    recorder: EventRecorder | None = None,
+    buffer_errors: logs.BufferErrors | None = None,
+    coalesce: Coalescer | None = None,
+    middleware: Sequence[Middleware] = (),
+    limits: RequestLimits | None = None,
+    error_boundary: ErrorBoundary | None = None,
+    memory_watchdog: MemoryWatchdog | None = None,
+) -> LambdaHandler:
     """
     Turn a WSGI app callable into a Lambda handler function suitable for
     running on API Gateway.
 
     Parameters
     ----------
-    wsgi_app : function
-        WSGI Application callable
+    wsgi_app : function or dict
+        WSGI Application callable, or a mapping of path prefixes and/or
+        hostnames to WSGI Application callables
     binary_support : bool
         Whether to support returning APIG-compatible binary responses
     non_binary_content_type_prefixes : tuple of str
         Tuple of content type prefixes which should be considered "Non-Binary" when
         `binary_support` is True. This prevents apig_wsgi from unexpectedly encoding
         non-binary responses as binary.
+    on_timing : function
+        Optional callback, called with a `Timing` instance after each
+        invocation, reporting how long each phase of the handler took.
+    server_timing : bool
+        Whether to add a `Server-Timing` header to responses, reporting the
+        handler's phase durations.
+    deadline_margin_ms : int
+        If set, stop consuming the app's response and return a 504 once the
+        invocation's remaining time falls below this many milliseconds.
+    strip_stage : bool
+        Whether to move any API Gateway stage or custom domain base path
+        prefix from PATH_INFO to SCRIPT_NAME.
+    static_files : StaticFiles
+        Files to serve from memory, without calling the WSGI app.
+    retain_full_event : str
+        How much of the event to keep in the environ at
+        `apig_wsgi.full_event`: "full", "without_body", or "none". The lighter
+        modes remove the body from the event once it has been decoded.
+    spool_max_size : int
+        If set, request and response bodies larger than this many bytes are
+        spooled to temporary files rather than held in memory.
+    adapters : dict
+        Extra `EventAdapter` instances, keyed on the event version they
+        handle, as returned by `get_version()`, or any name for adapters
+        with a `discriminator`. These take precedence over the built-in
+        adapters.
+    recorder : EventRecorder
+        If set, used to record a sample of events, and optionally responses.
+    buffer_errors : str
+        If set, give each invocation a buffered `wsgi.errors` stream, with
+        lines tagged with the request ID, written in one go after the
+        invocation: "sync" to write from the invocation's thread, or
+        "background" to hand off to a background thread.
+    coalesce : Coalescer
+        If set, used to coalesce identical concurrent GET and HEAD requests
+        into a single call of the WSGI app.
+    middleware : list of Middleware
+        Middleware to run at the event, environ, and response stages of each
+        invocation. Stages that no middleware uses add no overhead.
+    limits : RequestLimits
+        If set, limits on request headers, query strings, and bodies, checked
+        before the WSGI environ is built. Requests exceeding them get a 413,
+        414, or 431 response without calling the WSGI app.
+    error_boundary : ErrorBoundary
+        If set, used to turn exceptions raised by the WSGI app into error
+        responses, rather than letting them escape the handler.
+    memory_watchdog : MemoryWatchdog
+        If set, used to sample memory use between invocations, collecting
+        garbage and signalling for recycling as it nears the memory limit.
     """
+    if isinstance(wsgi_app, Mapping):
+        wsgi_app = Router(wsgi_app)
+
+    if coalesce is not None:
+        wsgi_app = coalesce.wrap(wsgi_app)
+
+    if retain_full_event not in ("full", "without_body", "none"):
+        raise ValueError(f"Unknown retain_full_event value {retain_full_event!r}")
+
+    if buffer_errors not in (None, "sync", "background"):
+        raise ValueError(f"Unknown buffer_errors value {buffer_errors!r}")
+
+    event_stage, environ_stage, response_stage = compose_middleware(middleware)
+
     if non_binary_content_type_prefixes is None:
         non_binary_prefixes_tuple = DEFAULT_NON_BINARY_CONTENT_TYPE_PREFIXES
     else:
         non_binary_prefixes_tuple = tuple(non_binary_content_type_prefixes)
 
-    def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
-        # ALB doesn't send a version, but requestContext will contain a key named 'elb'.
-        if (
-            "requestContext" in event
-            and isinstance(event["requestContext"], dict)
-            and "elb" in event["requestContext"]
-        ):
-            version = "alb"
-        else:
-            version = event.get("version", "1.0")
+    adapters_by_version = dict(DEFAULT_ADAPTERS)
+    if adapters is not None:
+        adapters_by_version.update(adapters)
+
+    # Custom adapters' discriminator keys are checked before the built-in
+    # version detection, so events without a distinct version can be
+    # routed to them.
+    discriminators = tuple(
+        (adapter.discriminator, version)
+        for version, adapter in adapters_by_version.items()
+        if adapter.discriminator is not None
+    )
+    dispatch: Callable[[dict[str, Any]], str]
+    if discriminators:
+
+        def dispatch(event: dict[str, Any]) -> str:
+            for key, version in discriminators:
+                if key in event:
+                    return version
+            return get_version(event)
+
+    else:
+        dispatch = get_version
 
-        if version in ("1.0", "alb"):
-            environ = get_environ_v1(
+    def get_adapter(version: str) -> EventAdapter:
+        try:
+            return adapters_by_version[version]
+        except KeyError:
+            raise ValueError(f"Unknown version {version!r}") from None
+
+    def adapter_binary_support(adapter: EventAdapter) -> bool:
+        if adapter.force_binary_support:
+            return True
+        if binary_support is None:
+            return adapter.default_binary_support
+        return binary_support
+
+    def reject(
+        version: str, event: dict[str, Any], context: Any, status_code: int
+    ) -> dict[str, Any]:
+        """
+        Return a plain text error response, for requests rejected before
+        their environ is built. Without an environ, middleware response
+        stages, Server-Timing, and on_timing don't apply to it.
+        """
+        adapter = get_adapter(version)
+        response = adapter.make_error_response(
+            event,
+            binary_support=adapter_binary_support(adapter),
+            non_binary_content_type_prefixes=non_binary_prefixes_tuple,
+        )
+        if response is None:
+            # The adapter can only create responses from an environ, so build
+            # one after all.
+            environ = adapter.get_environ(
                 event,
                 context,
-                encode_query_params=(version == "1.0"),
-            )
-            if version == "1.0":
-                # Binary support defaults to 'off' on version 1
-                if binary_support is None:
-                    event_binary_support = False
-                else:
-                    event_binary_support = binary_support
-            else:
-                # Binary support defaults to 'on' on ALBs
-                if binary_support is None:
-                    event_binary_support = True
-                else:
-                    event_binary_support = binary_support
-            response: BaseResponse = V1Response(
-                binary_support=event_binary_support,
-                non_binary_content_type_prefixes=non_binary_prefixes_tuple,
-                multi_value_headers=environ["apig_wsgi.multi_value_headers"],
+                strip_stage=strip_stage,
+                retain_full_event=retain_full_event,
+                spool_max_size=None,
             )
-        elif version == "2.0":
-            environ = get_environ_v2(event, context)
-            response = V2Response(
-                binary_support=True,
+            response = adapter.make_response(
+                environ,
+                binary_support=adapter_binary_support(adapter),
                 non_binary_content_type_prefixes=non_binary_prefixes_tuple,
+                spool_max_size=None,
             )
-        else:
-            raise ValueError("Unknown version {!r}".format(event["version"]))
-        result = wsgi_app(environ, response.start_response)
-        response.consume(result)
-        return response.as_apig_response()
+        reason = responses[status_code]
+        assert limits is not None
+        write = response.start_response(
+            f"{status_code} {reason}",
+            [("Content-Type", "text/plain"), *limits.headers],
+        )
+        write(reason.encode("utf-8"))
+        apig_response = response.as_apig_response()
+        response.release()
+        return apig_response
+
+    def prepare(
+        version: str, event: dict[str, Any], context: Any
+    ) -> tuple[dict[str, Any], BaseResponse]:
+        adapter = get_adapter(version)
+        environ = adapter.get_environ(
+            event,
+            context,
+            strip_stage=strip_stage,
+            retain_full_event=retain_full_event,
+            spool_max_size=spool_max_size,
+        )
+        response = adapter.make_response(
+            environ,
+            binary_support=adapter_binary_support(adapter),
+            non_binary_content_type_prefixes=non_binary_prefixes_tuple,
+            spool_max_size=spool_max_size,
+        )
+
+        if environ["REQUEST_METHOD"] == "HEAD":
+            response.head_size = 0
+
+        if buffer_errors is not None:
+            environ["wsgi.errors"] = logs.current_errors_buffer()
+
+        if environ_stage is not None:
+            environ_stage(environ)
+
+        if deadline_margin_ms is not None:
+            get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+            if get_remaining_time is not None:
+                deadline = monotonic() + (
+                    (get_remaining_time() - deadline_margin_ms) / 1000
+                )
+                environ["apig_wsgi.deadline"] = deadline
+                response.deadline = deadline
+
+        return environ, response
+
+    # Timestamps are only taken when something consumes them, so that
+    # timing adds no overhead otherwise.
+    timed = on_timing is not None or server_timing
+
+    def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+        if event_stage is not None:
+            early_response = event_stage(event, context)
+            if early_response is not None:
+                return early_response
+        if timed:
+            start = perf_counter_ns()
+        version = dispatch(event)
+        if limits is not None:
+            status_code = limits.check(event)
+            if status_code is not None:
+                return reject(version, event, context, status_code)
+        if timed:
+            dispatched = perf_counter_ns()
+        environ, response = prepare(version, event, context)
+        if timed:
+            # Static file serving counts as encoding time.
+            prepared = called = consumed = perf_counter_ns()
+        timing = None
+        try:
+            try:
+                if static_files is None or not static_files.serve(environ, response):
+                    result = wsgi_app(environ, response.start_response)
+                    if timed:
+                        called = perf_counter_ns()
+                    response.consume(result)
+                    if timed:
+                        consumed = perf_counter_ns()
+                # Encoding is guarded too, since it fails for app responses
+                # such as non-UTF-8 bodies without binary support.
+                apig_response = response.as_apig_response()
+            except Exception:
+                if error_boundary is None or error_boundary.handle(environ):
+                    raise
+                response.replace(
+                    error_boundary.status_code,
+                    error_boundary.headers,
+                    error_boundary.body,
+                )
+                apig_response = response.as_apig_response()
+                if timed:
+                    # Count the time up to the failure in the phase it
+                    # happened in.
+                    failed = perf_counter_ns()
+                    if called == prepared:
+                        called = failed
+                    if consumed == prepared:
+                        consumed = failed
+            else:
+                if error_boundary is not None:
+                    error_boundary.succeeded()
+            if timed:
+                encoded = perf_counter_ns()
+                timing = Timing(
+                    version=version,
+                    method=environ["REQUEST_METHOD"],
+                    path=environ["PATH_INFO"],
+                    status_code=response.status_code,
+                    dispatch_ns=dispatched - start,
+                    environ_ns=prepared - dispatched,
+                    app_ns=called - prepared,
+                    consume_ns=consumed - called,
+                    encode_ns=encoded - consumed,
+                    request_body_bytes=int(environ["CONTENT_LENGTH"]),
+                    response_body_bytes=response.body_size(),
+                    base64_encoded=apig_response["isBase64Encoded"],
+                )
+                if server_timing:
+                    response.add_apig_header(
+                        apig_response, "Server-Timing", timing.server_timing()
+                    )
+        finally:
+            # Also when the app raises, so spooled files are always closed.
+            if spool_max_size is not None:
+                environ["wsgi.input"].close()
+                response.body.close()
+            response.release()
+        if response_stage is not None:
+            apig_response = response_stage(environ, apig_response)
+        if timing is not None and on_timing is not None:
+            on_timing(timing)
+        return apig_response
+
+    lambda_handler: LambdaHandler = handler
 
-    return handler
+    if buffer_errors is not None:
+        lambda_handler = logs.wrap(lambda_handler, buffer_errors)
+
+    if recorder is not None:
+        lambda_handler = recorder.wrap(lambda_handler)
+
+    if memory_watchdog is not None:
+        lambda_handler = memory_watchdog.wrap(lambda_handler)
+
+    profiler = Profiler.from_environ(os.environ)
+    if profiler is not None:
+        lambda_handler = profiler.wrap(lambda_handler)
+
+    return lambda_handler
+
+
+def get_version(event: dict[str, Any]) -> str:
+    """
+    Return the key of the adapter for an event, checking a fixed handful of
+    keys whatever the number of registered adapters.
+    """
+    # ALB doesn't send a version, but requestContext will contain a key named 'elb'.
+    if (
+        "requestContext" in event
+        and isinstance(event["requestContext"], dict)
+        and "elb" in event["requestContext"]
+    ):
+        return "alb"
+    if "version" not in event:
+        # VPC Lattice version 1 events use snake case keys, and no version.
+        if "raw_path" in event:
+            return "lattice-1.0"
+        return "1.0"
+    version: str = event["version"]
+    # VPC Lattice version 2 events have "path" where API Gateway and function
+    # URL events have "rawPath".
+    if version == "2.0" and "path" in event:
+        return "lattice-2.0"
+    return version
+
+
+@dataclass(frozen=True)
+class Timing:
+    """
+    Per-invocation measurements passed to the ``on_timing`` callback. Phase
+    durations are in nanoseconds, from ``time.perf_counter_ns()``.
+    """
+
+    version: str
+    method: str
+    path: str
+    status_code: int
+    dispatch_ns: int
+    environ_ns: int
+    app_ns: int
+    consume_ns: int
+    encode_ns: int
+    request_body_bytes: int
+    response_body_bytes: int
+    base64_encoded: bool
+
+    @property
+    def total_ns(self) -> int:
+        return (
+            self.dispatch_ns
+            + self.environ_ns
+            + self.app_ns
+            + self.consume_ns
+            + self.encode_ns
+        )
+
+    def server_timing(self) -> str:
+        """
+        Format the phase durations as a ``Server-Timing`` header value, in
+        milliseconds.
+        """
+        return ", ".join(
+            f"{name};dur={duration_ns / 1_000_000:.3f}"
+            for name, duration_ns in (
+                ("environ", self.dispatch_ns + self.environ_ns),
+                ("app", self.app_ns),
+                ("consume", self.consume_ns),
+                ("encode", self.encode_ns),
+            )
+        )
 
 
 def get_environ_v1(
-    event: dict[str, Any], context: Any, encode_query_params: bool
+    event: dict[str, Any],
+    context: Any,
+    encode_query_params: bool,
+    strip_stage: bool = False,
+    retain_full_event: RetainFullEvent = "full",
+    spool_max_size: int | None = None,
 ) -> dict[str, Any]:
-    body = get_body(event)
+    body, content_length = get_body_file(event, spool_max_size)
+    if retain_full_event != "full":
+        event.pop("body", None)
+    script_name = ""
+    path = event["path"]
+    if strip_stage and isinstance(event.get("requestContext"), dict):
+        script_name, path = split_stage_v1(path, event["requestContext"])
     environ: dict[str, Any] = {
-        "CONTENT_LENGTH": str(len(body)),
+        "CONTENT_LENGTH": str(content_length),
         "HTTP": "on",
-        "PATH_INFO": unquote(event["path"], encoding="iso-8859-1"),
+        "PATH_INFO": unquote(path, encoding="iso-8859-1"),
         "REMOTE_ADDR": "127.0.0.1",
         "REQUEST_METHOD": event["httpMethod"],
-        "SCRIPT_NAME": "",
+        "SCRIPT_NAME": unquote(script_name, encoding="iso-8859-1"),
         "SERVER_PROTOCOL": "HTTP/1.1",
         "SERVER_NAME": "",
         "SERVER_PORT": "",
         "wsgi.errors": sys.stderr,
-        "wsgi.input": BytesIO(body),
+        "wsgi.input": body,
+        "wsgi.file_wrapper": FileWrapper,
         "wsgi.multiprocess": False,
         "wsgi.multithread": False,
         "wsgi.run_once": False,
@@ -131,23 +501,19 @@ def get_environ_v1(
         "apig_wsgi.multi_value_headers": False,
     }
 
-    if encode_query_params:
-        safe_chars = ""
-    else:
-        safe_chars = RESERVED_URI_CHARACTERS
-
     # Multi-value query strings need explicit activation on ALB
     if "multiValueQueryStringParameters" in event:
-        environ["QUERY_STRING"] = urlencode(
+        environ["QUERY_STRING"] = encode_query_string(
             # may be None when testing on console
-            event["multiValueQueryStringParameters"] or (),
-            doseq=True,
-            safe=safe_chars,
+            event["multiValueQueryStringParameters"],
+            multi_value=True,
+            encode_reserved=encode_query_params,
         )
     else:
-        environ["QUERY_STRING"] = urlencode(
-            event.get("queryStringParameters") or (),
-            safe=safe_chars,
+        environ["QUERY_STRING"] = encode_query_string(
+            event.get("queryStringParameters"),
+            multi_value=False,
+            encode_reserved=encode_query_params,
         )
 
     # Multi-value headers need explicit activation on ALB
@@ -178,31 +544,127 @@ def get_environ_v1(
 
     if "requestContext" in event:
         environ["apig_wsgi.request_context"] = event["requestContext"]
-    environ["apig_wsgi.full_event"] = event
+    if retain_full_event != "none":
+        environ["apig_wsgi.full_event"] = event
     environ["apig_wsgi.context"] = context
 
     return environ
 
 
-def get_environ_v2(event: dict[str, Any], context: Any) -> dict[str, Any]:
-    body = get_body(event)
+def encode_query_string(
+    params: dict[str, Any] | None, *, multi_value: bool, encode_reserved: bool
+) -> str:
+    """
+    Build a query string from v1 or ALB query string parameters, with the same
+    output as urllib.parse.urlencode(), but faster. ALB parameters arrive
+    already percent-encoded, so reserved characters are left alone for them.
+    """
+    if not params:
+        return ""
+    items: list[tuple[str, str | tuple[str, ...]]] = []
+    for key, value in params.items():
+        if type(key) is not str:
+            return _urlencode(params, multi_value, encode_reserved)
+        if type(value) is str:
+            items.append((key, value))
+        elif (
+            multi_value
+            and type(value) is list
+            and all(type(item) is str for item in value)
+        ):
+            items.append((key, tuple(value)))
+        else:
+            # Only strings are cached, since values of other types can hash
+            # equal but encode differently, such as 1 and True.
+            return _urlencode(params, multi_value, encode_reserved)
+    return _encode_query_items(tuple(items), multi_value, encode_reserved)
+
+
+def _urlencode(params: dict[str, Any], multi_value: bool, encode_reserved: bool) -> str:
+    return urlencode(
+        params,
+        doseq=multi_value,
+        safe="" if encode_reserved else RESERVED_URI_CHARACTERS,
+    )
+
+
+@lru_cache(maxsize=256)
+def _encode_query_items(
+    items: tuple[tuple[str, str | tuple[str, ...]], ...],
+    multi_value: bool,
+    encode_reserved: bool,
+) -> str:
+    quote = _quote_v1 if encode_reserved else _quote_alb
+    parts = []
+    for key, value in items:
+        key = quote(key)
+        if isinstance(value, tuple):
+            for item in value:
+                parts.append(key + "=" + quote(item))
+        else:
+            parts.append(key + "=" + quote(value))
+    return "&".join(parts)
+
+
+def _make_quoter(safe: str) -> Callable[[str], str]:
+    """
+    Return a function equivalent to quote_plus(string, safe=safe), with fast
+    paths for ASCII strings.
+    """
+    always_safe = string.ascii_letters + string.digits + "_.-~" + safe
+    unsafe_re = re.compile("[^" + re.escape(always_safe) + "]")
+    table = {
+        code: ("+" if code == ord(" ") else f"%{code:02X}")
+        for code in range(128)
+        if chr(code) not in always_safe
+    }
+
+    def quote(value: str) -> str:
+        if unsafe_re.search(value) is None:
+            return value
+        if value.isascii():
+            return value.translate(table)
+        return quote_plus(value, safe=safe)
+
+    return quote
+
+
+_quote_v1 = _make_quoter("")
+_quote_alb = _make_quoter(RESERVED_URI_CHARACTERS)
+
+
+def get_environ_v2(
+    event: dict[str, Any],
+    context: Any,
+    strip_stage: bool = False,
+    retain_full_event: RetainFullEvent = "full",
+    spool_max_size: int | None = None,
+) -> dict[str, Any]:
+    body, content_length = get_body_file(event, spool_max_size)
+    if retain_full_event != "full":
+        event.pop("body", None)
     headers = event["headers"]
     http = event["requestContext"]["http"]
+    script_name = ""
+    path = event["rawPath"]
+    if strip_stage:
+        script_name, path = split_stage(path, event["requestContext"].get("stage"))
 
     environ: dict[str, Any] = {
-        "CONTENT_LENGTH": str(len(body)),
+        "CONTENT_LENGTH": str(content_length),
         "HTTP": "on",
         "HTTP_COOKIE": ";".join(event.get("cookies", ())),
-        "PATH_INFO": unquote(event["rawPath"], encoding="iso-8859-1"),
+        "PATH_INFO": unquote(path, encoding="iso-8859-1"),
         "QUERY_STRING": event["rawQueryString"],
         "REMOTE_ADDR": http["sourceIp"],
         "REQUEST_METHOD": http["method"],
-        "SCRIPT_NAME": "",
+        "SCRIPT_NAME": unquote(script_name, encoding="iso-8859-1"),
         "SERVER_NAME": "",
         "SERVER_PORT": "",
         "SERVER_PROTOCOL": http["protocol"],
         "wsgi.errors": sys.stderr,
-        "wsgi.input": BytesIO(body),
+        "wsgi.input": body,
+        "wsgi.file_wrapper": FileWrapper,
         "wsgi.multiprocess": False,
         "wsgi.multithread": False,
         "wsgi.run_once": False,
@@ -229,31 +691,306 @@ def get_environ_v2(event: dict[str, Any], context: Any) -> dict[str, Any]:
         environ["HTTP_" + key] = raw_value
 
     environ["apig_wsgi.request_context"] = event["requestContext"]
-    environ["apig_wsgi.full_event"] = event
+    if retain_full_event != "none":
+        environ["apig_wsgi.full_event"] = event
+    environ["apig_wsgi.context"] = context
+
+    return environ
+
+
+def get_environ_lattice(
+    event: dict[str, Any],
+    context: Any,
+    version: str,
+    retain_full_event: RetainFullEvent = "full",
+    spool_max_size: int | None = None,
+) -> dict[str, Any]:
+    if version == "1.0":
+        path, _, raw_query = event["raw_path"].partition("?")
+        params = event.get("query_string_parameters")
+        base64_key = "is_base64_encoded"
+    else:
+        path = event["path"]
+        raw_query = ""
+        params = event.get("queryStringParameters")
+        base64_key = "isBase64Encoded"
+    body, content_length = get_body_file(event, spool_max_size, base64_key)
+    if retain_full_event != "full":
+        event.pop("body", None)
+
+    environ: dict[str, Any] = {
+        "CONTENT_LENGTH": str(content_length),
+        "HTTP": "on",
+        "PATH_INFO": unquote(path, encoding="iso-8859-1"),
+        "QUERY_STRING": (
+            encode_query_string(params, multi_value=True, encode_reserved=True)
+            if params
+            else raw_query
+        ),
+        "REMOTE_ADDR": "127.0.0.1",
+        "REQUEST_METHOD": event["method"],
+        "SCRIPT_NAME": "",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "SERVER_NAME": "",
+        "SERVER_PORT": "",
+        "wsgi.errors": sys.stderr,
+        "wsgi.input": body,
+        "wsgi.file_wrapper": FileWrapper,
+        "wsgi.multiprocess": False,
+        "wsgi.multithread": False,
+        "wsgi.run_once": False,
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "apig_wsgi.multi_value_headers": False,
+    }
+
+    # Header values may be strings, or lists of strings.
+    for key, raw_value in (event.get("headers") or {}).items():
+        if isinstance(raw_value, list):
+            raw_value = ",".join(raw_value)
+        key = key.upper().replace("-", "_")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = raw_value.split(",")[-1]
+        elif key == "HOST":
+            environ["SERVER_NAME"] = raw_value.split(",")[-1]
+        elif key == "X_FORWARDED_FOR":
+            environ["REMOTE_ADDR"] = raw_value.split(",")[0].strip()
+        elif key == "X_FORWARDED_PROTO":
+            environ["wsgi.url_scheme"] = raw_value.split(",")[-1]
+        elif key == "X_FORWARDED_PORT":
+            environ["SERVER_PORT"] = raw_value.split(",")[-1]
+
+        environ["HTTP_" + key] = raw_value
+
+    if "requestContext" in event:
+        environ["apig_wsgi.request_context"] = event["requestContext"]
+    if retain_full_event != "none":
+        environ["apig_wsgi.full_event"] = event
     environ["apig_wsgi.context"] = context
 
     return environ
 
 
-def get_body(event: dict[str, Any]) -> bytes:
+def split_stage_v1(path: str, request_context: dict[str, Any]) -> tuple[str, str]:
+    """
+    Split a v1 event path into (script name, path info). REST APIs report the
+    path the client requested, including any stage or custom domain base
+    path, in requestContext.path, and the path without it in path.
+    """
+    full_path = request_context.get("path")
+    if full_path and full_path != path:
+        if full_path.endswith(path):
+            return full_path[: len(full_path) - len(path)], path
+        if path == "/":
+            return full_path.rstrip("/"), path
+    return split_stage(path, request_context.get("stage"))
+
+
+def split_stage(path: str, stage: str | None) -> tuple[str, str]:
+    """
+    Split a path starting with a named stage into (script name, path info).
+    """
+    if not stage or stage == "$default":
+        return "", path
+    prefix = "/" + stage
+    if path == prefix or path.startswith(prefix + "/"):
+        return prefix, path[len(prefix) :]
+    return "", path
+
+
+def get_body_file(
+    event: dict[str, Any],
+    spool_max_size: int | None,
+    base64_key: str = "isBase64Encoded",
+) -> tuple[BinaryIO, int]:
+    """
+    Return the event body as a file and its length. With spool_max_size set,
+    bodies larger than it are decoded in chunks into a temporary file.
+    """
+    body: str = event.get("body", "") or ""
+    if spool_max_size is None or len(body) <= spool_max_size:
+        data = get_body(event, base64_key)
+        return BytesIO(data), len(data)
+
+    # Closed by the handler after the response is built.
+    file = SpooledTemporaryFile(max_size=spool_max_size)  # noqa: SIM115
+    if event.get(base64_key, False):
+        for start in range(0, len(body), BASE64_DECODE_CHUNK_SIZE):
+            file.write(b64decode(body[start : start + BASE64_DECODE_CHUNK_SIZE]))
+    else:
+        for start in range(0, len(body), TEXT_ENCODE_CHUNK_SIZE):
+            file.write(body[start : start + TEXT_ENCODE_CHUNK_SIZE].encode())
+    length = file.tell()
+    file.seek(0)
+    return cast(BinaryIO, file), length
+
+
+def get_body(event: dict[str, Any], base64_key: str = "isBase64Encoded") -> bytes:
     body: str = event.get("body", "") or ""
-    if event.get("isBase64Encoded", False):
+    if event.get(base64_key, False):
         return b64decode(body)
     return body.encode()
 
 
+class FileWrapper(wsgiref.util.FileWrapper):
+    """
+    The wsgi.file_wrapper. Regular files returned wrapped in this are memory
+    mapped and encoded in one step, rather than read in chunks.
+    """
+
+
+def file_size(filelike: Any) -> int | None:
+    """
+    Return the size of the rest of a regular file, or None if it can't be
+    determined.
+    """
+    try:
+        file_stat = os.fstat(filelike.fileno())
+        offset: int = filelike.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return max(file_stat.st_size - offset, 0)
+
+
+class EncodedBody(NamedTuple):
+    """
+    A response body encoded in advance, used in place of BaseResponse.body.
+    """
+
+    base64: str
+    # None if the body is not valid UTF-8
+    text: str | None
+    size: int
+
+
+# Per-thread pools of released response objects, by class.
+_response_pools = threading.local()
+
+RESPONSE_POOL_SIZE = 4
+
+# Pooled responses keep in-memory bodies up to this size, to reuse their
+# buffers, and replace larger ones.
+RESPONSE_POOL_BODY_SIZE = 64 * 1024
+
+_ResponseT = TypeVar("_ResponseT", bound="BaseResponse")
+
+
+def _response_pool(cls: type[BaseResponse]) -> list[BaseResponse]:
+    try:
+        pools: dict[type[BaseResponse], list[BaseResponse]] = _response_pools.pools
+    except AttributeError:
+        pools = _response_pools.pools = {}
+    try:
+        return pools[cls]
+    except KeyError:
+        pool = pools[cls] = []
+        return pool
+
+
 class BaseResponse:
+    __slots__ = (
+        "status_code",
+        "headers",
+        "body",
+        "binary_support",
+        "non_binary_content_type_prefixes",
+        "deadline",
+        "encoded_body",
+        "mapped_file",
+        "mapped_offset",
+        "mapped_size",
+        "head_size",
+    )
+
     def __init__(
         self,
         *,
         binary_support: bool,
         non_binary_content_type_prefixes: tuple[str, ...],
+        spool_max_size: int | None = None,
     ) -> None:
-        self.status_code = 500
         self.headers: list[tuple[str, str]] = []
-        self.body = BytesIO()
+        self.body: BinaryIO = BytesIO()
+        self.reset(
+            binary_support=binary_support,
+            non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+            spool_max_size=spool_max_size,
+        )
+
+    def reset(
+        self,
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+        spool_max_size: int | None = None,
+    ) -> None:
+        """
+        Return the response to its initial state, reusing its headers list
+        and in-memory body where possible.
+        """
+        self.status_code = 500
+        self.headers.clear()
+        if spool_max_size is not None:
+            # Closed by the handler after the response is built.
+            self.body = cast(
+                BinaryIO,
+                SpooledTemporaryFile(max_size=spool_max_size),  # noqa: SIM115
+            )
+        elif isinstance(self.body, BytesIO) and not self.body.closed:
+            self.body.seek(0)
+            self.body.truncate()
+        else:
+            self.body = BytesIO()
         self.binary_support = binary_support
         self.non_binary_content_type_prefixes = non_binary_content_type_prefixes
+        self.deadline: float | None = None
+        self.encoded_body: EncodedBody | None = None
+        self.mapped_file: mmap.mmap | None = None
+        self.mapped_offset = 0
+        self.mapped_size: int | None = None
+        # Bytes of body counted, but not stored, for HEAD requests.
+        self.head_size: int | None = None
+
+    @classmethod
+    def acquire(cls: type[_ResponseT], **kwargs: Any) -> _ResponseT:
+        """
+        Return a reset response from the current thread's pool, or a new one
+        if the pool is empty.
+        """
+        pool = _response_pool(cls)
+        if pool:
+            response = cast(_ResponseT, pool.pop())
+            response.reset(**kwargs)
+            return response
+        return cls(**kwargs)
+
+    def release(self) -> None:
+        """
+        Return the response to the current thread's pool for reuse. It must
+        not be used afterwards.
+        """
+        pool = _response_pool(type(self))
+        if len(pool) < RESPONSE_POOL_SIZE:
+            # Drop the response's data, so pooled responses don't hold on to
+            # previous bodies or header values between invocations.
+            self.headers.clear()
+            body = self.body
+            if (
+                isinstance(body, BytesIO)
+                and not body.closed
+                and body.seek(0, SEEK_END) <= RESPONSE_POOL_BODY_SIZE
+            ):
+                body.seek(0)
+                body.truncate()
+            else:
+                self.body = BytesIO()
+            self.encoded_body = None
+            if self.mapped_file is not None:
+                self.mapped_file.close()
+                self.mapped_file = None
+            pool.append(self)
 
     def start_response(
         self,
@@ -265,11 +1002,33 @@ class BaseResponse:
             raise exc_info[0](exc_info[1]).with_traceback(exc_info[2])
         self.status_code = int(status.split()[0])
         self.headers.extend(response_headers)
+        if self.head_size is not None:
+            return self.count_head
         return self.body.write
 
+    def count_head(self, data: bytes) -> int:
+        assert self.head_size is not None
+        self.head_size += len(data)
+        return len(data)
+
     def consume(self, result: Iterable[bytes]) -> None:
+        if self.head_size is not None:
+            self.consume_head(result)
+            return
+        deadline = self.deadline
         try:
+            # Map wrapped files into memory, rather than reading them in
+            # chunks, unless the app already wrote some of the body.
+            if (
+                isinstance(result, FileWrapper)
+                and self.body.tell() == 0
+                and self.map_file(result.filelike)
+            ):
+                return
             for data in result:
+                if deadline is not None and monotonic() > deadline:
+                    self.timeout()
+                    break
                 if data:
                     self.body.write(data)
         finally:
@@ -277,6 +1036,138 @@ class BaseResponse:
             if close:
                 close()
 
+    def consume_head(self, result: Iterable[bytes]) -> None:
+        """
+        Drain the response to a HEAD request, counting the body's size rather
+        than storing it, and add a Content-Length header if it's missing.
+        """
+        assert self.head_size is not None
+        deadline = self.deadline
+        try:
+            size = None
+            if isinstance(result, FileWrapper):
+                size = file_size(result.filelike)
+            if size is not None:
+                self.head_size += size
+            else:
+                for data in result:
+                    if deadline is not None and monotonic() > deadline:
+                        self.timeout()
+                        return
+                    self.head_size += len(data)
+        finally:
+            close = getattr(result, "close", None)
+            if close:
+                close()
+        if (
+            self.status_code >= 200
+            and self.status_code != 204
+            and self.status_code != 304
+            and self._get_header("content-length") is None
+        ):
+            self.headers.append(("Content-Length", str(self.head_size)))
+
+    def timeout(self) -> None:
+        """
+        Replace the response with a 504, for when the deadline has passed.
+        """
+        self.replace(504, [("Content-Type", "text/plain")], TIMEOUT_BODY)
+
+    def replace(
+        self, status_code: int, headers: Iterable[tuple[str, str]], body: bytes
+    ) -> None:
+        """
+        Replace anything the app has started to respond with.
+        """
+        self.status_code = status_code
+        self.headers = list(headers)
+        self.body.seek(0)
+        self.body.truncate()
+        self.encoded_body = None
+        if self.mapped_file is not None:
+            self.mapped_file.close()
+            self.mapped_file = None
+            self.mapped_size = None
+        if self.head_size is not None:
+            self.head_size = len(body)
+            self.headers.append(("Content-Length", str(self.head_size)))
+        else:
+            self.body.write(body)
+
+    def map_file(self, filelike: Any) -> bool:
+        """
+        Try to memory map the rest of a file as the response body, returning
+        whether it worked.
+        """
+        try:
+            offset = filelike.tell()
+            mapped = mmap.mmap(filelike.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # Not a regular file, or empty
+            return False
+        self.mapped_file = mapped
+        self.mapped_offset = offset
+        self.mapped_size = max(len(mapped) - offset, 0)
+        return True
+
+    def body_size(self) -> int:
+        if self.encoded_body is not None:
+            return self.encoded_body.size
+        if self.mapped_size is not None:
+            return self.mapped_size
+        return self.body.tell()
+
+    def encode_body(self) -> tuple[bool, str]:
+        """
+        Return (is base64 encoded, body) for the response.
+        """
+        if self.head_size is not None:
+            # API Gateway discards HEAD response bodies.
+            return False, ""
+
+        if self.encoded_body is not None:
+            if self.encoded_body.text is None or self._should_send_binary():
+                return True, self.encoded_body.base64
+            return False, self.encoded_body.text
+
+        if self.mapped_file is not None:
+            return self._encode_mapped_file()
+
+        if self._should_send_binary():
+            return True, self._encode_body_base64()
+        return False, self._body_bytes().decode("utf-8")
+
+    def _body_bytes(self) -> bytes:
+        if isinstance(self.body, BytesIO):
+            return self.body.getvalue()
+        self.body.seek(0)
+        return self.body.read()
+
+    def _encode_body_base64(self) -> str:
+        if isinstance(self.body, BytesIO):
+            return b64encode(self.body.getvalue()).decode("utf-8")
+        # Encode spooled bodies in chunks, to avoid holding a copy of the
+        # whole body in memory as well as its encoding.
+        self.body.seek(0)
+        return "".join(
+            b64encode(chunk).decode("utf-8")
+            for chunk in iter(partial(self.body.read, BASE64_ENCODE_CHUNK_SIZE), b"")
+        )
+
+    def _encode_mapped_file(self) -> tuple[bool, str]:
+        assert self.mapped_file is not None
+        try:
+            with (
+                memoryview(self.mapped_file) as view,
+                view[self.mapped_offset :] as data,
+            ):
+                if self._should_send_binary():
+                    return True, b64encode(data).decode("utf-8")
+                return False, str(data, "utf-8")
+        finally:
+            self.mapped_file.close()
+            self.mapped_file = None
+
     def _should_send_binary(self) -> bool:
         """
         Determines if binary response should be sent to API Gateway
@@ -306,12 +1197,23 @@ class BaseResponse:
     def as_apig_response(self) -> dict[str, Any]:  # pragma: no cover
         raise NotImplementedError("Need to use subclass")
 
+    def add_apig_header(
+        self, response: dict[str, Any], name: str, value: str
+    ) -> None:  # pragma: no cover
+        raise NotImplementedError("Need to use subclass")
+
 
 class V1Response(BaseResponse):
+    __slots__ = ("multi_value_headers",)
+
     def __init__(self, *, multi_value_headers: bool, **kwargs: Any) -> None:
         super().__init__(**kwargs)
         self.multi_value_headers = multi_value_headers
 
+    def reset(self, *, multi_value_headers: bool = False, **kwargs: Any) -> None:
+        super().reset(**kwargs)
+        self.multi_value_headers = multi_value_headers
+
     def as_apig_response(self) -> dict[str, Any]:
         response: dict[str, Any] = {"statusCode": self.status_code}
         # Return multiValueHeaders as header if support is required
@@ -323,17 +1225,32 @@ class V1Response(BaseResponse):
         else:
             response["headers"] = dict(self.headers)
 
-        if self._should_send_binary():
-            response["isBase64Encoded"] = True
-            response["body"] = b64encode(self.body.getvalue()).decode("utf-8")
-        else:
-            response["isBase64Encoded"] = False
-            response["body"] = self.body.getvalue().decode("utf-8")
+        response["isBase64Encoded"], response["body"] = self.encode_body()
 
         return response
 
+    def add_apig_header(self, response: dict[str, Any], name: str, value: str) -> None:
+        """
+        Add a header to a response built by as_apig_response(), combining it
+        with any existing value for the same header.
+        """
+        if self.multi_value_headers:
+            response["multiValueHeaders"].setdefault(name, []).append(value)
+            return
+
+        headers = response["headers"]
+        name_lower = name.lower()
+        for key in headers:
+            if key.lower() == name_lower:
+                headers[key] += ", " + value
+                break
+        else:
+            headers[name] = value
+
 
 class V2Response(BaseResponse):
+    __slots__ = ()
+
     def as_apig_response(self) -> dict[str, Any]:
         response: dict[str, Any] = {
             "statusCode": self.status_code,
@@ -351,11 +1268,286 @@ class V2Response(BaseResponse):
         response["cookies"] = cookies
         response["headers"] = headers
 
-        if self._should_send_binary():
-            response["isBase64Encoded"] = True
-            response["body"] = b64encode(self.body.getvalue()).decode("utf-8")
+        response["isBase64Encoded"], response["body"] = self.encode_body()
+
+        return response
+
+    def add_apig_header(self, response: dict[str, Any], name: str, value: str) -> None:
+        """
+        Add a header to a response built by as_apig_response(), combining it
+        with any existing value for the same header.
+        """
+        headers = response["headers"]
+        name = name.lower()
+        if name in headers:
+            headers[name] += ", " + value
         else:
-            response["isBase64Encoded"] = False
-            response["body"] = self.body.getvalue().decode("utf-8")
+            headers[name] = value
+
+
+class LatticeResponse(BaseResponse):
+    __slots__ = ()
+
+    def as_apig_response(self) -> dict[str, Any]:
+        response: dict[str, Any] = {
+            "statusCode": self.status_code,
+            "statusDescription": (
+                f"{self.status_code} {responses.get(self.status_code, '')}".rstrip()
+            ),
+            "headers": {},
+        }
+        for key, value in self.headers:
+            self.add_apig_header(response, key, value)
+
+        response["isBase64Encoded"], response["body"] = self.encode_body()
 
         return response
+
+    def add_apig_header(self, response: dict[str, Any], name: str, value: str) -> None:
+        """
+        Add a header to a response built by as_apig_response(), combining it
+        with any existing value for the same header.
+        """
+        headers = response["headers"]
+        name_lower = name.lower()
+        for key in headers:
+            if key.lower() == name_lower:
+                headers[key] += ", " + value
+                break
+        else:
+            headers[name] = value
+
+
+class EventAdapter:
+    """
+    Converts events from one source into WSGI environ dictionaries, and
+    creates the response objects that serialize WSGI responses back into the
+    source's response format.
+
+    Subclass this to support another event source, and pass instances to
+    make_lambda_handler() in `adapters`, keyed on the event version they
+    handle.
+    """
+
+    # Whether to return binary responses when binary_support is None.
+    default_binary_support = True
+
+    # Whether to return binary responses even when binary_support is False.
+    force_binary_support = False
+
+    # A top-level event key that identifies events for this adapter, for
+    # sources whose events have no distinct "version". When set, events
+    # containing the key are dispatched to the adapter regardless of their
+    # version.
+    discriminator: str | None = None
+
+    def get_environ(
+        self,
+        event: dict[str, Any],
+        context: Any,
+        *,
+        strip_stage: bool,
+        retain_full_event: RetainFullEvent,
+        spool_max_size: int | None,
+    ) -> dict[str, Any]:  # pragma: no cover
+        raise NotImplementedError("Need to use subclass")
+
+    def make_response(
+        self,
+        environ: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+        spool_max_size: int | None,
+    ) -> BaseResponse:  # pragma: no cover
+        raise NotImplementedError("Need to use subclass")
+
+    def make_error_response(
+        self,
+        event: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+    ) -> BaseResponse | None:
+        """
+        Create the response object for an event rejected before its environ
+        is built, or return None to have the environ built and passed to
+        make_response() instead.
+        """
+        return None
+
+
+class V1Adapter(EventAdapter):
+    """
+    API Gateway REST API and format version 1.0 events, or ALB events.
+    """
+
+    def __init__(self, *, alb: bool) -> None:
+        # ALB events arrive with their query strings already encoded.
+        self.encode_query_params = not alb
+        # Binary support defaults to 'off' on version 1, and 'on' on ALBs.
+        self.default_binary_support = alb
+
+    def get_environ(
+        self,
+        event: dict[str, Any],
+        context: Any,
+        *,
+        strip_stage: bool,
+        retain_full_event: RetainFullEvent,
+        spool_max_size: int | None,
+    ) -> dict[str, Any]:
+        return get_environ_v1(
+            event,
+            context,
+            encode_query_params=self.encode_query_params,
+            strip_stage=strip_stage,
+            retain_full_event=retain_full_event,
+            spool_max_size=spool_max_size,
+        )
+
+    def make_response(
+        self,
+        environ: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+        spool_max_size: int | None,
+    ) -> BaseResponse:
+        return V1Response.acquire(
+            binary_support=binary_support,
+            non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+            multi_value_headers=environ["apig_wsgi.multi_value_headers"],
+            spool_max_size=spool_max_size,
+        )
+
+    def make_error_response(
+        self,
+        event: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+    ) -> BaseResponse:
+        return V1Response.acquire(
+            binary_support=binary_support,
+            non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+            multi_value_headers="multiValueHeaders" in event,
+            spool_max_size=None,
+        )
+
+
+class V2Adapter(EventAdapter):
+    """
+    API Gateway HTTP API format version 2.0 events, also used by Lambda
+    function URLs.
+    """
+
+    # HTTP APIs always accept binary responses.
+    force_binary_support = True
+
+    def get_environ(
+        self,
+        event: dict[str, Any],
+        context: Any,
+        *,
+        strip_stage: bool,
+        retain_full_event: RetainFullEvent,
+        spool_max_size: int | None,
+    ) -> dict[str, Any]:
+        return get_environ_v2(
+            event,
+            context,
+            strip_stage=strip_stage,
+            retain_full_event=retain_full_event,
+            spool_max_size=spool_max_size,
+        )
+
+    def make_response(
+        self,
+        environ: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+        spool_max_size: int | None,
+    ) -> BaseResponse:
+        return V2Response.acquire(
+            binary_support=binary_support,
+            non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+            spool_max_size=spool_max_size,
+        )
+
+    def make_error_response(
+        self,
+        event: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+    ) -> BaseResponse:
+        return V2Response.acquire(
+            binary_support=binary_support,
+            non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+            spool_max_size=None,
+        )
+
+
+class LatticeAdapter(EventAdapter):
+    """
+    VPC Lattice events, in version 1.0 or 2.0 of its format.
+    """
+
+    def __init__(self, *, version: str) -> None:
+        self.version = version
+
+    def get_environ(
+        self,
+        event: dict[str, Any],
+        context: Any,
+        *,
+        strip_stage: bool,
+        retain_full_event: RetainFullEvent,
+        spool_max_size: int | None,
+    ) -> dict[str, Any]:
+        # VPC Lattice has no stages, so strip_stage doesn't apply.
+        return get_environ_lattice(
+            event,
+            context,
+            self.version,
+            retain_full_event=retain_full_event,
+            spool_max_size=spool_max_size,
+        )
+
+    def make_response(
+        self,
+        environ: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+        spool_max_size: int | None,
+    ) -> BaseResponse:
+        return LatticeResponse.acquire(
+            binary_support=binary_support,
+            non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+            spool_max_size=spool_max_size,
+        )
+
+    def make_error_response(
+        self,
+        event: dict[str, Any],
+        *,
+        binary_support: bool,
+        non_binary_content_type_prefixes: tuple[str, ...],
+    ) -> BaseResponse:
+        return LatticeResponse.acquire(
+            binary_support=binary_support,
+            non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+            spool_max_size=None,
+        )
+
+
+DEFAULT_ADAPTERS: dict[str, EventAdapter] = {
+    "1.0": V1Adapter(alb=False),
+    "alb": V1Adapter(alb=True),
+    "2.0": V2Adapter(),
+    "lattice-1.0": LatticeAdapter(version="1.0"),
+    "lattice-2.0": LatticeAdapter(version="2.0"),
+}
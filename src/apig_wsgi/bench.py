@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import gzip
+import importlib
+import json
+import os
+import tracemalloc
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter, perf_counter_ns
+from typing import Any, cast
+
+from apig_wsgi import Timing, get_version, make_lambda_handler
+from apig_wsgi.compat import WSGIApplication
+from apig_wsgi.metrics import Histogram
+
+__all__ = ("BenchResult", "bench", "load_events")
+
+# Event formats, as accepted on the command line, mapped to event versions.
+FORMATS = {
+    "v1": "1.0",
+    "alb": "alb",
+    "v2": "2.0",
+    "lattice-v1": "lattice-1.0",
+    "lattice-v2": "lattice-2.0",
+}
+
+REPORT_PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Number of requests replayed under tracemalloc to measure allocations.
+ALLOCATION_SAMPLES = 100
+
+
+def load_events(
+    directory: str | os.PathLike[str], *, format: str | None = None
+) -> list[dict[str, Any]]:
+    """
+    Load events from the files in `directory`: .json files containing one
+    event or a list of events, and .jsonl or .jsonl.gz files written by
+    EventRecorder. If `format` is given, check that all events are in that
+    format.
+    """
+    events: list[dict[str, Any]] = []
+    paths = sorted(
+        path
+        for path in Path(directory).iterdir()
+        if path.name.endswith((".json", ".jsonl", ".jsonl.gz"))
+    )
+    for path in paths:
+        if path.name.endswith(".json"):
+            data = json.loads(path.read_text())
+            file_events = data if isinstance(data, list) else [data]
+        else:
+            with (
+                gzip.open(path, "rt", encoding="utf-8")
+                if path.name.endswith(".gz")
+                else path.open(encoding="utf-8")
+            ) as file:
+                file_events = [json.loads(line)["event"] for line in file if line]
+        if format is not None:
+            version = FORMATS[format]
+            for event in file_events:
+                if get_version(event) != version:
+                    raise ValueError(
+                        f"Event in {path} is not in the {format!r} format."
+                    )
+        events.extend(file_events)
+    if not events:
+        raise ValueError(f"No events found in {directory}.")
+    return events
+
+
+@dataclass
+class BenchResult:
+    """
+    Measurements from replaying events.
+    """
+
+    requests: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    latency: Histogram = field(default_factory=Histogram)
+    status_codes: dict[int, int] = field(default_factory=dict)
+    # Time spent in apig-wsgi, building the environ and response, and in the
+    # app, calling it and consuming its response.
+    adapter_ns: int = 0
+    app_ns: int = 0
+    allocated_bytes: int | None = None
+
+    def merge(self, other: BenchResult) -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.latency.merge(other.latency)
+        for status_code, count in other.status_codes.items():
+            self.status_codes[status_code] = (
+                self.status_codes.get(status_code, 0) + count
+            )
+        self.adapter_ns += other.adapter_ns
+        self.app_ns += other.app_ns
+
+    def report(self) -> str:
+        lines = [
+            f"Requests:      {self.requests}",
+            f"Errors:        {self.errors}",
+            f"Throughput:    {self.requests / self.elapsed:.1f} requests/second"
+            if self.elapsed
+            else "Throughput:    -",
+            "Status codes:  "
+            + ", ".join(
+                f"{status_code}: {count}"
+                for status_code, count in sorted(self.status_codes.items())
+            ),
+            "Latency:",
+            f"  min    {self.latency.min / 1_000_000:10.3f} ms",
+        ]
+        for fraction in REPORT_PERCENTILES:
+            name = "p" + f"{fraction * 100:g}".replace(".", "")
+            value = self.latency.percentile(fraction) / 1_000_000
+            lines.append(f"  {name:6} {value:10.3f} ms")
+        lines.append(f"  max    {self.latency.max / 1_000_000:10.3f} ms")
+        total_ns = self.adapter_ns + self.app_ns
+        if total_ns:
+            lines.append(
+                f"Time in apig-wsgi: {self.adapter_ns / total_ns:.1%}, "
+                + f"in app: {self.app_ns / total_ns:.1%}"
+            )
+        if self.allocated_bytes is not None:
+            lines.append(f"Allocated per request: {self.allocated_bytes} bytes (peak)")
+        return "\n".join(lines)
+
+
+def bench(
+    app: WSGIApplication | str,
+    events: Sequence[dict[str, Any]],
+    *,
+    duration: float,
+    concurrency: int = 1,
+    processes: bool = False,
+) -> BenchResult:
+    """
+    Replay `events` through a handler for `app` for `duration` seconds, from
+    `concurrency` threads or processes, and return the combined measurements.
+    `app` may be a "module:attribute" string, which processes require.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1.")
+    if processes and not isinstance(app, str):
+        raise TypeError("app must be a 'module:attribute' string with processes.")
+
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_worker, app, events, duration, offset)
+            for offset in range(concurrency)
+        ]
+        result = BenchResult()
+        for future in futures:
+            result.merge(future.result())
+
+    result.allocated_bytes = measure_allocations(app, events)
+    return result
+
+
+def run_worker(
+    app: WSGIApplication | str,
+    events: Sequence[dict[str, Any]],
+    duration: float,
+    offset: int,
+) -> BenchResult:
+    result = BenchResult()
+
+    def on_timing(timing: Timing) -> None:
+        result.adapter_ns += timing.dispatch_ns + timing.environ_ns + timing.encode_ns
+        result.app_ns += timing.app_ns + timing.consume_ns
+
+    handler = make_lambda_handler(load_app(app), on_timing=on_timing)
+    start = perf_counter()
+    deadline = start + duration
+    index = offset
+    while perf_counter() < deadline:
+        event = events[index % len(events)]
+        index += 1
+        request_start = perf_counter_ns()
+        try:
+            response = handler(event, None)
+        except Exception:
+            result.errors += 1
+            continue
+        result.latency.record(perf_counter_ns() - request_start)
+        status_code = response["statusCode"]
+        result.status_codes[status_code] = result.status_codes.get(status_code, 0) + 1
+        result.requests += 1
+    result.elapsed = perf_counter() - start
+    return result
+
+
+def measure_allocations(
+    app: WSGIApplication | str, events: Sequence[dict[str, Any]]
+) -> int:
+    """
+    Return the mean peak memory allocated while handling a request, measured
+    with tracemalloc.
+    """
+    handler = make_lambda_handler(load_app(app))
+    # Warm up caches and pools, so they aren't counted.
+    for event in events:
+        try:
+            handler(event, None)
+        except Exception:
+            pass
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        total = 0
+        for index in range(ALLOCATION_SAMPLES):
+            event = events[index % len(events)]
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            try:
+                handler(event, None)
+            except Exception:
+                pass
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        if started:
+            tracemalloc.stop()
+    return total // ALLOCATION_SAMPLES
+
+
+def load_app(app: WSGIApplication | str) -> WSGIApplication:
+    """
+    Return `app`, importing it first if it's a "module:attribute" string.
+    """
+    if not isinstance(app, str):
+        return app
+    module_name, colon, attribute = app.partition(":")
+    if not colon or not module_name or not attribute:
+        raise ValueError(f"App {app!r} should be in the form 'module:attribute'.")
+    result: object = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        result = getattr(result, name)
+    return cast(WSGIApplication, result)
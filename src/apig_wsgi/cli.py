@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+from collections.abc import Sequence
+
+from apig_wsgi import serve
+from apig_wsgi.bench import FORMATS, bench, load_app, load_events
+
+__all__ = ("main",)
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m)?")
+
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0}
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parse a duration like "30s", "500ms", "2m", or "10" (seconds), returning
+    seconds.
+    """
+    match = DURATION_RE.fullmatch(value.strip())
+    if match is None:
+        raise argparse.ArgumentTypeError(f"Invalid duration {value!r}.")
+    number, unit = match.groups()
+    return float(number) * DURATION_UNITS[unit or "s"]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m apig_wsgi")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="Replay recorded events through an app, and report performance.",
+    )
+    bench_parser.add_argument("app", help="WSGI app to load, as module:attribute.")
+    bench_parser.add_argument(
+        "--events",
+        required=True,
+        help="Directory of .json files, each containing an event or list of events.",
+    )
+    bench_parser.add_argument(
+        "--format",
+        choices=list(FORMATS),
+        help="Check that all events are in this format.",
+    )
+    bench_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of threads, or processes, to replay events from.",
+    )
+    bench_parser.add_argument(
+        "--processes",
+        action="store_true",
+        help="Use processes rather than threads.",
+    )
+    bench_parser.add_argument(
+        "--duration",
+        type=parse_duration,
+        default=30.0,
+        help='How long to run for, such as "30s", "500ms", or "2m".',
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Serve an app over HTTP, converting requests to Lambda events.",
+    )
+    serve_parser.add_argument("app", help="WSGI app to load, as module:attribute.")
+    serve_parser.add_argument(
+        "--format",
+        choices=serve.FORMATS,
+        default="2.0",
+        help="Event format to convert requests to.",
+    )
+    serve_parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on."
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8000, help="Port to listen on."
+    )
+    serve_parser.add_argument(
+        "--single-value",
+        action="store_true",
+        help="Send single value headers and query strings in ALB events.",
+    )
+    serve_parser.add_argument(
+        "--quiet", action="store_true", help="Don't log each request."
+    )
+
+    args = parser.parse_args(argv)
+
+    # Allow importing apps from the current directory, like python -m does.
+    if "" not in sys.path:
+        sys.path.insert(0, "")
+
+    if args.command == "serve":
+        return serve_command(args)
+    return bench_command(args)
+
+
+def bench_command(args: argparse.Namespace) -> int:
+    try:
+        events = load_events(args.events, format=args.format)
+        # Import early, to report errors before starting any workers.
+        app = load_app(args.app)
+    except (ImportError, AttributeError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    result = bench(
+        args.app if args.processes else app,
+        events,
+        duration=args.duration,
+        concurrency=args.concurrency,
+        processes=args.processes,
+    )
+    print(result.report())
+    return 0
+
+
+def serve_command(args: argparse.Namespace) -> int:
+    try:
+        app = load_app(args.app)
+    except (ImportError, AttributeError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    server = serve.make_server(
+        app,
+        format=args.format,
+        host=args.host,
+        port=args.port,
+        multi_value=not args.single_value,
+        quiet=args.quiet,
+    )
+    print(
+        f"Serving {args.app} with format {args.format} events on "
+        + f"http://{args.host}:{server.server_port}/",
+        file=sys.stderr,
+    )
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable, Iterator
+from time import monotonic
+from typing import Any
+
+from apig_wsgi import TIMEOUT_BODY, FileWrapper
+from apig_wsgi.compat import StartResponse, WSGIApplication
+
+__all__ = ("Coalescer",)
+
+DEFAULT_VARY_HEADERS = (
+    "Accept",
+    "Accept-Encoding",
+    "Accept-Language",
+    "Authorization",
+    "Cookie",
+)
+
+# Most keys remembered as unshareable at once, dropping the oldest beyond it.
+MAX_UNSHAREABLE_KEYS = 1024
+
+
+class InFlight:
+    """
+    A request being handled by the app, that identical requests wait on.
+    """
+
+    __slots__ = ("done", "result", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        # (status, headers, body), or None if the response can't be shared.
+        self.result: tuple[str, list[tuple[str, str]], bytes] | None = None
+        self.waiters = 0
+
+
+class Coalescer:
+    """
+    Coalesce identical concurrent GET and HEAD requests, so that only the
+    first runs the app and the others wait for, and share, its response.
+
+    Requests are identical if they have the same method, host, path, query
+    string, and values for `vary_headers`. Responses setting cookies, or
+    marked "Cache-Control: private", aren't shared - requests waiting on them
+    run the app themselves. Nor are wsgi.file_wrapper responses, or
+    responses that pass the request's deadline.
+
+    Keys whose last response wasn't shared, or whose app call raised, are
+    remembered for `unshareable_ttl` seconds, during which their requests
+    run the app straight away rather than waiting on each other.
+    """
+
+    def __init__(
+        self,
+        *,
+        vary_headers: Iterable[str] = DEFAULT_VARY_HEADERS,
+        unshareable_ttl: float = 5.0,
+    ) -> None:
+        self.vary_keys = tuple(
+            "HTTP_" + name.upper().replace("-", "_") for name in vary_headers
+        )
+        self.unshareable_ttl = unshareable_ttl
+        self.lock = threading.Lock()
+        self.in_flight: dict[tuple[Any, ...], InFlight] = {}
+        # Keys to not coalesce, and when to stop remembering them, oldest
+        # first.
+        self.unshareable: dict[tuple[Any, ...], float] = {}
+
+    def wrap(self, app: WSGIApplication) -> WSGIApplication:
+        def coalescing_app(
+            environ: dict[str, Any], start_response: StartResponse
+        ) -> Iterable[bytes]:
+            method = environ["REQUEST_METHOD"]
+            if method != "GET" and method != "HEAD":
+                return app(environ, start_response)
+
+            key = (
+                method,
+                environ.get("HTTP_HOST") or environ["SERVER_NAME"],
+                environ["SCRIPT_NAME"],
+                environ["PATH_INFO"],
+                environ.get("QUERY_STRING") or "",
+                *[environ.get(vary_key) or "" for vary_key in self.vary_keys],
+            )
+            flight: InFlight | None
+            with self.lock:
+                if self.recently_unshareable(key):
+                    flight = None
+                else:
+                    flight = self.in_flight.get(key)
+                    if flight is None:
+                        flight = self.in_flight[key] = InFlight()
+                        leader = True
+                    else:
+                        flight.waiters += 1
+                        leader = False
+
+            if flight is None:
+                return app(environ, start_response)
+
+            if not leader:
+                deadline = environ.get("apig_wsgi.deadline")
+                timeout = None if deadline is None else max(deadline - monotonic(), 0)
+                if not flight.done.wait(timeout):
+                    # The handler replaces this with its own 504, since the
+                    # deadline has passed.
+                    start_response(
+                        "504 Gateway Timeout", [("Content-Type", "text/plain")]
+                    )
+                    return [TIMEOUT_BODY]
+                if flight.result is None:
+                    return app(environ, start_response)
+                status, headers, body = flight.result
+                start_response(status, list(headers))
+                return [body]
+
+            try:
+                return lead(app, environ, start_response, flight)
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+                    if flight.result is None and self.unshareable_ttl > 0:
+                        self.remember_unshareable(key)
+                flight.done.set()
+
+        return coalescing_app
+
+    def recently_unshareable(self, key: tuple[Any, ...]) -> bool:
+        """
+        Return whether `key` is remembered as not worth coalescing, forgetting
+        it if it has expired. Must be called with the lock held.
+        """
+        expires = self.unshareable.get(key)
+        if expires is None:
+            return False
+        if expires > monotonic():
+            return True
+        del self.unshareable[key]
+        return False
+
+    def remember_unshareable(self, key: tuple[Any, ...]) -> None:
+        """
+        Remember that `key` isn't worth coalescing. Must be called with the
+        lock held.
+        """
+        self.unshareable.pop(key, None)
+        self.unshareable[key] = monotonic() + self.unshareable_ttl
+        if len(self.unshareable) > MAX_UNSHAREABLE_KEYS:
+            del self.unshareable[next(iter(self.unshareable))]
+
+
+def lead(
+    app: WSGIApplication,
+    environ: dict[str, Any],
+    start_response: StartResponse,
+    flight: InFlight,
+) -> Iterable[bytes]:
+    """
+    Call the app for a request others may be waiting on. If its response can
+    be shared, read it in full and store it on `flight`. Otherwise, return it
+    to be consumed as normal.
+    """
+    response: list[Any] = []
+    # Data passed to write(), and any chunk read to get start_response()
+    # called, in order.
+    prefix: list[bytes] = []
+
+    def capture(
+        status: str, headers: list[tuple[str, str]], exc_info: Any = None
+    ) -> Any:
+        if exc_info is not None and exc_info[0] is not None:
+            raise exc_info[0](exc_info[1]).with_traceback(exc_info[2])
+        response[:] = [status, list(headers)]
+        return prefix.append
+
+    result = app(environ, capture)
+    if isinstance(result, FileWrapper):
+        # Leave wrapped files for the handler to memory map.
+        if response:
+            start_response(*response)
+        return result
+
+    iterator = iter(result)
+    if not response:
+        # Generators call start_response() when first iterated.
+        try:
+            for data in iterator:
+                prefix.append(data)
+                break
+        except BaseException:
+            close_result(result)
+            raise
+    if not response or not shareable(response[1]):
+        if response:
+            start_response(*response)
+        if not prefix:
+            return result
+        return Passthrough(prefix, iterator, result)
+
+    status, headers = response
+    head = environ["REQUEST_METHOD"] == "HEAD"
+    deadline = environ.get("apig_wsgi.deadline")
+    size = sum(len(data) for data in prefix)
+    timed_out = False
+    try:
+        for data in iterator:
+            if deadline is not None and monotonic() > deadline:
+                timed_out = True
+                break
+            size += len(data)
+            if not head:
+                prefix.append(data)
+    finally:
+        close_result(result)
+
+    if timed_out:
+        # Left for the handler to replace with a 504, when it checks the
+        # deadline on reading the first chunk.
+        start_response(status, headers)
+        return [b""]
+
+    if head:
+        # Like the handler's own HEAD responses, share the size rather than
+        # the body.
+        status_code = int(status.split()[0])
+        if (
+            status_code >= 200
+            and status_code != 204
+            and status_code != 304
+            and not any(key.lower() == "content-length" for key, _ in headers)
+        ):
+            headers.append(("Content-Length", str(size)))
+        body = b""
+    else:
+        body = b"".join(prefix)
+    flight.result = (status, headers, body)
+    start_response(status, headers)
+    return [body]
+
+
+class Passthrough:
+    """
+    A response iterable, with chunks already read from it put back in front.
+    """
+
+    def __init__(
+        self, prefix: list[bytes], iterator: Iterator[bytes], result: Iterable[bytes]
+    ) -> None:
+        self.prefix = prefix
+        self.iterator = iterator
+        self.result = result
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self.prefix
+        yield from self.iterator
+
+    def close(self) -> None:
+        close_result(self.result)
+
+
+def close_result(result: Iterable[bytes]) -> None:
+    close = getattr(result, "close", None)
+    if close:
+        close()
+
+
+def shareable(headers: list[tuple[str, str]]) -> bool:
+    for key, value in headers:
+        key = key.lower()
+        if key == "set-cookie":
+            return False
+        if key == "cache-control" and "private" in value.lower():
+            return False
+    return True
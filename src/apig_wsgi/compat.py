@@ -1,16 +1,21 @@
 from __future__ import annotations
 
 import sys
+from collections.abc import Callable
+from typing import Any
 
-__all__ = ["WSGIApplication"]
+__all__ = ["LambdaHandler", "StartResponse", "WSGIApplication"]
+
+# A Lambda handler function for HTTP events, taking the event and context.
+LambdaHandler = Callable[[dict[str, Any], Any], dict[str, Any]]
 
 if sys.version_info >= (3, 11):
-    from wsgiref.types import WSGIApplication
+    from wsgiref.types import StartResponse, WSGIApplication
 else:
     # Partial backport of wsgiref.types
-    from collections.abc import Callable, Iterable
+    from collections.abc import Iterable
     from types import TracebackType
-    from typing import Any, Protocol
+    from typing import Protocol
 
     _ExcInfo = tuple[type[BaseException], BaseException, TracebackType]
     _OptExcInfo = _ExcInfo | tuple[None, None, None]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import sys
+import traceback
+from collections.abc import Iterable
+from typing import Any
+
+__all__ = ("ErrorBoundary",)
+
+
+class ErrorBoundary:
+    """
+    Turn exceptions raised by the WSGI app into error responses, rather than
+    letting them escape the handler, logging each traceback once.
+
+    Parameters
+    ----------
+    status_code : int
+        Status code of the error response.
+    headers : iterable of (str, str)
+        Headers of the error response.
+    body : str
+        Body of the error response.
+    escalate_after : int
+        If set, once this many consecutive invocations have failed, re-raise
+        their exceptions, so that Lambda reports them as function errors,
+        until an invocation succeeds.
+    """
+
+    def __init__(
+        self,
+        *,
+        status_code: int = 500,
+        headers: Iterable[tuple[str, str]] = (("Content-Type", "text/plain"),),
+        body: str = "Internal Server Error",
+        escalate_after: int | None = None,
+    ) -> None:
+        if escalate_after is not None and escalate_after < 1:
+            raise ValueError("escalate_after must be at least 1.")
+        self.status_code = status_code
+        self.headers = tuple(headers)
+        self.body = body.encode("utf-8")
+        self.escalate_after = escalate_after
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    def handle(self, environ: dict[str, Any]) -> bool:
+        """
+        Record and log the exception being handled, returning whether it
+        should be re-raised.
+        """
+        self.failures += 1
+        self.consecutive_failures += 1
+        if (
+            self.escalate_after is not None
+            and self.consecutive_failures >= self.escalate_after
+        ):
+            # Lambda logs the traceback of exceptions it reports.
+            return True
+        traceback.print_exc(file=environ.get("wsgi.errors", sys.stderr))
+        return False
+
+    def succeeded(self) -> None:
+        """
+        Record an invocation that raised no exception, ending any run of
+        consecutive failures.
+        """
+        self.consecutive_failures = 0
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+__all__ = ("RequestLimits",)
+
+
+@dataclass(frozen=True)
+class RequestLimits:
+    """
+    Limits on the size of requests, checked on the raw event before the WSGI
+    environ is built. Limits set to None aren't checked.
+
+    Parameters
+    ----------
+    max_header_count : int
+        Maximum number of header values, counting each value of a repeated
+        header, and format version 2 cookies as one header. Exceeding it
+        gives a 431 response.
+    max_header_bytes : int
+        Maximum total length of header names and values. Exceeding it gives a
+        431 response.
+    max_query_params : int
+        Maximum number of query string parameters, counting each value of a
+        repeated parameter. Exceeding it gives a 414 response.
+    max_body_size : int
+        Maximum size of the decoded request body, in bytes. Exceeding it gives
+        a 413 response.
+    headers : tuple of (str, str)
+        Extra headers for rejection responses. These responses skip
+        middleware response stages, so headers such as CORS ones that
+        middleware adds need repeating here.
+    """
+
+    max_header_count: int | None = None
+    max_header_bytes: int | None = None
+    max_query_params: int | None = None
+    max_body_size: int | None = None
+    headers: tuple[tuple[str, str], ...] = ()
+
+    def check(self, event: dict[str, Any]) -> int | None:
+        """
+        Return the status code to reject the event with, or None if it's
+        within the limits.
+        """
+        if self.max_header_count is not None or self.max_header_bytes is not None:
+            count, size = header_size(event)
+            if (
+                self.max_header_count is not None and count > self.max_header_count
+            ) or (self.max_header_bytes is not None and size > self.max_header_bytes):
+                return 431
+
+        if (
+            self.max_query_params is not None
+            and query_param_count(event) > self.max_query_params
+        ):
+            return 414
+
+        if self.max_body_size is not None and body_exceeds(event, self.max_body_size):
+            return 413
+
+        return None
+
+
+def header_size(event: dict[str, Any]) -> tuple[int, int]:
+    """
+    Return the number of header values in the event, and their total length
+    with their names.
+    """
+    headers = event.get("multiValueHeaders") or event.get("headers") or {}
+    count = 0
+    size = 0
+    for name, value in headers.items():
+        if isinstance(value, list):
+            count += len(value)
+            size += len(name) * len(value) + sum(len(item) for item in value)
+        else:
+            count += 1
+            size += len(name) + len(value)
+    cookies = event.get("cookies")
+    if cookies:
+        # Joined into a single Cookie header.
+        count += 1
+        size += len("cookie") + sum(len(cookie) + 2 for cookie in cookies) - 2
+    return count, size
+
+
+def query_param_count(event: dict[str, Any]) -> int:
+    raw_query_string = event.get("rawQueryString")
+    if raw_query_string:
+        # Format version 2 combines repeated parameters' values with commas,
+        # so count them in the raw query string instead.
+        return sum(1 for part in raw_query_string.split("&") if part)
+    params = (
+        event.get("multiValueQueryStringParameters")
+        or event.get("queryStringParameters")
+        or event.get("query_string_parameters")
+        or {}
+    )
+    return sum(
+        len(value) if isinstance(value, list) else 1 for value in params.values()
+    )
+
+
+def body_exceeds(event: dict[str, Any], max_size: int) -> bool:
+    """
+    Return whether the event's decoded body is longer than `max_size` bytes,
+    without decoding it.
+    """
+    body = event.get("body")
+    if not body:
+        return False
+    if event.get("isBase64Encoded") or event.get("is_base64_encoded"):
+        padding = 2 if body.endswith("==") else 1 if body.endswith("=") else 0
+        return len(body) * 3 // 4 - padding > max_size
+    # Each character encodes to between one and four bytes of UTF-8.
+    if len(body) > max_size:
+        return True
+    if len(body) * 4 <= max_size:
+        return False
+    return len(body.encode("utf-8")) > max_size
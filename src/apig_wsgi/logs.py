@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import queue
+import sys
+import threading
+from functools import wraps
+from io import StringIO
+from typing import Any, Literal
+
+from apig_wsgi.compat import LambdaHandler
+
+__all__ = ("ErrorsBuffer",)
+
+BufferErrors = Literal["sync", "background"]
+
+
+class ErrorsBuffer(StringIO):
+    """
+    A wsgi.errors stream that buffers an invocation's output, to be written
+    in one go, with each line tagged with the request ID.
+    """
+
+    request_id: str | None = None
+
+    def tagged_value(self) -> str:
+        text = self.getvalue()
+        if not text or self.request_id is None:
+            return text
+        prefix = self.request_id + "\t"
+        return "".join(prefix + line for line in text.splitlines(keepends=True))
+
+
+_buffers = threading.local()
+
+
+def get_errors_buffer(request_id: str | None) -> ErrorsBuffer:
+    """
+    Return the current thread's ErrorsBuffer, emptied, for a new invocation.
+    """
+    try:
+        buffer: ErrorsBuffer = _buffers.buffer
+    except AttributeError:
+        buffer = _buffers.buffer = ErrorsBuffer()
+    else:
+        buffer.seek(0)
+        buffer.truncate()
+    buffer.request_id = request_id
+    return buffer
+
+
+def current_errors_buffer() -> ErrorsBuffer:
+    """
+    Return the ErrorsBuffer for the current thread's invocation.
+    """
+    buffer: ErrorsBuffer = _buffers.buffer
+    return buffer
+
+
+def wrap(handler: LambdaHandler, mode: BufferErrors) -> LambdaHandler:
+    """
+    Wrap a handler to give each invocation a fresh ErrorsBuffer, written
+    after it returns or raises, in the calling thread for "sync" mode, or
+    by a background thread for "background" mode.
+    """
+    write = write_errors if mode == "sync" else background_writer.write
+
+    @wraps(handler)
+    def buffering_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+        buffer = get_errors_buffer(getattr(context, "aws_request_id", None))
+        try:
+            return handler(event, context)
+        finally:
+            write(buffer)
+
+    return buffering_handler
+
+
+def write_errors(buffer: ErrorsBuffer) -> None:
+    """
+    Write the buffer's contents to stderr in a single write.
+    """
+    text = buffer.tagged_value()
+    if text:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+
+
+class BackgroundWriter:
+    """
+    Write buffers' contents to stderr from a daemon thread, so invocations
+    don't wait on the log pipe.
+    """
+
+    def __init__(self) -> None:
+        self.queue: queue.Queue[str] = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+
+    def write(self, buffer: ErrorsBuffer) -> None:
+        text = buffer.tagged_value()
+        if not text:
+            return
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(
+                        target=self.run, name="apig-wsgi-errors", daemon=True
+                    )
+                    self.thread.start()
+        self.queue.put(text)
+
+    def run(self) -> None:
+        while True:
+            text = self.queue.get()
+            # Combine everything queued so far into one write.
+            parts = [text]
+            while True:
+                try:
+                    parts.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                sys.stderr.write("".join(parts))
+                sys.stderr.flush()
+            except (OSError, ValueError):
+                # stderr is closed - there's nowhere to report this.
+                pass
+            finally:
+                for _ in parts:
+                    self.queue.task_done()
+
+    def join(self) -> None:
+        """
+        Wait until everything queued has been written.
+        """
+        self.queue.join()
+
+
+background_writer = BackgroundWriter()
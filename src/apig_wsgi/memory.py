@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import gc
+import os
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any
+
+from apig_wsgi.compat import LambdaHandler
+
+__all__ = ("MemoryStats", "MemoryWatchdog")
+
+STATM_PATH = "/proc/self/statm"
+
+
+@dataclass
+class MemoryStats:
+    """
+    Measurements from a MemoryWatchdog.
+    """
+
+    # Resident set size and memory limit at the last sample, in bytes.
+    rss_bytes: int | None = None
+    limit_bytes: int | None = None
+    samples: int = 0
+    collections: int = 0
+    collected_objects: int = 0
+    # Resident set size after the last collection, in bytes.
+    rss_after_collect_bytes: int | None = None
+
+    @property
+    def usage(self) -> float | None:
+        """
+        Fraction of the memory limit used at the last sample.
+        """
+        if self.rss_bytes is None or not self.limit_bytes:
+            return None
+        return self.rss_bytes / self.limit_bytes
+
+
+class MemoryWatchdog:
+    """
+    Sample the process's resident memory every `every` invocations, after the
+    handler returns, and compare it to the function's memory limit from the
+    Lambda context.
+
+    Parameters
+    ----------
+    every : int
+        Sample memory after one invocation in this many.
+    collect_threshold : float
+        Fraction of the memory limit at which to run a full garbage
+        collection.
+    recycle_threshold : float
+        Fraction of the memory limit which, if still exceeded after garbage
+        collection, sets `recycle` and calls `on_recycle`.
+    on_recycle : function
+        Optional callback, called with the MemoryStats when memory use stays
+        above `recycle_threshold`, for example to exit a worker process.
+    """
+
+    def __init__(
+        self,
+        every: int = 100,
+        *,
+        collect_threshold: float = 0.8,
+        recycle_threshold: float = 0.9,
+        on_recycle: Callable[[MemoryStats], object] | None = None,
+        statm_path: str = STATM_PATH,
+    ) -> None:
+        if every < 1:
+            raise ValueError("Sampling interval must be at least 1.")
+        if not 0 < collect_threshold <= recycle_threshold:
+            raise ValueError(
+                "Thresholds must satisfy 0 < collect_threshold <= recycle_threshold."
+            )
+        self.every = every
+        self.collect_threshold = collect_threshold
+        self.recycle_threshold = recycle_threshold
+        self.on_recycle = on_recycle
+        self.statm_path = statm_path
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.count = 0
+        self.stats = MemoryStats()
+        self.recycle = False
+
+    def wrap(self, handler: LambdaHandler) -> LambdaHandler:
+        @wraps(handler)
+        def watched_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+            response = handler(event, context)
+            self.count += 1
+            if not self.count % self.every:
+                self.check(getattr(context, "memory_limit_in_mb", None))
+            return response
+
+        return watched_handler
+
+    def check(self, memory_limit_in_mb: int | str | None) -> None:
+        """
+        Sample memory use, collecting garbage and requesting recycling if
+        thresholds are crossed.
+        """
+        if memory_limit_in_mb is None:
+            return
+        rss = self.read_rss()
+        if rss is None:
+            return
+        stats = self.stats
+        limit = int(memory_limit_in_mb) * 1024 * 1024
+        stats.samples += 1
+        stats.rss_bytes = rss
+        stats.limit_bytes = limit
+        if rss < limit * self.collect_threshold:
+            return
+
+        stats.collections += 1
+        stats.collected_objects += gc.collect()
+        rss = self.read_rss()
+        stats.rss_after_collect_bytes = rss
+        if rss is not None and rss >= limit * self.recycle_threshold:
+            self.recycle = True
+            if self.on_recycle is not None:
+                self.on_recycle(stats)
+
+    def read_rss(self) -> int | None:
+        """
+        Return the process's resident set size in bytes, or None where
+        /proc isn't available.
+        """
+        try:
+            with open(self.statm_path, "rb") as file:
+                fields = file.read().split()
+        except OSError:
+            return None
+        return int(fields[1]) * self.page_size
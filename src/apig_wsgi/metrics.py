@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import json
+import math
+import sys
+import time
+from collections.abc import Callable
+from typing import TextIO
+
+from apig_wsgi import Timing
+
+__all__ = ("EMFMetrics", "Histogram", "LatencyHistograms")
+
+DIMENSIONS = ("Route", "Method", "StatusCode", "EventVersion")
+
+METRICS = (
+    ("EnvironTime", "Milliseconds"),
+    ("AppTime", "Milliseconds"),
+    ("ConsumeTime", "Milliseconds"),
+    ("EncodeTime", "Milliseconds"),
+    ("TotalTime", "Milliseconds"),
+    ("RequestBodySize", "Bytes"),
+    ("ResponseBodySize", "Bytes"),
+    ("Base64Expansion", "Bytes"),
+    ("ColdStart", "Count"),
+)
+
+# CloudWatch accepts at most 100 values per metric in one EMF document.
+MAX_VALUES = 100
+
+
+class EMFMetrics:
+    """
+    An ``on_timing`` callback that writes CloudWatch Embedded Metric Format
+    (EMF) log lines to stdout.
+
+    Parameters
+    ----------
+    namespace : str
+        CloudWatch metric namespace.
+    route : function
+        Callable taking a `Timing` and returning the value for the "Route"
+        dimension, such as a route template. Without one, there is no "Route"
+        dimension, since raw paths would create a metric per path.
+    flush_every : int
+        Number of invocations to aggregate before writing. With the default of
+        1, one line is written per invocation.
+    flush_interval : float
+        Seconds after the first aggregated value to write, even if fewer than
+        `flush_every` invocations have happened, or None to disable.
+    stream : file
+        Text stream to write to. Defaults to the current `sys.stdout`.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        route: Callable[[Timing], str] | None = None,
+        flush_every: int = 1,
+        flush_interval: float | None = 60.0,
+        stream: TextIO | None = None,
+    ) -> None:
+        if flush_every < 1:
+            raise ValueError("flush_every must be at least 1.")
+        self.route = route
+        self.dimensions = DIMENSIONS if route is not None else DIMENSIONS[1:]
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.stream = stream
+        self.cold_start = True
+        self.pending = 0
+        # When the first pending value was recorded, by time.monotonic().
+        self.first_pending = 0.0
+        self.groups: dict[tuple[str, ...], list[list[float]]] = {}
+        # Timestamps of each group's first value, in milliseconds.
+        self.timestamps: dict[tuple[str, ...], int] = {}
+        self.directive = json.dumps(
+            [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [list(self.dimensions)],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in METRICS],
+                }
+            ],
+            separators=(",", ":"),
+        )
+
+    def __call__(self, timing: Timing) -> None:
+        if timing.base64_encoded:
+            expansion = 4 * -(-timing.response_body_bytes // 3)
+            expansion -= timing.response_body_bytes
+        else:
+            expansion = 0
+        values = (
+            (timing.dispatch_ns + timing.environ_ns) / 1_000_000,
+            timing.app_ns / 1_000_000,
+            timing.consume_ns / 1_000_000,
+            timing.encode_ns / 1_000_000,
+            timing.total_ns / 1_000_000,
+            timing.request_body_bytes,
+            timing.response_body_bytes,
+            expansion,
+            1 if self.cold_start else 0,
+        )
+        self.cold_start = False
+
+        key: tuple[str, ...] = (timing.method, str(timing.status_code), timing.version)
+        if self.route is not None:
+            key = (self.route(timing), *key)
+        try:
+            columns = self.groups[key]
+        except KeyError:
+            columns = self.groups[key] = [[] for _ in METRICS]
+            self.timestamps[key] = int(time.time() * 1000)
+        for column, value in zip(columns, values, strict=True):
+            column.append(value)
+
+        if self.pending == 0:
+            self.first_pending = time.monotonic()
+        self.pending += 1
+        if (
+            self.pending >= self.flush_every
+            or len(columns[0]) >= MAX_VALUES
+            or (
+                self.flush_interval is not None
+                and time.monotonic() - self.first_pending >= self.flush_interval
+            )
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write any buffered metrics, in a single write call. Each line is
+        timestamped with when its first value was recorded.
+        """
+        if not self.groups:
+            return
+
+        suffix = f'"CloudWatchMetrics":{self.directive}}},'
+        lines = []
+        for key, columns in self.groups.items():
+            document: dict[str, object] = dict(zip(self.dimensions, key, strict=True))
+            for (name, _), column in zip(METRICS, columns, strict=True):
+                document[name] = column[0] if len(column) == 1 else column
+            lines.append(
+                f'{{"_aws":{{"Timestamp":{self.timestamps[key]},'
+                + suffix
+                + json.dumps(document, separators=(",", ":"))[1:]
+            )
+        self.groups = {}
+        self.timestamps = {}
+        self.pending = 0
+
+        stream = sys.stdout if self.stream is None else self.stream
+        stream.write("\n".join(lines) + "\n")
+
+
+# Histograms are log-linear: each power of two range is split into
+# 2 ** SUB_BUCKET_BITS linear buckets, bounding relative error to about 3%.
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+DEFAULT_PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Routes used when no route function is given, and for keys beyond max_keys.
+ALL_ROUTES = "*"
+OTHER_ROUTE = "other"
+
+
+def bucket_index(value: int) -> int:
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    if index < SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    A fixed-memory log-linear histogram of non-negative integers.
+    """
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        if self.count == 0:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: Histogram) -> None:
+        """
+        Add the values recorded by `other` to this histogram.
+        """
+        if other.count == 0:
+            return
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        if self.count == 0:
+            self.min, self.max = other.min, other.max
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Return an estimate of the value below which `fraction` of recorded
+        values fall.
+        """
+        if self.count == 0:
+            return 0
+        rank = math.ceil(fraction * self.count)
+        if rank <= 1:
+            return self.min
+        if rank >= self.count:
+            return self.max
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return min(max((low + high) // 2, self.min), self.max)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+class LatencyHistograms:
+    """
+    An ``on_timing`` callback that keeps a latency histogram of total handler
+    time per (method, route, status code), periodically writing a summary line
+    of JSON per key.
+
+    Parameters
+    ----------
+    route : function
+        Callable taking a `Timing` and returning a normalized route, such as
+        "/users/{id}". Without one, all requests share the route "*".
+    max_keys : int
+        Maximum number of histograms kept between writes. Requests for new
+        keys beyond it are counted under the route "other".
+    flush_interval : float
+        Seconds between writes, or None to disable time-based flushing.
+    flush_every : int
+        Number of invocations between writes, or None to disable count-based
+        flushing.
+    percentiles : tuple of float
+        Percentiles to report, as fractions.
+    stream : file
+        Text stream to write to. Defaults to the current `sys.stdout`.
+    """
+
+    def __init__(
+        self,
+        *,
+        route: Callable[[Timing], str] | None = None,
+        max_keys: int = 100,
+        flush_interval: float | None = 60.0,
+        flush_every: int | None = None,
+        percentiles: tuple[float, ...] = DEFAULT_PERCENTILES,
+        stream: TextIO | None = None,
+    ) -> None:
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1.")
+        self.route = route
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.percentiles = percentiles
+        self.stream = stream
+        self.histograms: dict[tuple[str, str, int], Histogram] = {}
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def __call__(self, timing: Timing) -> None:
+        route = ALL_ROUTES if self.route is None else self.route(timing)
+        key = (timing.method, route, timing.status_code)
+        try:
+            histogram = self.histograms[key]
+        except KeyError:
+            if len(self.histograms) >= self.max_keys:
+                key = (timing.method, OTHER_ROUTE, timing.status_code)
+            try:
+                histogram = self.histograms[key]
+            except KeyError:
+                histogram = self.histograms[key] = Histogram()
+        histogram.record(timing.total_ns)
+
+        self.pending += 1
+        if (self.flush_every is not None and self.pending >= self.flush_every) or (
+            self.flush_interval is not None
+            and time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write a summary of each histogram in a single write call, and reset.
+        """
+        self.last_flush = time.monotonic()
+        self.pending = 0
+        if not self.histograms:
+            return
+
+        lines = []
+        for (method, route, status_code), histogram in self.histograms.items():
+            summary: dict[str, object] = {
+                "method": method,
+                "route": route,
+                "status": status_code,
+                "count": histogram.count,
+                "min_ms": histogram.min / 1_000_000,
+                "mean_ms": histogram.total / histogram.count / 1_000_000,
+                "max_ms": histogram.max / 1_000_000,
+            }
+            for fraction in self.percentiles:
+                name = "p" + f"{fraction * 100:g}".replace(".", "")
+                summary[f"{name}_ms"] = histogram.percentile(fraction) / 1_000_000
+            lines.append(json.dumps(summary, separators=(",", ":")))
+        self.histograms = {}
+
+        stream = sys.stdout if self.stream is None else self.stream
+        stream.write("\n".join(lines) + "\n")
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+from typing import Any
+
+__all__ = ("Middleware",)
+
+EventStage = Callable[[dict[str, Any], Any], "dict[str, Any] | None"]
+EnvironStage = Callable[[dict[str, Any]], None]
+ResponseStage = Callable[[dict[str, Any], dict[str, Any]], dict[str, Any]]
+
+
+class Middleware:
+    """
+    Hooks into the handler at up to three stages. Subclasses override the
+    methods for the stages they need - only overridden methods are called.
+    """
+
+    def process_event(
+        self, event: dict[str, Any], context: Any
+    ) -> dict[str, Any] | None:
+        """
+        Called with the raw event, before the WSGI environ is built. Return a
+        response to return it immediately, skipping the rest of the handler,
+        or None to continue.
+        """
+        return None
+
+    def process_environ(self, environ: dict[str, Any]) -> None:
+        """
+        Called with the WSGI environ, before the app is called.
+        """
+
+    def process_response(
+        self, environ: dict[str, Any], response: dict[str, Any]
+    ) -> dict[str, Any]:
+        """
+        Called with the WSGI environ and the response to return, in the event
+        source's format. Return the response to use, which may be the same
+        dict, modified.
+        """
+        return response
+
+
+def overridden(middleware: Sequence[Any], name: str) -> list[Any]:
+    """
+    Return the bound `name` methods of the middleware that override the
+    default.
+    """
+    default = getattr(Middleware, name)
+    return [
+        getattr(instance, name)
+        for instance in middleware
+        if getattr(type(instance), name, default) is not default
+    ]
+
+
+def compose(
+    middleware: Sequence[Any],
+) -> tuple[EventStage | None, EnvironStage | None, ResponseStage | None]:
+    """
+    Combine the middleware's stages into one function per stage, or None
+    for stages that no middleware uses. Event and environ stages run in
+    order, and response stages in reverse order.
+    """
+    event_stages: list[EventStage] = overridden(middleware, "process_event")
+    environ_stages: list[EnvironStage] = overridden(middleware, "process_environ")
+    response_stages: list[ResponseStage] = overridden(middleware, "process_response")
+    response_stages.reverse()
+
+    event_stage: EventStage | None
+    if len(event_stages) > 1:
+
+        def event_stage(event: dict[str, Any], context: Any) -> dict[str, Any] | None:
+            for stage in event_stages:
+                response = stage(event, context)
+                if response is not None:
+                    return response
+            return None
+
+    else:
+        event_stage = event_stages[0] if event_stages else None
+
+    environ_stage: EnvironStage | None
+    if len(environ_stages) > 1:
+
+        def environ_stage(environ: dict[str, Any]) -> None:
+            for stage in environ_stages:
+                stage(environ)
+
+    else:
+        environ_stage = environ_stages[0] if environ_stages else None
+
+    response_stage: ResponseStage | None
+    if len(response_stages) > 1:
+
+        def response_stage(
+            environ: dict[str, Any], response: dict[str, Any]
+        ) -> dict[str, Any]:
+            for stage in response_stages:
+                response = stage(environ, response)
+            return response
+
+    else:
+        response_stage = response_stages[0] if response_stages else None
+
+    return event_stage, environ_stage, response_stage
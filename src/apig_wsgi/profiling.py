@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import cProfile
+import os
+import re
+import sys
+import tracemalloc
+from collections import deque
+from collections.abc import Callable, Mapping
+from functools import wraps
+from pathlib import Path
+from typing import Any
+
+from apig_wsgi.compat import LambdaHandler
+
+__all__ = ("Profiler",)
+
+
+MODES = {
+    "cprofile": ".prof",
+    "tracemalloc": ".tracemalloc",
+}
+
+DEFAULT_EVERY = 100
+DEFAULT_DIRECTORY = "/tmp"
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Profiler:
+    """
+    Profile one invocation in every `every`, writing the results to files in
+    `directory`, and deleting the oldest files to stay under `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        *,
+        every: int = DEFAULT_EVERY,
+        directory: str | os.PathLike[str] = DEFAULT_DIRECTORY,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(
+                f"Unknown profiling mode {mode!r}, should be one of: "
+                + ", ".join(repr(m) for m in MODES)
+            )
+        if every < 1:
+            raise ValueError("Profiling interval must be at least 1.")
+        self.mode = mode
+        self.suffix = MODES[mode]
+        self.every = every
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.count = 0
+        self.written: deque[tuple[Path, int]] = deque()
+        self.written_bytes = 0
+
+    @classmethod
+    def from_environ(cls, environ: Mapping[str, str]) -> Profiler | None:
+        """
+        Create a Profiler from APIG_WSGI_PROFILE* environment variables, or
+        return None if profiling is not enabled.
+        """
+        mode = environ.get("APIG_WSGI_PROFILE", "")
+        if not mode:
+            return None
+        return cls(
+            mode,
+            every=int(environ.get("APIG_WSGI_PROFILE_EVERY", DEFAULT_EVERY)),
+            directory=environ.get("APIG_WSGI_PROFILE_DIR", DEFAULT_DIRECTORY),
+            max_bytes=int(
+                environ.get("APIG_WSGI_PROFILE_MAX_BYTES", DEFAULT_MAX_BYTES)
+            ),
+        )
+
+    def wrap(self, handler: LambdaHandler) -> LambdaHandler:
+        if self.mode == "cprofile":
+            profile = self.profile_cprofile
+        else:
+            profile = self.profile_tracemalloc
+
+        @wraps(handler)
+        def profiling_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+            self.count += 1
+            if self.count % self.every:
+                return handler(event, context)
+            return profile(handler, event, context)
+
+        return profiling_handler
+
+    def profile_cprofile(
+        self, handler: LambdaHandler, event: dict[str, Any], context: Any
+    ) -> dict[str, Any]:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return handler(event, context)
+        finally:
+            profile.disable()
+            self.save(context, profile.dump_stats)
+
+    def profile_tracemalloc(
+        self, handler: LambdaHandler, event: dict[str, Any], context: Any
+    ) -> dict[str, Any]:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            return handler(event, context)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            if started:
+                tracemalloc.stop()
+            self.save(context, snapshot.dump)
+
+    def save(self, context: Any, dump: Callable[[str], object]) -> None:
+        """
+        Write a profile with `dump`, logging rather than raising errors, so
+        that profiling never fails an invocation.
+        """
+        path = self.path(context)
+        try:
+            dump(str(path))
+            self.rotate(path)
+        except OSError as exc:
+            sys.stderr.write(f"apig-wsgi: could not write profile {path}: {exc}\n")
+
+    def path(self, context: Any) -> Path:
+        request_id = getattr(context, "aws_request_id", None) or str(self.count)
+        name = UNSAFE_FILENAME_RE.sub("_", request_id)
+        return self.directory / f"apig-wsgi-{name}{self.suffix}"
+
+    def rotate(self, path: Path) -> None:
+        size = path.stat().st_size
+        self.written.append((path, size))
+        self.written_bytes += size
+        while self.written_bytes > self.max_bytes and len(self.written) > 1:
+            old_path, old_size = self.written.popleft()
+            old_path.unlink(missing_ok=True)
+            self.written_bytes -= old_size
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable
+from functools import wraps
+from pathlib import Path
+from typing import Any
+
+from apig_wsgi.compat import LambdaHandler
+
+__all__ = ("EventRecorder",)
+
+DEFAULT_PATH = "/tmp/apig-wsgi-events.jsonl.gz"
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_REDACT_HEADERS = (
+    "authorization",
+    "cookie",
+    "proxy-authorization",
+    "set-cookie",
+    "x-api-key",
+)
+
+REDACTED = "[REDACTED]"
+
+
+class EventRecorder:
+    """
+    Record one event in every `every`, and optionally their responses, with
+    sensitive headers and cookies redacted and bodies truncated.
+
+    Records are buffered, then appended to a gzip-compressed JSON lines file
+    at `path`, or passed to `callback` as a list, every `flush_every` records.
+
+    Parameters
+    ----------
+    every : int
+        Record one invocation in this many.
+    path : str or Path
+        File to append records to. Writing stops once it exceeds `max_bytes`.
+    callback : function
+        If set, called with each list of records instead of writing to `path`.
+    record_responses : bool
+        Whether to record responses as well as events.
+    redact_headers : iterable of str
+        Names of headers whose values are replaced with "[REDACTED]", in
+        events and responses. If this includes "cookie", the v2 `cookies` list
+        is redacted too.
+    redact_cookies : iterable of str
+        Names of individual cookies whose values are redacted, when the
+        cookie header isn't redacted entirely.
+    max_body_size : int
+        Bodies longer than this many characters are truncated.
+    flush_every : int
+        Number of records to buffer before writing them.
+    """
+
+    def __init__(
+        self,
+        every: int = 100,
+        *,
+        path: str | os.PathLike[str] = DEFAULT_PATH,
+        callback: Callable[[list[dict[str, Any]]], object] | None = None,
+        record_responses: bool = False,
+        redact_headers: Iterable[str] = DEFAULT_REDACT_HEADERS,
+        redact_cookies: Iterable[str] = (),
+        max_body_size: int = 64 * 1024,
+        flush_every: int = 10,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        if every < 1:
+            raise ValueError("Recording interval must be at least 1.")
+        if flush_every < 1:
+            raise ValueError("flush_every must be at least 1.")
+        self.every = every
+        self.path = Path(path)
+        self.callback = callback
+        self.record_responses = record_responses
+        self.redact_headers = frozenset(name.lower() for name in redact_headers)
+        self.redact_cookies = frozenset(redact_cookies)
+        self.max_body_size = max_body_size
+        self.flush_every = flush_every
+        self.max_bytes = max_bytes
+        self.count = 0
+        # Records, already redacted and truncated, waiting to be written.
+        self.pending: list[dict[str, Any]] = []
+
+    def wrap(self, handler: LambdaHandler) -> LambdaHandler:
+        @wraps(handler)
+        def recording_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+            self.count += 1
+            if self.count % self.every:
+                return handler(event, context)
+
+            # Redact the event before the handler, which may remove its body.
+            # Redacting copies the event and truncates its body, so large
+            # bodies aren't kept alive until the records are written.
+            record = self.make_record(
+                time.time(), getattr(context, "aws_request_id", None), event, None
+            )
+            response = handler(event, context)
+            if self.record_responses:
+                record["response"] = self.redact(response)
+            self.pending.append(record)
+            if len(self.pending) >= self.flush_every:
+                try:
+                    self.flush()
+                except Exception as exc:
+                    # Recording must never fail an invocation.
+                    sys.stderr.write(
+                        f"apig-wsgi: could not write recorded events: {exc!r}\n"
+                    )
+            return response
+
+        return recording_handler
+
+    def flush(self) -> None:
+        """
+        Write any buffered records.
+        """
+        if not self.pending:
+            return
+        records = self.pending
+        self.pending = []
+
+        if self.callback is not None:
+            self.callback(records)
+            return
+
+        try:
+            if self.path.stat().st_size >= self.max_bytes:
+                return
+        except FileNotFoundError:
+            pass
+        data = "".join(
+            json.dumps(record, separators=(",", ":")) + "\n" for record in records
+        )
+        # Each flush appends a gzip member, which readers decompress as one.
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write(data)
+
+    def make_record(
+        self,
+        timestamp: float,
+        request_id: str | None,
+        event: dict[str, Any],
+        response: dict[str, Any] | None,
+    ) -> dict[str, Any]:
+        record: dict[str, Any] = {
+            "timestamp": timestamp,
+            "request_id": request_id,
+            "event": self.redact(event),
+        }
+        if response is not None:
+            record["response"] = self.redact(response)
+        return record
+
+    def redact(self, message: dict[str, Any]) -> dict[str, Any]:
+        """
+        Return a copy of an event or response with headers and cookies
+        redacted and the body truncated.
+        """
+        message = dict(message)
+        for key in ("headers", "multiValueHeaders"):
+            headers = message.get(key)
+            if headers:
+                message[key] = {
+                    name: self.redact_header(name, value)
+                    for name, value in headers.items()
+                }
+        cookies = message.get("cookies")
+        if cookies:
+            if "cookie" in self.redact_headers or "set-cookie" in self.redact_headers:
+                message["cookies"] = [REDACTED for _ in cookies]
+            elif self.redact_cookies:
+                message["cookies"] = [self.redact_cookie(cookie) for cookie in cookies]
+
+        body = message.get("body")
+        if isinstance(body, str) and len(body) > self.max_body_size:
+            size = self.max_body_size
+            if message.get("isBase64Encoded") or message.get("is_base64_encoded"):
+                # Keep the truncated body decodable.
+                size -= size % 4
+            message["body"] = body[:size]
+            message["bodyTruncated"] = True
+        return message
+
+    def redact_header(self, name: str, value: Any) -> Any:
+        name = name.lower()
+        if name in self.redact_headers:
+            if isinstance(value, list):
+                return [REDACTED for _ in value]
+            return REDACTED
+        if self.redact_cookies and (name == "cookie" or name == "set-cookie"):
+            if isinstance(value, list):
+                return [self.redact_cookie(item) for item in value]
+            return self.redact_cookie(value)
+        return value
+
+    def redact_cookie(self, value: str) -> str:
+        """
+        Redact the values of named cookies in a Cookie or Set-Cookie header
+        value.
+        """
+        parts = []
+        for part in value.split(";"):
+            name, equals, _ = part.partition("=")
+            if equals and name.strip() in self.redact_cookies:
+                part = name + "=" + REDACTED
+            parts.append(part)
+        return ";".join(parts)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from apig_wsgi.compat import StartResponse, WSGIApplication
+
+__all__ = ("Router",)
+
+
+class Router:
+    """
+    WSGI application dispatching to other WSGI applications by path prefix
+    and/or hostname, moving the matched prefix from PATH_INFO to SCRIPT_NAME.
+
+    Keys of `apps` can be:
+
+    * A path prefix, such as "/admin", matched on whole path segments. An
+      empty prefix, "" or "/", matches all paths.
+    * A hostname, such as "admin.example.com", matching all paths on that host.
+    * A hostname followed by a path prefix, such as "example.com/admin".
+
+    The longest matching prefix for the request's host wins, falling back to
+    prefixes without a host.
+    """
+
+    def __init__(self, apps: Mapping[str, WSGIApplication]) -> None:
+        self.routes: dict[str | None, dict[str, WSGIApplication]] = {}
+        for key, app in apps.items():
+            if key.startswith("/") or key == "":
+                host = None
+                prefix = key
+            else:
+                host, slash, prefix = key.partition("/")
+                host = host.lower()
+                prefix = slash + prefix
+            self.routes.setdefault(host, {})[prefix.rstrip("/")] = app
+
+    def __call__(
+        self, environ: dict[str, Any], start_response: StartResponse
+    ) -> Iterable[bytes]:
+        path = environ["PATH_INFO"]
+        prefixes = None
+        if len(self.routes) > 1 or None not in self.routes:
+            host = environ.get("HTTP_HOST") or environ["SERVER_NAME"]
+            prefixes = self.routes.get(host.partition(":")[0].lower())
+        for candidates in (prefixes, self.routes.get(None)):
+            if candidates is None:
+                continue
+            prefix = path
+            while True:
+                app = candidates.get(prefix)
+                if app is not None:
+                    environ["SCRIPT_NAME"] += prefix
+                    environ["PATH_INFO"] = path[len(prefix) :]
+                    return app(environ, start_response)
+                if not prefix:
+                    break
+                prefix = prefix[: max(prefix.rfind("/"), 0)]
+
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"Not Found"]
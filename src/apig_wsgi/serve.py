@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import time
+import traceback
+import uuid
+from base64 import b64decode, b64encode
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qsl
+
+from apig_wsgi import make_lambda_handler
+from apig_wsgi.compat import LambdaHandler, WSGIApplication
+
+__all__ = ("LocalContext", "make_event", "make_server", "response_to_http")
+
+# Event formats the server can create, by event version.
+FORMATS = ("1.0", "alb", "2.0")
+
+
+class LocalContext:
+    """
+    Stand-in for the Lambda context object, for local requests.
+    """
+
+    function_name = "apig-wsgi-serve"
+    function_version = "$LATEST"
+    invoked_function_arn = (
+        "arn:aws:lambda:us-east-1:000000000000:function:apig-wsgi-serve"
+    )
+    memory_limit_in_mb = 128
+    log_group_name = "/aws/lambda/apig-wsgi-serve"
+    log_stream_name = "local"
+
+    def __init__(self, *, timeout_ms: int = 30_000) -> None:
+        self.aws_request_id = str(uuid.uuid4())
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(int((self.deadline - time.monotonic()) * 1000), 0)
+
+
+def make_event(
+    format: str,
+    *,
+    method: str,
+    target: str,
+    headers: list[tuple[str, str]],
+    body: bytes,
+    source_ip: str,
+    multi_value: bool = True,
+) -> dict[str, Any]:
+    """
+    Return an event in the given format for an HTTP request, as API Gateway
+    or an ALB would send it. `multi_value` controls whether ALB events use
+    multi-value headers and query strings, which API Gateway always sends for
+    format version 1.
+    """
+    path, _, query = target.partition("?")
+    try:
+        event_body = body.decode("utf-8")
+        is_base64_encoded = False
+    except UnicodeDecodeError:
+        event_body = b64encode(body).decode("ascii")
+        is_base64_encoded = True
+
+    if format == "2.0":
+        return make_event_v2(
+            method=method,
+            path=path,
+            query=query,
+            headers=headers,
+            body=event_body,
+            is_base64_encoded=is_base64_encoded,
+            source_ip=source_ip,
+        )
+    if format not in ("1.0", "alb"):
+        raise ValueError(f"Unknown format {format!r}")
+
+    # API Gateway and ALBs add the usual proxy headers.
+    headers = [
+        *headers,
+        ("X-Forwarded-For", source_ip),
+        ("X-Forwarded-Proto", "http"),
+    ]
+    if format == "1.0":
+        # API Gateway decodes query strings, ALBs pass them through as sent.
+        query_items = parse_qsl(query, keep_blank_values=True)
+    else:
+        query_items = [
+            (key, value)
+            for key, _, value in (part.partition("=") for part in query.split("&"))
+            if key
+        ]
+        headers = [(key.lower(), value) for key, value in headers]
+
+    event: dict[str, Any] = {
+        "httpMethod": method,
+        "path": path,
+        "body": event_body,
+        "isBase64Encoded": is_base64_encoded,
+    }
+    if format == "1.0":
+        event["version"] = "1.0"
+        event["resource"] = "/{proxy+}"
+        event["requestContext"] = {
+            "httpMethod": method,
+            "path": path,
+            "stage": "$default",
+            "requestId": str(uuid.uuid4()),
+            "requestTimeEpoch": int(time.time() * 1000),
+            "identity": {"sourceIp": source_ip},
+        }
+    else:
+        event["requestContext"] = {
+            "elb": {
+                "targetGroupArn": (
+                    "arn:aws:elasticloadbalancing:us-east-1:000000000000:"
+                    + "targetgroup/apig-wsgi-serve/0000000000000000"
+                )
+            }
+        }
+
+    if format == "1.0" or multi_value:
+        multi_headers: dict[str, list[str]] = {}
+        for key, value in headers:
+            multi_headers.setdefault(key, []).append(value)
+        multi_query: dict[str, list[str]] = {}
+        for key, value in query_items:
+            multi_query.setdefault(key, []).append(value)
+        event["multiValueHeaders"] = multi_headers
+        event["multiValueQueryStringParameters"] = multi_query or None
+    if format == "1.0" or not multi_value:
+        event["headers"] = dict(headers)
+        event["queryStringParameters"] = dict(query_items) or None
+    return event
+
+
+def make_event_v2(
+    *,
+    method: str,
+    path: str,
+    query: str,
+    headers: list[tuple[str, str]],
+    body: str,
+    is_base64_encoded: bool,
+    source_ip: str,
+) -> dict[str, Any]:
+    cookies: list[str] = []
+    event_headers: dict[str, str] = {}
+    for key, value in headers:
+        key = key.lower()
+        if key == "cookie":
+            cookies.extend(cookie for cookie in value.split("; ") if cookie)
+        elif key in event_headers:
+            event_headers[key] += "," + value
+        else:
+            event_headers[key] = value
+
+    query_params: dict[str, str] = {}
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        if key in query_params:
+            query_params[key] += "," + value
+        else:
+            query_params[key] = value
+
+    event: dict[str, Any] = {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": event_headers,
+        "requestContext": {
+            "http": {
+                "method": method,
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": source_ip,
+                "userAgent": event_headers.get("user-agent", ""),
+            },
+            "requestId": str(uuid.uuid4()),
+            "routeKey": "$default",
+            "stage": "$default",
+            "timeEpoch": int(time.time() * 1000),
+        },
+        "body": body,
+        "isBase64Encoded": is_base64_encoded,
+    }
+    if cookies:
+        event["cookies"] = cookies
+    if query_params:
+        event["queryStringParameters"] = query_params
+    return event
+
+
+def response_to_http(
+    response: dict[str, Any],
+) -> tuple[int, list[tuple[str, str]], bytes]:
+    """
+    Convert a response returned by the handler into (status code, headers,
+    body) for HTTP.
+    """
+    headers: list[tuple[str, str]] = []
+    for key, values in (response.get("multiValueHeaders") or {}).items():
+        headers.extend((key, value) for value in values)
+    headers.extend((response.get("headers") or {}).items())
+    headers.extend(("Set-Cookie", cookie) for cookie in response.get("cookies", ()))
+
+    body: str = response.get("body") or ""
+    if response.get("isBase64Encoded", False):
+        body_bytes = b64decode(body)
+    else:
+        body_bytes = body.encode("utf-8")
+    return response["statusCode"], headers, body_bytes
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: Server
+
+    def handle_request(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        event = make_event(
+            self.server.format,
+            method=self.command,
+            target=self.path,
+            headers=header_items(self.headers),
+            body=body,
+            source_ip=self.client_address[0],
+            multi_value=self.server.multi_value,
+        )
+        try:
+            response = self.server.handler(event, LocalContext())
+        except Exception:
+            # Like API Gateway, report handler errors as a bad gateway.
+            traceback.print_exc()
+            self.send_error(502)
+            return
+
+        status_code, headers, body = response_to_http(response)
+        self.send_response(status_code)
+        has_length = False
+        for key, value in headers:
+            has_length = has_length or key.lower() == "content-length"
+            self.send_header(key, value)
+        if not has_length:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = handle_request
+    do_HEAD = handle_request
+    do_POST = handle_request
+    do_PUT = handle_request
+    do_PATCH = handle_request
+    do_DELETE = handle_request
+    do_OPTIONS = handle_request
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def header_items(message: Message) -> list[tuple[str, str]]:
+    return [(key, str(value)) for key, value in message.items()]
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        handler: LambdaHandler,
+        *,
+        format: str,
+        multi_value: bool,
+        quiet: bool,
+    ) -> None:
+        self.handler = handler
+        self.format = format
+        self.multi_value = multi_value
+        self.quiet = quiet
+        super().__init__(address, RequestHandler)
+
+
+def make_server(
+    app: WSGIApplication,
+    *,
+    format: str = "2.0",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    multi_value: bool = True,
+    quiet: bool = False,
+    **kwargs: Any,
+) -> Server:
+    """
+    Return a threaded HTTP server that converts requests to events in the
+    given format, and calls a handler for `app` made with `kwargs`.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}")
+    return Server(
+        (host, port),
+        make_lambda_handler(app, **kwargs),
+        format=format,
+        multi_value=multi_value,
+        quiet=quiet,
+    )
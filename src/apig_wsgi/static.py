@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from base64 import b64encode
+from pathlib import Path
+from typing import Any
+
+from apig_wsgi import BaseResponse, EncodedBody
+
+__all__ = ("StaticFiles",)
+
+# Only bother compressing files at least this big.
+GZIP_MIN_SIZE = 256
+
+EMPTY_BODY = EncodedBody("", "", 0)
+
+
+class StaticFile:
+    def __init__(self, path: Path, *, max_age: int | None) -> None:
+        content = path.read_bytes()
+        content_type, encoding = mimetypes.guess_type(path.name)
+        if content_type is None:
+            content_type = "application/octet-stream"
+        elif content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+
+        self.etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+        self.cache_headers = [("ETag", self.etag)]
+        if max_age is not None:
+            self.cache_headers.append(("Cache-Control", f"public, max-age={max_age}"))
+
+        try:
+            text: str | None = content.decode("utf-8")
+        except UnicodeDecodeError:
+            text = None
+        self.body = EncodedBody(b64encode(content).decode("ascii"), text, len(content))
+        self.headers = [
+            ("Content-Type", content_type),
+            ("Content-Length", str(len(content))),
+            *self.cache_headers,
+        ]
+
+        self.gzip_body: EncodedBody | None = None
+        self.gzip_headers: list[tuple[str, str]] = []
+        # Files that are already compressed, such as .gz archives, are skipped.
+        if encoding is None and len(content) >= GZIP_MIN_SIZE:
+            compressed = gzip.compress(content, mtime=0)
+            if len(compressed) < len(content):
+                self.cache_headers.append(("Vary", "Accept-Encoding"))
+                self.headers.append(("Vary", "Accept-Encoding"))
+                self.gzip_body = EncodedBody(
+                    b64encode(compressed).decode("ascii"), None, len(compressed)
+                )
+                self.gzip_headers = [
+                    ("Content-Type", content_type),
+                    ("Content-Length", str(len(compressed))),
+                    ("Content-Encoding", "gzip"),
+                    *self.cache_headers,
+                ]
+
+
+class StaticFiles:
+    """
+    Serve the files in `directory` from memory, at URLs under `prefix`.
+
+    All files are read when the instance is created, and their base64 and
+    gzip encodings calculated, so serving them costs only a dictionary lookup.
+
+    Parameters
+    ----------
+    directory : str or Path
+        Directory to serve files from, recursively.
+    prefix : str
+        URL path prefix to serve the files under.
+    max_age : int
+        If set, add a `Cache-Control` header with this `max-age`.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        *,
+        prefix: str = "/",
+        max_age: int | None = None,
+    ) -> None:
+        root = Path(directory)
+        prefix = prefix.rstrip("/") + "/"
+        self.files: dict[str, StaticFile] = {}
+        for path in sorted(root.rglob("*")):
+            if path.is_file():
+                url = prefix + path.relative_to(root).as_posix()
+                self.files[url] = StaticFile(path, max_age=max_age)
+
+    def serve(self, environ: dict[str, Any], response: BaseResponse) -> bool:
+        """
+        Fill `response` with the matching file for the request, if any,
+        returning whether it did.
+        """
+        method = environ["REQUEST_METHOD"]
+        if method != "GET" and method != "HEAD":
+            return False
+        file = self.files.get(environ["PATH_INFO"])
+        if file is None:
+            return False
+
+        if file.etag in environ.get("HTTP_IF_NONE_MATCH", ""):
+            response.status_code = 304
+            response.headers = list(file.cache_headers)
+            response.encoded_body = EMPTY_BODY
+            return True
+
+        if (
+            file.gzip_body is not None
+            and response.binary_support
+            and "gzip" in environ.get("HTTP_ACCEPT_ENCODING", "")
+        ):
+            headers = file.gzip_headers
+            body = file.gzip_body
+        elif file.body.text is not None or response.binary_support:
+            headers = file.headers
+            body = file.body
+        else:
+            # A binary file can't be returned without binary support.
+            return False
+
+        response.status_code = 200
+        response.headers = list(headers)
+        if method == "HEAD":
+            response.encoded_body = EMPTY_BODY
+        else:
+            response.encoded_body = body
+        return True
@@ -1,14 +1,37 @@
 from __future__ import annotations
 
+import inspect
+import random
+import re
+import string
 import sys
+import time
+import tracemalloc
 from base64 import b64encode
 from collections.abc import Callable, Generator, Iterable
 from io import BytesIO
+from pathlib import Path
 from typing import Any
+from urllib.parse import urlencode
 
 import pytest
 
-from apig_wsgi import _ExcInfoType, make_lambda_handler
+import apig_wsgi
+from apig_wsgi import (
+    RESERVED_URI_CHARACTERS,
+    BaseResponse,
+    EventAdapter,
+    FileWrapper,
+    RetainFullEvent,
+    Timing,
+    V1Response,
+    V2Response,
+    _ExcInfoType,
+    encode_query_string,
+    get_environ_v1,
+    get_version,
+    make_lambda_handler,
+)
 
 
 class App:
@@ -83,6 +106,7 @@ class ContextStub:
         aws_request_id: str | None = None,
         log_stream_name: str = "app-group",
         log_group_name: str = "app-stream",
+        remaining_time_in_millis: int = 3_000,
     ) -> None:
         self.function_name = function_name
         self.function_version = function_version
@@ -91,6 +115,10 @@ class ContextStub:
         self.aws_request_id = aws_request_id
         self.log_group_name = log_group_name
         self.log_stream_name = log_stream_name
+        self.remaining_time_in_millis = remaining_time_in_millis
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_time_in_millis
 
 
 # v1 tests
@@ -910,6 +938,23 @@ class TestV2Events:
             "body": b64encode(b"\x13\x37").decode("utf-8"),
         }
 
+    def test_get_binary_support_disabled_binary(self, simple_app: App) -> None:
+        # HTTP APIs always support binary responses, so binary_support=False
+        # doesn't apply to them.
+        simple_app.handler = make_lambda_handler(simple_app, binary_support=False)
+        simple_app.headers = [("Content-Type", "image/png")]
+        simple_app.response = b"\x89PNG"
+
+        response = simple_app.handler(make_v2_event(), None)
+
+        assert response == {
+            "statusCode": 200,
+            "cookies": [],
+            "headers": {"content-type": "image/png"},
+            "isBase64Encoded": True,
+            "body": b64encode(b"\x89PNG").decode("utf-8"),
+        }
+
     @parametrize_default_text_content_type
     def test_get_binary_support_binary_default_text_with_gzip_content_encoding(
         self, simple_app: App, text_content_type: str
@@ -1049,3 +1094,1282 @@ class TestUnknownVersionEvents:
             simple_app.handler({"version": "distant-future"}, None)
 
         assert str(excinfo.value) == "Unknown version 'distant-future'"
+
+
+# VPC Lattice tests
+
+
+def make_lattice_v1_event(
+    *,
+    method: str = "GET",
+    path: str = "/",
+    query_params: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+    body: str = "",
+    binary: bool = False,
+) -> dict[str, Any]:
+    if headers is None:
+        headers = {"host": "example.com"}
+
+    event: dict[str, Any] = {
+        "raw_path": path,
+        "method": method,
+        "headers": headers,
+        "query_string_parameters": query_params or {},
+    }
+
+    if binary:
+        event["body"] = b64encode(body.encode()).decode()
+        event["is_base64_encoded"] = True
+    else:
+        event["body"] = body
+        event["is_base64_encoded"] = False
+
+    return event
+
+
+def make_lattice_v2_event(
+    *,
+    method: str = "GET",
+    path: str = "/",
+    query_params: dict[str, list[str]] | None = None,
+    headers: dict[str, list[str]] | None = None,
+    body: str = "",
+    binary: bool = False,
+) -> dict[str, Any]:
+    if headers is None:
+        headers = {"host": ["example.com"]}
+
+    event: dict[str, Any] = {
+        "version": "2.0",
+        "path": path,
+        "method": method,
+        "headers": headers,
+        "queryStringParameters": query_params or {},
+        "requestContext": {
+            "serviceNetworkArn": "arn:aws:vpc-lattice:us-east-1:0123456789:servicenetwork/sn-1",
+            "serviceArn": "arn:aws:vpc-lattice:us-east-1:0123456789:service/svc-1",
+            "targetGroupArn": "arn:aws:vpc-lattice:us-east-1:0123456789:targetgroup/tg-1",
+            "region": "us-east-1",
+            "timeEpoch": "1696331543569073",
+        },
+    }
+
+    if binary:
+        event["body"] = b64encode(body.encode()).decode()
+        event["isBase64Encoded"] = True
+    else:
+        event["body"] = body
+        event["isBase64Encoded"] = False
+
+    return event
+
+
+class TestLatticeV1Events:
+    def test_get(self, simple_app: App) -> None:
+        response = simple_app.handler(make_lattice_v1_event(), None)
+
+        assert response == {
+            "statusCode": 200,
+            "statusDescription": "200 OK",
+            "headers": {"Content-Type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": "Hello World\n",
+        }
+
+    def test_get_binary(self, simple_app: App) -> None:
+        simple_app.headers = [("Content-Type", "image/png")]
+
+        response = simple_app.handler(make_lattice_v1_event(), None)
+
+        assert response["isBase64Encoded"] is True
+        assert response["body"] == "SGVsbG8gV29ybGQK"
+
+    def test_get_binary_no_binary_support(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, binary_support=False)
+        simple_app.headers = [("Content-Type", "image/png")]
+        simple_app.response = b"Hello"
+
+        response = simple_app.handler(make_lattice_v1_event(), None)
+
+        assert response["isBase64Encoded"] is False
+        assert response["body"] == "Hello"
+
+    def test_environ(self, simple_app: App) -> None:
+        simple_app.handler(
+            make_lattice_v1_event(
+                method="POST",
+                path="/some%20path",
+                query_params={"q": "a b"},
+                headers={
+                    "host": "svc.example.com",
+                    "content-type": "text/plain",
+                    "x-forwarded-for": "10.0.0.1",
+                    "user_agent": "curl/8.0",
+                },
+                body="Hi",
+            ),
+            None,
+        )
+
+        environ = simple_app.environ
+        assert environ["REQUEST_METHOD"] == "POST"
+        assert environ["PATH_INFO"] == "/some path"
+        assert environ["QUERY_STRING"] == "q=a+b"
+        assert environ["SERVER_NAME"] == "svc.example.com"
+        assert environ["CONTENT_TYPE"] == "text/plain"
+        assert environ["REMOTE_ADDR"] == "10.0.0.1"
+        assert environ["HTTP_USER_AGENT"] == "curl/8.0"
+        assert environ["CONTENT_LENGTH"] == "2"
+        assert environ["wsgi.input"].read() == b"Hi"
+
+    def test_query_string_in_raw_path(self, simple_app: App) -> None:
+        simple_app.handler(make_lattice_v1_event(path="/search?q=1"), None)
+
+        assert simple_app.environ["PATH_INFO"] == "/search"
+        assert simple_app.environ["QUERY_STRING"] == "q=1"
+
+    def test_binary_body(self, simple_app: App) -> None:
+        simple_app.handler(make_lattice_v1_event(body="\x00", binary=True), None)
+
+        assert simple_app.environ["wsgi.input"].read() == b"\x00"
+
+    def test_combined_headers(self, simple_app: App) -> None:
+        simple_app.headers = [
+            ("Content-Type", "text/plain"),
+            ("Vary", "Cookie"),
+            ("vary", "Accept"),
+        ]
+
+        response = simple_app.handler(make_lattice_v1_event(), None)
+
+        assert response["headers"] == {
+            "Content-Type": "text/plain",
+            "Vary": "Cookie, Accept",
+        }
+
+
+class TestLatticeV2Events:
+    def test_get(self, simple_app: App) -> None:
+        response = simple_app.handler(make_lattice_v2_event(), None)
+
+        assert response == {
+            "statusCode": 200,
+            "statusDescription": "200 OK",
+            "headers": {"Content-Type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": "Hello World\n",
+        }
+
+    def test_environ(self, simple_app: App) -> None:
+        simple_app.handler(
+            make_lattice_v2_event(
+                path="/items",
+                query_params={"a": ["1", "2"], "b": ["x&y"]},
+                headers={
+                    "host": ["svc.example.com"],
+                    "accept": ["text/html", "text/plain"],
+                },
+            ),
+            None,
+        )
+
+        environ = simple_app.environ
+        assert environ["PATH_INFO"] == "/items"
+        assert environ["QUERY_STRING"] == "a=1&a=2&b=x%26y"
+        assert environ["SERVER_NAME"] == "svc.example.com"
+        assert environ["HTTP_ACCEPT"] == "text/html,text/plain"
+        assert environ["apig_wsgi.request_context"]["region"] == "us-east-1"
+
+    def test_string_values(self, simple_app: App) -> None:
+        event = make_lattice_v2_event()
+        event["headers"] = {"host": "svc.example.com"}
+        event["queryStringParameters"] = {"a": "1"}
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SERVER_NAME"] == "svc.example.com"
+        assert simple_app.environ["QUERY_STRING"] == "a=1"
+
+    def test_binary_body(self, simple_app: App) -> None:
+        simple_app.handler(make_lattice_v2_event(body="\x00", binary=True), None)
+
+        assert simple_app.environ["wsgi.input"].read() == b"\x00"
+
+    def test_status_description_unknown(self, simple_app: App) -> None:
+        def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+            start_response("599 Custom", [])
+            return []
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_lattice_v2_event(), None)
+
+        assert response["statusCode"] == 599
+        assert response["statusDescription"] == "599"
+
+
+class TestGetVersion:
+    @pytest.mark.parametrize(
+        "event,expected",
+        [
+            (make_v1_event(), "1.0"),
+            ({"httpMethod": "GET", "path": "/"}, "1.0"),
+            (make_alb_event(), "alb"),
+            (make_v2_event(), "2.0"),
+            (make_lattice_v1_event(), "lattice-1.0"),
+            (make_lattice_v2_event(), "lattice-2.0"),
+            ({"version": "distant-future"}, "distant-future"),
+        ],
+    )
+    def test_version(self, event: dict[str, Any], expected: str) -> None:
+        assert get_version(event) == expected
+
+
+class TestCustomAdapter:
+    class QueueAdapter(EventAdapter):
+        """
+        Adapts made-up "queue" events, with a message to POST to "/".
+        """
+
+        default_binary_support = False
+
+        def get_environ(
+            self,
+            event: dict[str, Any],
+            context: Any,
+            *,
+            strip_stage: bool,
+            retain_full_event: RetainFullEvent,
+            spool_max_size: int | None,
+        ) -> dict[str, Any]:
+            return get_environ_v1(
+                {
+                    "httpMethod": "POST",
+                    "path": "/",
+                    "headers": {"Host": "queue.local"},
+                    "body": event["message"],
+                },
+                context,
+                encode_query_params=True,
+                retain_full_event=retain_full_event,
+                spool_max_size=spool_max_size,
+            )
+
+        def make_response(
+            self,
+            environ: dict[str, Any],
+            *,
+            binary_support: bool,
+            non_binary_content_type_prefixes: tuple[str, ...],
+            spool_max_size: int | None,
+        ) -> BaseResponse:
+            return V2Response.acquire(
+                binary_support=binary_support,
+                non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+                spool_max_size=spool_max_size,
+            )
+
+    def test_custom_version(self, simple_app: App) -> None:
+        handler = make_lambda_handler(
+            simple_app, adapters={"queue-1.0": self.QueueAdapter()}
+        )
+
+        response = handler({"version": "queue-1.0", "message": "Hi"}, None)
+
+        assert simple_app.environ["REQUEST_METHOD"] == "POST"
+        assert simple_app.environ["wsgi.input"].read() == b"Hi"
+        assert response == {
+            "statusCode": 200,
+            "cookies": [],
+            "headers": {"content-type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": "Hello World\n",
+        }
+
+    def test_override_builtin(self, simple_app: App) -> None:
+        handler = make_lambda_handler(simple_app, adapters={"2.0": self.QueueAdapter()})
+
+        handler({"version": "2.0", "message": "Hi"}, None)
+
+        assert simple_app.environ["SERVER_NAME"] == "queue.local"
+
+    class DiscriminatedQueueAdapter(QueueAdapter):
+        discriminator = "message"
+
+    @pytest.mark.parametrize("timed", [False, True])
+    def test_discriminator(self, simple_app: App, timed: bool) -> None:
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            simple_app,
+            adapters={"queue": self.DiscriminatedQueueAdapter()},
+            on_timing=timings.append if timed else None,
+        )
+
+        response = handler({"message": "Hi"}, None)
+
+        assert simple_app.environ["SERVER_NAME"] == "queue.local"
+        assert response["statusCode"] == 200
+        if timed:
+            assert timings[0].version == "queue"
+
+    def test_discriminator_others_unaffected(self, simple_app: App) -> None:
+        handler = make_lambda_handler(
+            simple_app, adapters={"queue": self.DiscriminatedQueueAdapter()}
+        )
+
+        response = handler(make_v1_event(), None)
+
+        assert simple_app.environ["SERVER_NAME"] == "example.com"
+        assert "multiValueHeaders" in response
+
+
+# timing tests
+
+
+class TestTiming:
+    def test_v1(self, simple_app: App) -> None:
+        timings: list[Timing] = []
+        simple_app.handler = make_lambda_handler(simple_app, on_timing=timings.append)
+
+        response = simple_app.handler(make_v1_event(method="POST", body="abc"), None)
+
+        assert response["body"] == "Hello World\n"
+        assert len(timings) == 1
+        timing = timings[0]
+        assert timing.version == "1.0"
+        assert timing.method == "POST"
+        assert timing.path == "/"
+        assert timing.status_code == 200
+        assert timing.request_body_bytes == 3
+        assert timing.response_body_bytes == 12
+        assert timing.base64_encoded is False
+        assert timing.dispatch_ns >= 0
+        assert timing.environ_ns >= 0
+        assert timing.app_ns >= 0
+        assert timing.consume_ns >= 0
+        assert timing.encode_ns >= 0
+        assert timing.total_ns == (
+            timing.dispatch_ns
+            + timing.environ_ns
+            + timing.app_ns
+            + timing.consume_ns
+            + timing.encode_ns
+        )
+
+    def test_v2_binary(self, simple_app: App) -> None:
+        timings: list[Timing] = []
+        simple_app.handler = make_lambda_handler(simple_app, on_timing=timings.append)
+        simple_app.headers = [("Content-Type", "application/octet-stream")]
+        simple_app.response = b"\x13\x37"
+
+        response = simple_app.handler(make_v2_event(), None)
+
+        assert response["isBase64Encoded"] is True
+        (timing,) = timings
+        assert timing.version == "2.0"
+        assert timing.request_body_bytes == 0
+        assert timing.response_body_bytes == 2
+        assert timing.base64_encoded is True
+
+    def test_alb(self, simple_app: App) -> None:
+        timings: list[Timing] = []
+        simple_app.handler = make_lambda_handler(simple_app, on_timing=timings.append)
+
+        simple_app.handler(make_alb_event(), None)
+
+        (timing,) = timings
+        assert timing.version == "alb"
+
+    def test_start_response_write(self) -> None:
+        timings: list[Timing] = []
+
+        def app(environ, start_response):
+            write = start_response("201 Created", [("Content-Type", "text/plain")])
+            write(b"Hi ")
+            return [b"there"]
+
+        handler = make_lambda_handler(app, on_timing=timings.append)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["body"] == "Hi there"
+        (timing,) = timings
+        assert timing.status_code == 201
+        assert timing.response_body_bytes == 8
+
+    def test_no_callback_untimed(self, simple_app: App) -> None:
+        handler = make_lambda_handler(simple_app)
+
+        assert handler.__name__ == "handler"
+
+
+# server timing tests
+
+SERVER_TIMING_RE = re.compile(
+    r"environ;dur=\d+\.\d{3}, app;dur=\d+\.\d{3}, "
+    + r"consume;dur=\d+\.\d{3}, encode;dur=\d+\.\d{3}"
+)
+
+
+class TestServerTiming:
+    def test_v1_multi_value_headers(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, server_timing=True)
+
+        response = simple_app.handler(make_v1_event(), None)
+
+        headers = response["multiValueHeaders"]
+        assert headers["Content-Type"] == ["text/plain"]
+        (value,) = headers["Server-Timing"]
+        assert SERVER_TIMING_RE.fullmatch(value)
+
+    def test_v1_multi_value_headers_existing(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, server_timing=True)
+        simple_app.headers = [("Server-Timing", "db;dur=53")]
+
+        response = simple_app.handler(make_v1_event(), None)
+
+        values = response["multiValueHeaders"]["Server-Timing"]
+        assert len(values) == 2
+        assert values[0] == "db;dur=53"
+        assert SERVER_TIMING_RE.fullmatch(values[1])
+
+    def test_v1_single_headers(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, server_timing=True)
+
+        response = simple_app.handler(make_v1_event(headers_multi=False), None)
+
+        assert SERVER_TIMING_RE.fullmatch(response["headers"]["Server-Timing"])
+
+    def test_v1_single_headers_existing(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, server_timing=True)
+        simple_app.headers = [("server-timing", "db;dur=53")]
+
+        response = simple_app.handler(make_v1_event(headers_multi=False), None)
+
+        value = response["headers"]["server-timing"]
+        assert value.startswith("db;dur=53, environ;dur=")
+        assert "Server-Timing" not in response["headers"]
+
+    def test_v2(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, server_timing=True)
+
+        response = simple_app.handler(make_v2_event(), None)
+
+        assert SERVER_TIMING_RE.fullmatch(response["headers"]["server-timing"])
+
+    def test_v2_existing(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, server_timing=True)
+        simple_app.headers = [("Server-Timing", "db;dur=53")]
+
+        response = simple_app.handler(make_v2_event(), None)
+
+        value = response["headers"]["server-timing"]
+        assert value.startswith("db;dur=53, environ;dur=")
+
+    def test_with_on_timing(self, simple_app: App) -> None:
+        timings: list[Timing] = []
+        simple_app.handler = make_lambda_handler(
+            simple_app, on_timing=timings.append, server_timing=True
+        )
+
+        response = simple_app.handler(make_v2_event(), None)
+
+        (timing,) = timings
+        assert response["headers"]["server-timing"] == timing.server_timing()
+
+    def test_format(self) -> None:
+        timing = Timing(
+            version="2.0",
+            method="GET",
+            path="/",
+            status_code=200,
+            dispatch_ns=1_000,
+            environ_ns=20_000,
+            app_ns=12_345_678,
+            consume_ns=5_000,
+            encode_ns=300_000,
+            request_body_bytes=0,
+            response_body_bytes=0,
+            base64_encoded=False,
+        )
+
+        assert timing.server_timing() == (
+            "environ;dur=0.021, app;dur=12.346, consume;dur=0.005, encode;dur=0.300"
+        )
+
+
+# deadline tests
+
+
+class TestDeadline:
+    def test_disabled(self, simple_app: App) -> None:
+        simple_app.handler(make_v2_event(), ContextStub())
+
+        assert "apig_wsgi.deadline" not in simple_app.environ
+
+    def test_no_context(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, deadline_margin_ms=500)
+
+        response = simple_app.handler(make_v2_event(), None)
+
+        assert response["statusCode"] == 200
+        assert "apig_wsgi.deadline" not in simple_app.environ
+
+    def test_environ(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, deadline_margin_ms=500)
+        before = time.monotonic()
+
+        response = simple_app.handler(
+            make_v2_event(), ContextStub(remaining_time_in_millis=3_000)
+        )
+
+        assert response["statusCode"] == 200
+        deadline = simple_app.environ["apig_wsgi.deadline"]
+        assert before + 2.5 <= deadline <= time.monotonic() + 2.5
+
+    def test_timeout(self) -> None:
+        closed = []
+
+        class Result:
+            def __iter__(self):
+                yield b"Hello "
+                time.sleep(0.01)
+                yield b"World"
+
+            def close(self):
+                closed.append(True)
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/html")])
+            return Result()
+
+        handler = make_lambda_handler(app, deadline_margin_ms=995)
+
+        response = handler(make_v1_event(), ContextStub(remaining_time_in_millis=1_000))
+
+        assert response == {
+            "statusCode": 504,
+            "multiValueHeaders": {"Content-Type": ["text/plain"]},
+            "isBase64Encoded": False,
+            "body": "Gateway Timeout",
+        }
+        assert closed == [True]
+
+    def test_already_passed(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, deadline_margin_ms=500)
+
+        response = simple_app.handler(
+            make_v2_event(), ContextStub(remaining_time_in_millis=100)
+        )
+
+        assert response["statusCode"] == 504
+        assert response["headers"] == {"content-type": "text/plain"}
+        assert response["body"] == "Gateway Timeout"
+
+
+# strip stage tests
+
+
+class TestStripStage:
+    def test_v1_disabled(self, simple_app: App) -> None:
+        event = make_v1_event(
+            path="/foo", request_context={"stage": "prod", "path": "/prod/foo"}
+        )
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == ""
+        assert simple_app.environ["PATH_INFO"] == "/foo"
+
+    def test_v1_request_context_path(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v1_event(
+            path="/foo", request_context={"stage": "prod", "path": "/prod/foo"}
+        )
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == "/prod"
+        assert simple_app.environ["PATH_INFO"] == "/foo"
+
+    def test_v1_request_context_path_base_path(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v1_event(
+            path="/foo%20bar",
+            request_context={"stage": "prod", "path": "/my%20api/foo%20bar"},
+        )
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == "/my api"
+        assert simple_app.environ["PATH_INFO"] == "/foo bar"
+
+    def test_v1_request_context_path_root(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v1_event(
+            path="/", request_context={"stage": "prod", "path": "/prod"}
+        )
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == "/prod"
+        assert simple_app.environ["PATH_INFO"] == "/"
+
+    def test_v1_stage_in_path(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v1_event(
+            path="/prod/foo", request_context={"stage": "prod", "path": "/prod/foo"}
+        )
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == "/prod"
+        assert simple_app.environ["PATH_INFO"] == "/foo"
+
+    def test_v1_stage_not_in_path(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v1_event(path="/production", request_context={"stage": "prod"})
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == ""
+        assert simple_app.environ["PATH_INFO"] == "/production"
+
+    def test_v1_mismatched_request_context_path(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v1_event(
+            path="/foo", request_context={"stage": "$default", "path": "/bar"}
+        )
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == ""
+        assert simple_app.environ["PATH_INFO"] == "/foo"
+
+    def test_v1_no_request_context(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+
+        simple_app.handler(make_v1_event(path="/foo"), None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == ""
+        assert simple_app.environ["PATH_INFO"] == "/foo"
+
+    def test_v2(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v2_event(path="/prod/foo")
+        event["requestContext"]["stage"] = "prod"
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == "/prod"
+        assert simple_app.environ["PATH_INFO"] == "/foo"
+
+    def test_v2_stage_only(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v2_event(path="/prod")
+        event["requestContext"]["stage"] = "prod"
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == "/prod"
+        assert simple_app.environ["PATH_INFO"] == ""
+
+    def test_v2_default_stage(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, strip_stage=True)
+        event = make_v2_event(path="/$default/foo")
+        event["requestContext"]["stage"] = "$default"
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["SCRIPT_NAME"] == ""
+        assert simple_app.environ["PATH_INFO"] == "/$default/foo"
+
+
+# file wrapper tests
+
+
+class TestFileWrapper:
+    def test_environ(self, simple_app: App) -> None:
+        simple_app.handler(make_v2_event(), None)
+
+        assert simple_app.environ["wsgi.file_wrapper"] is FileWrapper
+
+    def test_text_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "test.txt"
+        path.write_text("Hello World\n")
+        files = []
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            files.append(path.open("rb"))
+            return environ["wsgi.file_wrapper"](files[0])
+
+        handler = make_lambda_handler(app, binary_support=True)
+
+        response = handler(make_v2_event(), None)
+
+        assert response == {
+            "statusCode": 200,
+            "cookies": [],
+            "headers": {"content-type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": "Hello World\n",
+        }
+        assert files[0].closed
+
+    def test_binary_file_offset(self, tmp_path: Path) -> None:
+        path = tmp_path / "test.bin"
+        path.write_bytes(b"\x00\x01\x02\x13\x37")
+        timings: list[Timing] = []
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "application/octet-stream")])
+            file = path.open("rb")
+            file.seek(3)
+            return environ["wsgi.file_wrapper"](file)
+
+        handler = make_lambda_handler(app, on_timing=timings.append)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["isBase64Encoded"] is True
+        assert response["body"] == b64encode(b"\x13\x37").decode("utf-8")
+        assert timings[0].response_body_bytes == 2
+
+    def test_empty_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "empty.txt"
+        path.write_bytes(b"")
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return environ["wsgi.file_wrapper"](path.open("rb"))
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["body"] == ""
+
+    def test_not_a_file(self) -> None:
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return environ["wsgi.file_wrapper"](BytesIO(b"Hi there"), 3)
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["body"] == "Hi there"
+
+    def test_body_already_written(self, tmp_path: Path) -> None:
+        path = tmp_path / "test.txt"
+        path.write_text("World\n")
+
+        def app(environ, start_response):
+            write = start_response("200 OK", [("Content-Type", "text/plain")])
+            write(b"Hello ")
+            return environ["wsgi.file_wrapper"](path.open("rb"))
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["body"] == "Hello World\n"
+
+
+# retain full event tests
+
+
+class TestRetainFullEvent:
+    def test_full(self, simple_app: App) -> None:
+        event = make_v1_event(method="POST", body="abc")
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["apig_wsgi.full_event"] is event
+        assert event["body"] == "abc"
+
+    def test_without_body_v1(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(
+            simple_app, retain_full_event="without_body"
+        )
+        event = make_v1_event(method="POST", body="abc")
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["apig_wsgi.full_event"] is event
+        assert "body" not in event
+        assert simple_app.environ["wsgi.input"].read() == b"abc"
+
+    def test_without_body_v2(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(
+            simple_app, retain_full_event="without_body"
+        )
+        event = make_v2_event(method="POST", body="abc", binary=True)
+
+        simple_app.handler(event, None)
+
+        assert simple_app.environ["apig_wsgi.full_event"] is event
+        assert "body" not in event
+        assert simple_app.environ["wsgi.input"].read() == b"abc"
+
+    def test_none_v1(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, retain_full_event="none")
+        event = make_v1_event(method="POST", body="abc")
+
+        simple_app.handler(event, None)
+
+        assert "apig_wsgi.full_event" not in simple_app.environ
+        assert "body" not in event
+        assert simple_app.environ["wsgi.input"].read() == b"abc"
+
+    def test_none_v2(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, retain_full_event="none")
+        event = make_v2_event()
+
+        simple_app.handler(event, None)
+
+        assert "apig_wsgi.full_event" not in simple_app.environ
+        assert "apig_wsgi.request_context" in simple_app.environ
+
+    def test_invalid(self, simple_app: App) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            make_lambda_handler(simple_app, retain_full_event="some")  # type: ignore [arg-type]
+
+        assert str(excinfo.value) == "Unknown retain_full_event value 'some'"
+
+
+# spooling tests
+
+
+class TestSpooling:
+    def test_small_request_in_memory(self, simple_app: App) -> None:
+        simple_app.handler = make_lambda_handler(simple_app, spool_max_size=100)
+
+        simple_app.handler(make_v2_event(method="POST", body="abc"), None)
+
+        assert isinstance(simple_app.environ["wsgi.input"], BytesIO)
+        assert simple_app.environ["CONTENT_LENGTH"] == "3"
+
+    def test_large_request_text(self) -> None:
+        body = "abcdefghij" * 20_000
+        received = []
+
+        def app(environ, start_response):
+            received.append(environ["wsgi.input"].read())
+            assert environ["wsgi.input"]._rolled
+            assert environ["CONTENT_LENGTH"] == str(len(body))
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"ok"]
+
+        handler = make_lambda_handler(app, spool_max_size=1_000)
+
+        response = handler(make_v1_event(method="POST", body=body), None)
+
+        assert response["body"] == "ok"
+        assert received == [body.encode()]
+
+    def test_large_request_base64(self) -> None:
+        body = bytes(range(256)) * 1_500
+        received = []
+
+        def app(environ, start_response):
+            received.append(environ["wsgi.input"].read())
+            assert environ["CONTENT_LENGTH"] == str(len(body))
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"ok"]
+
+        handler = make_lambda_handler(app, spool_max_size=1_000)
+        event = make_v2_event(method="POST")
+        event["body"] = b64encode(body).decode()
+        event["isBase64Encoded"] = True
+
+        handler(event, None)
+
+        assert received == [body]
+
+    def test_large_response_text(self) -> None:
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"abcdefghij"] * 20_000
+
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app, spool_max_size=1_000, on_timing=timings.append
+        )
+
+        response = handler(make_v2_event(), None)
+
+        assert response["isBase64Encoded"] is False
+        assert response["body"] == "abcdefghij" * 20_000
+        assert timings[0].response_body_bytes == 200_000
+
+    def test_large_response_binary(self) -> None:
+        body = bytes(range(256)) * 1_500
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "application/octet-stream")])
+            return [body[i : i + 1_000] for i in range(0, len(body), 1_000)]
+
+        handler = make_lambda_handler(app, spool_max_size=1_000)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["isBase64Encoded"] is True
+        assert response["body"] == b64encode(body).decode()
+
+    def test_timeout(self) -> None:
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"abcdefghij"] * 200
+
+        handler = make_lambda_handler(app, spool_max_size=1_000, deadline_margin_ms=500)
+
+        response = handler(make_v2_event(), ContextStub(remaining_time_in_millis=100))
+
+        assert response["statusCode"] == 504
+        assert response["body"] == "Gateway Timeout"
+
+    def test_app_error_closes_files(self) -> None:
+        files = []
+
+        def app(environ, start_response):
+            files.append(environ["wsgi.input"])
+            write = start_response("200 OK", [("Content-Type", "text/plain")])
+            write(b"abcdefghij" * 200)
+            files.append(start_response.__self__.body)
+            raise ValueError("Boom")
+
+        handler = make_lambda_handler(app, spool_max_size=1_000)
+
+        with pytest.raises(ValueError):
+            handler(make_v2_event(method="POST", body="abcdefghij" * 200), None)
+
+        assert [file._rolled for file in files] == [True, True]
+        assert all(file.closed for file in files)
+
+
+# query string encoding tests
+
+
+class TestEncodeQueryString:
+    @pytest.mark.parametrize("encode_reserved", [True, False])
+    @pytest.mark.parametrize("multi_value", [True, False])
+    def test_matches_urlencode(self, multi_value: bool, encode_reserved: bool) -> None:
+        rng = random.Random(42)
+        alphabet = string.printable + "é€😄%+ "
+        safe = "" if encode_reserved else RESERVED_URI_CHARACTERS
+
+        def random_string() -> str:
+            return "".join(rng.choices(alphabet, k=rng.randint(0, 8)))
+
+        for _ in range(500):
+            params: dict[str, Any] = {}
+            for _ in range(rng.randint(0, 5)):
+                if multi_value:
+                    params[random_string()] = [
+                        random_string() for _ in range(rng.randint(0, 3))
+                    ]
+                else:
+                    params[random_string()] = random_string()
+
+            assert encode_query_string(
+                params, multi_value=multi_value, encode_reserved=encode_reserved
+            ) == urlencode(params, doseq=multi_value, safe=safe)
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"a": None, "b": 1},
+            {"a": "x", "b": [1, None, "y"]},
+            {"a": {"nested": "dict"}},
+        ],
+    )
+    @pytest.mark.parametrize("multi_value", [True, False])
+    def test_matches_urlencode_odd_values(
+        self, params: dict[str, Any], multi_value: bool
+    ) -> None:
+        assert encode_query_string(
+            params, multi_value=multi_value, encode_reserved=True
+        ) == urlencode(params, doseq=multi_value)
+
+    def test_none(self) -> None:
+        assert encode_query_string(None, multi_value=True, encode_reserved=True) == ""
+
+    @pytest.mark.parametrize("multi_value", [True, False])
+    def test_equal_hashing_values_not_shared(self, multi_value: bool) -> None:
+        first: dict[str, Any] = {"a": True}
+        second: dict[str, Any] = {"a": 1}
+        if multi_value:
+            first = {"a": [True]}
+            second = {"a": [1]}
+        encode_query_string(first, multi_value=multi_value, encode_reserved=True)
+
+        result = encode_query_string(
+            second, multi_value=multi_value, encode_reserved=True
+        )
+
+        assert result == urlencode(second, doseq=multi_value) == "a=1"
+
+
+class TestResponsePool:
+    def test_slots(self) -> None:
+        response = V1Response(
+            binary_support=False,
+            non_binary_content_type_prefixes=(),
+            multi_value_headers=False,
+        )
+
+        assert not hasattr(response, "__dict__")
+        with pytest.raises(AttributeError):
+            response.extra = 1  # type: ignore [attr-defined]
+
+    @pytest.mark.parametrize(
+        "make_event", [make_v1_event, make_alb_event, make_v2_event]
+    )
+    def test_reused(self, make_event: Callable[..., dict[str, Any]]) -> None:
+        seen = []
+
+        def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+            seen.append(start_response.__self__)
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"Hello World\n"]
+
+        handler = make_lambda_handler(app)
+        handler(make_event(), None)
+        handler(make_event(), None)
+
+        assert seen[0] is seen[1]
+
+    def test_reset(self) -> None:
+        responses = iter(
+            [
+                ("404 Not Found", [("X-First", "1")], b"First " * 100),
+                ("200 OK", [("Content-Type", "text/plain")], b"Second"),
+            ]
+        )
+
+        def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+            status, headers, body = next(responses)
+            start_response(status, headers)
+            return [body]
+
+        handler = make_lambda_handler(app)
+        handler(make_v2_event(), None)
+        response = handler(make_v2_event(), None)
+
+        assert response == {
+            "statusCode": 200,
+            "cookies": [],
+            "headers": {"content-type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": "Second",
+        }
+
+    @pytest.mark.parametrize(
+        "size",
+        [pytest.param(10, id="small"), pytest.param(1024 * 1024, id="large")],
+    )
+    def test_released_holds_no_data(self, size: int) -> None:
+        seen = []
+
+        def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+            seen.append(start_response.__self__)
+            start_response(
+                "200 OK",
+                [("Content-Type", "text/plain"), ("Set-Cookie", "session=abc")],
+            )
+            return [b"x" * size]
+
+        handler = make_lambda_handler(app)
+        handler(make_v2_event(), None)
+
+        (response,) = seen
+        assert response.headers == []
+        assert response.body.getbuffer().nbytes == 0
+
+    def test_pool_per_class(self) -> None:
+        kwargs: dict[str, Any] = {
+            "binary_support": False,
+            "non_binary_content_type_prefixes": (),
+        }
+        response = V2Response.acquire(**kwargs)
+        response.release()
+
+        other: BaseResponse = V1Response.acquire(multi_value_headers=True, **kwargs)
+        assert other is not response
+        assert V2Response.acquire(**kwargs) is response
+
+    @pytest.mark.parametrize(
+        "make_event", [make_v1_event, make_alb_event, make_v2_event]
+    )
+    def test_no_response_allocations(
+        self, make_event: Callable[..., dict[str, Any]]
+    ) -> None:
+        snapshots = []
+
+        def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            if tracemalloc.is_tracing():
+                snapshots.append(tracemalloc.take_snapshot())
+            return [b"Hello World\n"]
+
+        handler = make_lambda_handler(app)
+        handler(make_event(), None)
+        tracemalloc.start()
+        try:
+            handler(make_event(), None)
+        finally:
+            tracemalloc.stop()
+
+        # Allocations made by creating response objects, in acquire() or
+        # their __init__ methods.
+        source, start = inspect.getsourcelines(BaseResponse.acquire)
+        (create_line,) = (
+            start + offset
+            for offset, line in enumerate(source)
+            if "return cls(" in line
+        )
+        filters = [tracemalloc.Filter(True, apig_wsgi.__file__, create_line)] + [
+            tracemalloc.Filter(True, apig_wsgi.__file__, lineno)
+            for code in (BaseResponse.__init__.__code__, V1Response.__init__.__code__)
+            for _, _, lineno in code.co_lines()
+            if lineno is not None
+        ]
+        (snapshot,) = snapshots
+        assert len(snapshot.filter_traces(filters).traces) == 0
+
+
+# HEAD tests
+
+
+class TestHead:
+    def test_v1(self) -> None:
+        closed = []
+
+        class Result:
+            def __iter__(self):
+                yield b"Hello "
+                yield b"World\n"
+
+            def close(self):
+                closed.append(True)
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "application/octet-stream")])
+            return Result()
+
+        handler = make_lambda_handler(app, binary_support=True)
+
+        response = handler(make_v1_event(method="HEAD"), None)
+
+        assert response == {
+            "statusCode": 200,
+            "multiValueHeaders": {
+                "Content-Type": ["application/octet-stream"],
+                "Content-Length": ["12"],
+            },
+            "isBase64Encoded": False,
+            "body": "",
+        }
+        assert closed == [True]
+
+    def test_v2(self, simple_app: App) -> None:
+        response = simple_app.handler(make_v2_event(method="HEAD"), None)
+
+        assert response == {
+            "statusCode": 200,
+            "cookies": [],
+            "headers": {"content-type": "text/plain", "content-length": "12"},
+            "isBase64Encoded": False,
+            "body": "",
+        }
+
+    def test_existing_content_length(self) -> None:
+        def app(environ, start_response):
+            start_response(
+                "200 OK", [("Content-Type", "text/plain"), ("Content-Length", "100")]
+            )
+            return []
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_v2_event(method="HEAD"), None)
+
+        assert response["headers"] == {
+            "content-type": "text/plain",
+            "content-length": "100",
+        }
+        assert response["body"] == ""
+
+    def test_write(self) -> None:
+        def app(environ, start_response):
+            write = start_response("200 OK", [("Content-Type", "text/plain")])
+            write(b"Hello ")
+            return [b"World\n"]
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_v2_event(method="HEAD"), None)
+
+        assert response["headers"]["content-length"] == "12"
+        assert response["body"] == ""
+
+    @pytest.mark.parametrize("status", ["204 No Content", "304 Not Modified"])
+    def test_no_content_length(self, status: str) -> None:
+        def app(environ, start_response):
+            start_response(status, [])
+            return []
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_v2_event(method="HEAD"), None)
+
+        assert response["headers"] == {}
+
+    def test_file_wrapper(self, tmp_path: Path) -> None:
+        path = tmp_path / "test.bin"
+        path.write_bytes(b"\x00\x01\x02\x13\x37")
+        files = []
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "application/octet-stream")])
+            files.append(path.open("rb"))
+            files[0].seek(1)
+            return environ["wsgi.file_wrapper"](files[0])
+
+        handler = make_lambda_handler(app)
+
+        response = handler(make_v2_event(method="HEAD"), None)
+
+        assert response["headers"]["content-length"] == "4"
+        assert response["isBase64Encoded"] is False
+        assert response["body"] == ""
+        assert files[0].closed
+
+    def test_timeout(self) -> None:
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/html")])
+            return [b"Hello World"]
+
+        handler = make_lambda_handler(app, deadline_margin_ms=500)
+
+        response = handler(
+            make_v2_event(method="HEAD"), ContextStub(remaining_time_in_millis=100)
+        )
+
+        assert response["statusCode"] == 504
+        assert response["headers"] == {
+            "content-type": "text/plain",
+            "content-length": "15",
+        }
+        assert response["body"] == ""
+
+    def test_get_unaffected_after_head(self, simple_app: App) -> None:
+        simple_app.handler(make_v2_event(method="HEAD"), None)
+
+        response = simple_app.handler(make_v2_event(), None)
+
+        assert response["headers"] == {"content-type": "text/plain"}
+        assert response["body"] == "Hello World\n"
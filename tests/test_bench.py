@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from collections.abc import Generator, Iterable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from apig_wsgi.bench import BenchResult, bench, load_app, load_events
+from apig_wsgi.cli import main, parse_duration
+from tests.test_apig_wsgi import make_alb_event, make_v2_event
+
+APP_SOURCE = """
+def app(environ, start_response):
+    if environ["PATH_INFO"] == "/error":
+        raise ValueError("Boom")
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"Hello World"]
+"""
+
+
+def app(environ: dict[str, Any], start_response: Any) -> Iterable[bytes]:
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"Hello World"]
+
+
+@pytest.fixture
+def app_module(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[str]:
+    (tmp_path / "bench_app.py").write_text(APP_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "bench_app:app"
+    sys.modules.pop("bench_app", None)
+
+
+@pytest.fixture
+def events_dir(tmp_path: Path) -> Path:
+    directory = tmp_path / "events"
+    directory.mkdir()
+    (directory / "one.json").write_text(json.dumps(make_v2_event()))
+    (directory / "two.json").write_text(
+        json.dumps([make_v2_event(path="/a"), make_v2_event(path="/b")])
+    )
+    (directory / "ignored.txt").write_text("not an event")
+    return directory
+
+
+class TestParseDuration:
+    @pytest.mark.parametrize(
+        "value,expected",
+        [("30s", 30.0), ("500ms", 0.5), ("2m", 120.0), ("10", 10.0), ("1.5s", 1.5)],
+    )
+    def test_valid(self, value: str, expected: float) -> None:
+        assert parse_duration(value) == expected
+
+    @pytest.mark.parametrize("value", ["", "s", "10h", "-1s"])
+    def test_invalid(self, value: str) -> None:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_duration(value)
+
+
+class TestLoadEvents:
+    def test_load(self, events_dir: Path) -> None:
+        events = load_events(events_dir)
+
+        assert [event["rawPath"] for event in events] == ["/", "/a", "/b"]
+
+    def test_format(self, events_dir: Path) -> None:
+        assert len(load_events(events_dir, format="v2")) == 3
+
+    def test_format_mismatch(self, events_dir: Path) -> None:
+        (events_dir / "three.json").write_text(json.dumps(make_alb_event()))
+
+        with pytest.raises(ValueError) as excinfo:
+            load_events(events_dir, format="v2")
+
+        assert "three.json" in str(excinfo.value)
+
+    def test_empty(self, tmp_path: Path) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            load_events(tmp_path)
+
+        assert str(excinfo.value) == f"No events found in {tmp_path}."
+
+
+class TestLoadApp:
+    def test_object(self) -> None:
+        assert load_app(app) is app
+
+    def test_string(self) -> None:
+        assert load_app("tests.test_bench:app") is app
+
+    def test_nested_attribute(self) -> None:
+        result: object = load_app("tests.test_bench:TestLoadApp.test_object")
+
+        assert result is TestLoadApp.test_object
+
+    @pytest.mark.parametrize("spec", ["tests.test_bench", ":app", "tests:"])
+    def test_invalid(self, spec: str) -> None:
+        with pytest.raises(ValueError):
+            load_app(spec)
+
+
+class TestBench:
+    def test_threads(self) -> None:
+        result = bench(app, [make_v2_event()], duration=0.05, concurrency=2)
+
+        assert result.requests > 0
+        assert result.errors == 0
+        assert result.status_codes == {200: result.requests}
+        assert result.latency.count == result.requests
+        assert result.adapter_ns > 0
+        assert result.app_ns > 0
+        assert result.allocated_bytes is not None
+        assert result.allocated_bytes > 0
+
+    def test_processes(self, app_module: str) -> None:
+        result = bench(
+            app_module,
+            [make_v2_event()],
+            duration=0.05,
+            concurrency=1,
+            processes=True,
+        )
+
+        assert result.requests > 0
+        assert result.status_codes == {200: result.requests}
+
+    def test_processes_need_string(self) -> None:
+        with pytest.raises(TypeError):
+            bench(app, [make_v2_event()], duration=0.05, processes=True)
+
+    def test_concurrency_invalid(self) -> None:
+        with pytest.raises(ValueError):
+            bench(app, [make_v2_event()], duration=0.05, concurrency=0)
+
+    def test_errors(self, app_module: str) -> None:
+        result = bench(app_module, [make_v2_event(path="/error")], duration=0.05)
+
+        assert result.requests == 0
+        assert result.errors > 0
+
+
+class TestBenchResult:
+    def test_report(self) -> None:
+        result = BenchResult(elapsed=2.0, adapter_ns=1_000, app_ns=3_000)
+        for value in (1_000_000, 2_000_000):
+            result.latency.record(value)
+            result.requests += 1
+        result.status_codes = {200: 1, 404: 1}
+        result.allocated_bytes = 1234
+
+        report = result.report()
+
+        assert "Requests:      2\n" in report
+        assert "Throughput:    1.0 requests/second\n" in report
+        assert "Status codes:  200: 1, 404: 1\n" in report
+        assert "  p50         1.000 ms\n" in report
+        assert "  max         2.000 ms\n" in report
+        assert "Time in apig-wsgi: 25.0%, in app: 75.0%\n" in report
+        assert report.endswith("Allocated per request: 1234 bytes (peak)")
+
+    def test_report_empty(self) -> None:
+        report = BenchResult().report()
+
+        assert "Throughput:    -\n" in report
+        assert "Time in apig-wsgi" not in report
+
+
+class TestMain:
+    def test_bench(
+        self,
+        app_module: str,
+        events_dir: Path,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        exit_code = main(
+            [
+                "bench",
+                app_module,
+                "--events",
+                str(events_dir),
+                "--format",
+                "v2",
+                "--concurrency",
+                "2",
+                "--duration",
+                "50ms",
+            ]
+        )
+
+        assert exit_code == 0
+        out, err = capsys.readouterr()
+        assert "Status codes:  200: " in out
+        assert "Time in apig-wsgi: " in out
+        assert err == ""
+
+    def test_bench_bad_events(
+        self, app_module: str, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        exit_code = main(["bench", app_module, "--events", str(tmp_path)])
+
+        assert exit_code == 1
+        out, err = capsys.readouterr()
+        assert out == ""
+        assert err == f"Error: No events found in {tmp_path}.\n"
+
+    def test_bench_bad_app(
+        self, events_dir: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        exit_code = main(
+            ["bench", "nonexistent_module:app", "--events", str(events_dir)]
+        )
+
+        assert exit_code == 1
+        _, err = capsys.readouterr()
+        assert err.startswith("Error: No module named 'nonexistent_module'")
+
+    def test_serve_bad_app(self, capsys: pytest.CaptureFixture[str]) -> None:
+        exit_code = main(["serve", "nonexistent_module:app"])
+
+        assert exit_code == 1
+        _, err = capsys.readouterr()
+        assert err.startswith("Error: No module named 'nonexistent_module'")
+
+    def test_bench_bad_duration(self, capsys: pytest.CaptureFixture[str]) -> None:
+        with pytest.raises(SystemExit):
+            main(["bench", "app:app", "--events", ".", "--duration", "soon"])
+
+        _, err = capsys.readouterr()
+        assert "Invalid duration 'soon'." in err
+
+    def test_module(self) -> None:
+        result = subprocess.run(
+            [sys.executable, "-m", "apig_wsgi", "bench", "--help"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.startswith("usage: python -m apig_wsgi bench")
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+import pytest
+
+from apig_wsgi import BaseResponse, make_lambda_handler
+from apig_wsgi.coalescing import MAX_UNSHAREABLE_KEYS, Coalescer
+from tests.test_apig_wsgi import ContextStub, make_v1_event, make_v2_event
+
+
+class BlockingApp:
+    """
+    App that blocks until released, counting calls.
+    """
+
+    def __init__(self, headers: list[tuple[str, str]] | None = None) -> None:
+        self.headers = headers or [("Content-Type", "text/plain")]
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, environ: dict[str, Any], start_response: Any) -> list[bytes]:
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(5)
+        if environ["PATH_INFO"] == "/error":
+            raise ValueError("Boom")
+        write = start_response("200 OK", self.headers)
+        write(b"Hello ")
+        return [b"", f"{environ['PATH_INFO']} {self.calls}".encode()]
+
+
+def run_concurrently(
+    coalescer: Coalescer,
+    app: BlockingApp,
+    events: list[dict[str, Any]],
+    *,
+    followers: int,
+) -> list[Any]:
+    """
+    Run the first event, then the rest once the app has been entered, then
+    release the app once `followers` requests are waiting.
+    """
+    handler = make_lambda_handler(app, coalesce=coalescer)
+    results: list[Any] = [None] * len(events)
+
+    def call(index: int) -> None:
+        try:
+            results[index] = handler(events[index], None)
+        except Exception as exc:
+            results[index] = exc
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(events))]
+    threads[0].start()
+    assert app.entered.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while (
+        sum(flight.waiters for flight in list(coalescer.in_flight.values())) < followers
+    ):
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    app.release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def run_ignoring_errors(handler: Any, event: dict[str, Any]) -> None:
+    try:
+        handler(event, None)
+    except ValueError:
+        pass
+
+
+class TestCoalescer:
+    def test_coalesced(self) -> None:
+        app = BlockingApp()
+        coalescer = Coalescer()
+
+        results = run_concurrently(
+            coalescer, app, [make_v2_event(path="/hot")] * 4, followers=3
+        )
+
+        assert app.calls == 1
+        assert all(result["body"] == "Hello /hot 1" for result in results)
+        assert results[1] is not results[0]
+        assert results[1]["headers"] is not results[0]["headers"]
+        assert coalescer.in_flight == {}
+
+    def test_coalesced_across_formats(self) -> None:
+        app = BlockingApp()
+
+        results = run_concurrently(
+            Coalescer(),
+            app,
+            [make_v2_event(path="/hot"), make_v1_event(path="/hot")],
+            followers=1,
+        )
+
+        assert app.calls == 1
+        assert results[0]["body"] == "Hello /hot 1"
+        assert results[1]["body"] == "Hello /hot 1"
+        assert "multiValueHeaders" in results[1]
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            pytest.param({"path": "/cold"}, id="path"),
+            pytest.param({"query_string": "a=1"}, id="query"),
+            pytest.param({"method": "HEAD"}, id="method"),
+            pytest.param(
+                {"headers": {"Host": "example.com", "Accept": "text/html"}},
+                id="vary",
+            ),
+            pytest.param({"headers": {"Host": "other.example.com"}}, id="host"),
+        ],
+    )
+    def test_different_keys(self, kwargs: dict[str, Any]) -> None:
+        app = BlockingApp()
+        app.release.set()
+        handler = make_lambda_handler(app, coalesce=Coalescer())
+
+        handler(make_v2_event(path="/hot"), None)
+        handler(make_v2_event(**{"path": "/hot", **kwargs}), None)
+
+        assert app.calls == 2
+
+    def test_post_not_coalesced(self) -> None:
+        app = BlockingApp()
+        app.release.set()
+        coalescer = Coalescer()
+        handler = make_lambda_handler(app, coalesce=coalescer)
+
+        handler(make_v2_event(method="POST"), None)
+
+        assert app.calls == 1
+        assert coalescer.in_flight == {}
+
+    def test_custom_vary_headers(self) -> None:
+        app = BlockingApp()
+
+        results = run_concurrently(
+            Coalescer(vary_headers=[]),
+            app,
+            [
+                make_v2_event(path="/hot", headers={"Cookie": "a=1"}),
+                make_v2_event(path="/hot", headers={"Cookie": "a=2"}),
+            ],
+            followers=1,
+        )
+
+        assert app.calls == 1
+        assert results[1]["body"] == "Hello /hot 1"
+
+    @pytest.mark.parametrize(
+        "headers",
+        [
+            [("Content-Type", "text/plain"), ("Set-Cookie", "session=abc")],
+            [("Content-Type", "text/plain"), ("Cache-Control", "Private, max-age=60")],
+        ],
+    )
+    def test_not_shareable(self, headers: list[tuple[str, str]]) -> None:
+        app = BlockingApp(headers=headers)
+
+        results = run_concurrently(
+            Coalescer(), app, [make_v2_event(path="/hot")] * 2, followers=1
+        )
+
+        assert app.calls == 2
+        assert sorted(result["body"] for result in results) == [
+            "Hello /hot 1",
+            "Hello /hot 2",
+        ]
+
+    def test_leader_error(self) -> None:
+        app = BlockingApp()
+
+        results = run_concurrently(
+            Coalescer(), app, [make_v2_event(path="/error")] * 2, followers=1
+        )
+
+        assert app.calls == 2
+        assert all(isinstance(result, ValueError) for result in results)
+
+    @pytest.mark.parametrize("path", ["/hot", "/error"])
+    def test_unshareable_remembered(self, path: str) -> None:
+        app = BlockingApp(
+            headers=[("Content-Type", "text/plain"), ("Set-Cookie", "a=1")]
+        )
+        app.release.set()
+        coalescer = Coalescer()
+        handler = make_lambda_handler(app, coalesce=coalescer)
+        event = make_v2_event(path=path)
+        try:
+            handler(event, None)
+        except ValueError:
+            pass
+        assert len(coalescer.unshareable) == 1
+        app.release.clear()
+
+        # Concurrent requests now run the app without waiting on each other.
+        threads = [
+            threading.Thread(target=run_ignoring_errors, args=(handler, event))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while app.calls < 3:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+        app.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert coalescer.in_flight == {}
+
+    def test_unshareable_not_remembered_when_shared(self) -> None:
+        app = BlockingApp()
+        app.release.set()
+        coalescer = Coalescer()
+        handler = make_lambda_handler(app, coalesce=coalescer)
+
+        handler(make_v2_event(), None)
+
+        assert coalescer.unshareable == {}
+
+    def test_unshareable_ttl_zero(self) -> None:
+        app = BlockingApp(headers=[("Set-Cookie", "a=1")])
+        app.release.set()
+        coalescer = Coalescer(unshareable_ttl=0)
+        handler = make_lambda_handler(app, coalesce=coalescer)
+
+        handler(make_v2_event(), None)
+
+        assert coalescer.unshareable == {}
+
+    def test_unshareable_expires(self) -> None:
+        coalescer = Coalescer()
+        with coalescer.lock:
+            coalescer.remember_unshareable(("GET",))
+            coalescer.unshareable[("GET",)] = time.monotonic() - 1
+
+            assert coalescer.recently_unshareable(("GET",)) is False
+        assert coalescer.unshareable == {}
+
+    def test_unshareable_max_keys(self) -> None:
+        coalescer = Coalescer()
+        with coalescer.lock:
+            for index in range(MAX_UNSHAREABLE_KEYS + 1):
+                coalescer.remember_unshareable((index,))
+
+        assert len(coalescer.unshareable) == MAX_UNSHAREABLE_KEYS
+        assert (0,) not in coalescer.unshareable
+        assert (1,) in coalescer.unshareable
+
+    @pytest.mark.parametrize(
+        "headers",
+        [
+            pytest.param([("Content-Type", "text/plain")], id="shareable"),
+            pytest.param(
+                [("Content-Type", "text/plain"), ("Set-Cookie", "a=1")],
+                id="not-shareable",
+            ),
+        ],
+    )
+    def test_leader_deadline(self, headers: list[tuple[str, str]]) -> None:
+        closed = []
+
+        class Result:
+            def __iter__(self):
+                for _ in range(50):
+                    time.sleep(0.01)
+                    yield b"Hello"
+
+            def close(self):
+                closed.append(True)
+
+        def app(environ, start_response):
+            start_response("200 OK", headers)
+            return Result()
+
+        coalescer = Coalescer()
+        handler = make_lambda_handler(app, coalesce=coalescer, deadline_margin_ms=950)
+        start = time.monotonic()
+
+        response = handler(make_v2_event(), ContextStub(remaining_time_in_millis=1_000))
+
+        assert response["statusCode"] == 504
+        assert response["body"] == "Gateway Timeout"
+        assert time.monotonic() - start < 0.3
+        assert closed == [True]
+        assert coalescer.in_flight == {}
+
+    def test_follower_deadline(self) -> None:
+        app = BlockingApp()
+        coalescer = Coalescer()
+        handler = make_lambda_handler(app, coalesce=coalescer, deadline_margin_ms=950)
+        leader = threading.Thread(target=handler, args=(make_v2_event(), None))
+        leader.start()
+        try:
+            assert app.entered.wait(5)
+            start = time.monotonic()
+
+            response = handler(
+                make_v2_event(), ContextStub(remaining_time_in_millis=1_000)
+            )
+
+            assert response["statusCode"] == 504
+            assert time.monotonic() - start < 0.3
+        finally:
+            app.release.set()
+            leader.join(5)
+        assert app.calls == 1
+
+    def test_generator_not_shareable_streams(self) -> None:
+        def app(environ, start_response):
+            start_response(
+                "200 OK", [("Content-Type", "text/plain"), ("Set-Cookie", "a=1")]
+            )
+            yield b"Hello "
+            yield b"World"
+
+        handler = make_lambda_handler(app, coalesce=Coalescer())
+
+        response = handler(make_v2_event(), None)
+
+        assert response["body"] == "Hello World"
+        assert response["cookies"] == ["a=1"]
+
+    @pytest.mark.parametrize(
+        "headers",
+        [
+            pytest.param([("Content-Type", "text/plain")], id="shareable"),
+            pytest.param(
+                [("Content-Type", "text/plain"), ("Set-Cookie", "a=1")],
+                id="not-shareable",
+            ),
+        ],
+    )
+    def test_head(self, headers: list[tuple[str, str]]) -> None:
+        def app(environ, start_response):
+            start_response("200 OK", headers)
+            return [b"Hello ", b"World"]
+
+        handler = make_lambda_handler(app, coalesce=Coalescer())
+
+        response = handler(make_v2_event(method="HEAD"), None)
+
+        assert response["headers"]["content-length"] == "11"
+        assert response["body"] == ""
+
+    def test_file_wrapper_mapped(
+        self, tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        path = tmp_path / "test.txt"
+        path.write_text("Hello World\n")
+        mapped = []
+        map_file = BaseResponse.map_file
+
+        def spy(self: BaseResponse, filelike: Any) -> bool:
+            mapped.append(filelike)
+            return map_file(self, filelike)
+
+        monkeypatch.setattr(BaseResponse, "map_file", spy)
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return environ["wsgi.file_wrapper"](path.open("rb"))
+
+        handler = make_lambda_handler(app, coalesce=Coalescer())
+
+        response = handler(make_v2_event(), None)
+
+        assert response["body"] == "Hello World\n"
+        assert len(mapped) == 1
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from io import StringIO
+from typing import Any
+
+import pytest
+
+from apig_wsgi import Timing, make_lambda_handler
+from apig_wsgi.errors import ErrorBoundary
+from tests.test_apig_wsgi import make_alb_event, make_v1_event, make_v2_event
+
+
+class FailingApp:
+    """
+    App that raises for paths starting /error, while calling the app or while
+    iterating its response.
+    """
+
+    def __call__(self, environ: dict[str, Any], start_response: Any) -> Any:
+        environ["wsgi.errors"] = self.errors = StringIO()
+        path = environ["PATH_INFO"]
+        if path == "/error":
+            raise ValueError("Boom")
+        start_response("200 OK", [("Content-Type", "text/html")])
+        if path == "/error-iterating":
+            return self.fail_iterating()
+        return [b"<p>Hello</p>"]
+
+    def fail_iterating(self) -> Any:
+        yield b"<p>Hello"
+        raise ValueError("Boom")
+
+
+parametrize_timed = pytest.mark.parametrize(
+    "timed", [pytest.param(False, id="untimed"), pytest.param(True, id="timed")]
+)
+
+
+class TestErrorBoundary:
+    def test_invalid_escalate_after(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            ErrorBoundary(escalate_after=0)
+
+        assert str(excinfo.value) == "escalate_after must be at least 1."
+
+    def test_disabled(self) -> None:
+        handler = make_lambda_handler(FailingApp())
+
+        with pytest.raises(ValueError, match="Boom"):
+            handler(make_v2_event(path="/error"), None)
+
+    @parametrize_timed
+    @pytest.mark.parametrize("path", ["/error", "/error-iterating"])
+    def test_v2(self, timed: bool, path: str) -> None:
+        app = FailingApp()
+        boundary = ErrorBoundary()
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            error_boundary=boundary,
+            on_timing=timings.append if timed else None,
+        )
+
+        response = handler(make_v2_event(path=path), None)
+
+        assert response == {
+            "statusCode": 500,
+            "cookies": [],
+            "headers": {"content-type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": "Internal Server Error",
+        }
+        traceback = app.errors.getvalue()
+        assert traceback.startswith("Traceback (most recent call last):")
+        assert traceback.count("ValueError: Boom") == 1
+        assert boundary.failures == 1
+        assert boundary.consecutive_failures == 1
+        if timed:
+            assert timings[0].status_code == 500
+
+    def test_v1_custom_response(self) -> None:
+        boundary = ErrorBoundary(
+            status_code=503,
+            headers=[("Content-Type", "application/json"), ("Retry-After", "1")],
+            body='{"error": "unavailable"}',
+        )
+        handler = make_lambda_handler(FailingApp(), error_boundary=boundary)
+
+        response = handler(make_v1_event(path="/error"), None)
+
+        assert response == {
+            "statusCode": 503,
+            "multiValueHeaders": {
+                "Content-Type": ["application/json"],
+                "Retry-After": ["1"],
+            },
+            "isBase64Encoded": False,
+            "body": '{"error": "unavailable"}',
+        }
+
+    def test_alb(self) -> None:
+        handler = make_lambda_handler(FailingApp(), error_boundary=ErrorBoundary())
+
+        response = handler(make_alb_event(path="/error", headers_multi=False), None)
+
+        assert response == {
+            "statusCode": 500,
+            "headers": {"Content-Type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": "Internal Server Error",
+        }
+
+    def test_head(self) -> None:
+        handler = make_lambda_handler(FailingApp(), error_boundary=ErrorBoundary())
+
+        response = handler(make_v2_event(method="HEAD", path="/error-iterating"), None)
+
+        assert response["statusCode"] == 500
+        assert response["headers"] == {
+            "content-type": "text/plain",
+            "content-length": "21",
+        }
+        assert response["body"] == ""
+
+    @parametrize_timed
+    def test_encoding_error(self, timed: bool) -> None:
+        def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+            start_response("200 OK", [("Content-Type", "image/png")])
+            return [b"\x89PNG"]
+
+        boundary = ErrorBoundary()
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            binary_support=False,
+            error_boundary=boundary,
+            on_timing=timings.append if timed else None,
+        )
+
+        response = handler(make_v1_event(), None)
+
+        assert response == {
+            "statusCode": 500,
+            "multiValueHeaders": {"Content-Type": ["text/plain"]},
+            "isBase64Encoded": False,
+            "body": "Internal Server Error",
+        }
+        assert boundary.failures == 1
+        if timed:
+            assert timings[0].status_code == 500
+
+    def test_success_resets_consecutive(self) -> None:
+        boundary = ErrorBoundary()
+        handler = make_lambda_handler(FailingApp(), error_boundary=boundary)
+        handler(make_v2_event(path="/error"), None)
+        handler(make_v2_event(path="/error"), None)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["statusCode"] == 200
+        assert boundary.failures == 2
+        assert boundary.consecutive_failures == 0
+
+    @parametrize_timed
+    def test_escalate(self, timed: bool) -> None:
+        app = FailingApp()
+        boundary = ErrorBoundary(escalate_after=2)
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            error_boundary=boundary,
+            on_timing=timings.append if timed else None,
+        )
+        response = handler(make_v2_event(path="/error"), None)
+        assert response["statusCode"] == 500
+
+        with pytest.raises(ValueError, match="Boom"):
+            handler(make_v2_event(path="/error"), None)
+
+        assert app.errors.getvalue() == ""
+        with pytest.raises(ValueError, match="Boom"):
+            handler(make_v2_event(path="/error"), None)
+        assert boundary.consecutive_failures == 3
+        handler(make_v2_event(), None)
+        response = handler(make_v2_event(path="/error"), None)
+        assert response["statusCode"] == 500
+
+    def test_succeeded(self) -> None:
+        boundary = ErrorBoundary()
+        boundary.consecutive_failures = 3
+
+        boundary.succeeded()
+
+        assert boundary.consecutive_failures == 0
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+from base64 import b64encode
+from http.client import responses
+from typing import Any
+
+import pytest
+
+from apig_wsgi import BaseResponse, Timing, V2Response, make_lambda_handler
+from apig_wsgi.limits import RequestLimits, body_exceeds, header_size
+from apig_wsgi.middleware import Middleware
+from tests import test_apig_wsgi
+from tests.test_apig_wsgi import (
+    make_alb_event,
+    make_lattice_v1_event,
+    make_v1_event,
+    make_v2_event,
+)
+
+
+class App:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, environ: dict[str, Any], start_response: Any) -> list[bytes]:
+        self.calls += 1
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"Hello World\n"]
+
+
+class TestHeaderSize:
+    def test_v1_multi_value(self) -> None:
+        event = make_v1_event(headers={"Host": ["example.com"], "X-A": ["1", "22"]})
+
+        assert header_size(event) == (3, len("Hostexample.com") + 2 * 3 + 3)
+
+    def test_v2_cookies(self) -> None:
+        event = make_v2_event(cookies=["a=1", "b=2"])
+
+        assert header_size(event) == (
+            2,
+            len("Hostexample.com") + len("cookie") + len("a=1; b=2"),
+        )
+
+
+class TestBodyExceeds:
+    @pytest.mark.parametrize("size", [0, 1, 2, 3, 4, 5, 99, 100])
+    def test_base64(self, size: int) -> None:
+        event = {"body": b64encode(b"x" * size).decode(), "isBase64Encoded": True}
+
+        assert body_exceeds(event, size) is False
+        assert body_exceeds(event, size - 1) is (size > 0)
+
+    def test_text_multibyte(self) -> None:
+        event = {"body": "é" * 10, "isBase64Encoded": False}
+
+        assert body_exceeds(event, 20) is False
+        assert body_exceeds(event, 19) is True
+
+    def test_text_long(self) -> None:
+        event = {"body": "x" * 10, "isBase64Encoded": False}
+
+        assert body_exceeds(event, 9) is True
+        assert body_exceeds(event, 40) is False
+
+
+parametrize_timed = pytest.mark.parametrize(
+    "timed", [pytest.param(False, id="untimed"), pytest.param(True, id="timed")]
+)
+
+
+class TestLimits:
+    @parametrize_timed
+    def test_within(self, timed: bool) -> None:
+        app = App()
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            limits=RequestLimits(
+                max_header_count=1,
+                max_header_bytes=100,
+                max_query_params=1,
+                max_body_size=5,
+            ),
+            on_timing=timings.append if timed else None,
+        )
+
+        response = handler(make_v2_event(query_string="a=1", body="Hello"), None)
+
+        assert response["statusCode"] == 200
+        assert app.calls == 1
+
+    @parametrize_timed
+    def test_header_count(self, timed: bool) -> None:
+        app = App()
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            limits=RequestLimits(max_header_count=1),
+            on_timing=timings.append if timed else None,
+        )
+
+        response = handler(
+            make_v1_event(headers={"Host": ["example.com"], "X-A": ["1"]}), None
+        )
+
+        assert response == {
+            "statusCode": 431,
+            "multiValueHeaders": {"Content-Type": ["text/plain"]},
+            "isBase64Encoded": False,
+            "body": responses[431],
+        }
+        assert app.calls == 0
+        assert timings == []
+
+    def test_header_bytes(self) -> None:
+        app = App()
+        handler = make_lambda_handler(app, limits=RequestLimits(max_header_bytes=20))
+
+        response = handler(make_v2_event(cookies=["session=abc123"]), None)
+
+        assert response == {
+            "statusCode": 431,
+            "cookies": [],
+            "headers": {"content-type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": responses[431],
+        }
+        assert app.calls == 0
+
+    def test_query_params_v2_repeated(self) -> None:
+        app = App()
+        handler = make_lambda_handler(app, limits=RequestLimits(max_query_params=2))
+
+        response = handler(make_v2_event(query_string="a=1&a=2&a=3"), None)
+
+        assert response["statusCode"] == 414
+        assert response["body"] == responses[414]
+        assert app.calls == 0
+
+    def test_query_params_alb(self) -> None:
+        app = App()
+        handler = make_lambda_handler(app, limits=RequestLimits(max_query_params=1))
+
+        response = handler(
+            make_alb_event(qs_params={"a": ["1"], "b": ["2"]}, headers_multi=False),
+            None,
+        )
+
+        assert response == {
+            "statusCode": 414,
+            "headers": {"Content-Type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": responses[414],
+        }
+
+    def test_body_base64(self) -> None:
+        app = App()
+        handler = make_lambda_handler(app, limits=RequestLimits(max_body_size=4))
+
+        event = make_v2_event()
+        event["body"] = b64encode(b"Hello").decode()
+        event["isBase64Encoded"] = True
+
+        response = handler(event, None)
+
+        assert response["statusCode"] == 413
+        assert response["body"] == responses[413]
+        assert app.calls == 0
+
+    def test_body_lattice(self) -> None:
+        app = App()
+        handler = make_lambda_handler(app, limits=RequestLimits(max_body_size=4))
+
+        response = handler(make_lattice_v1_event(body="Hello"), None)
+
+        assert response["statusCode"] == 413
+        assert response["statusDescription"] == f"413 {responses[413]}"
+        assert app.calls == 0
+
+    def test_custom_adapter(self) -> None:
+        app = App()
+        handler = make_lambda_handler(
+            app,
+            adapters={"queue-1.0": test_apig_wsgi.TestCustomAdapter.QueueAdapter()},
+            limits=RequestLimits(max_query_params=0),
+        )
+
+        response = handler(
+            {
+                "version": "queue-1.0",
+                "message": "Hi",
+                "queryStringParameters": {"a": "1"},
+            },
+            None,
+        )
+
+        assert response == {
+            "statusCode": 414,
+            "cookies": [],
+            "headers": {"content-type": "text/plain"},
+            "isBase64Encoded": False,
+            "body": responses[414],
+        }
+        assert app.calls == 0
+
+    def test_custom_adapter_error_response(self) -> None:
+        class QueueAdapter(test_apig_wsgi.TestCustomAdapter.QueueAdapter):
+            def get_environ(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+                raise AssertionError("Environ built")
+
+            def make_error_response(
+                self,
+                event: dict[str, Any],
+                *,
+                binary_support: bool,
+                non_binary_content_type_prefixes: tuple[str, ...],
+            ) -> BaseResponse:
+                return V2Response.acquire(
+                    binary_support=binary_support,
+                    non_binary_content_type_prefixes=non_binary_content_type_prefixes,
+                    spool_max_size=None,
+                )
+
+        handler = make_lambda_handler(
+            App(),
+            adapters={"queue-1.0": QueueAdapter()},
+            limits=RequestLimits(max_query_params=0),
+        )
+
+        response = handler(
+            {
+                "version": "queue-1.0",
+                "message": "Hi",
+                "queryStringParameters": {"a": "1"},
+            },
+            None,
+        )
+
+        assert response["statusCode"] == 414
+
+    def test_headers(self) -> None:
+        handler = make_lambda_handler(
+            App(),
+            limits=RequestLimits(
+                max_query_params=0,
+                headers=(("Access-Control-Allow-Origin", "*"),),
+            ),
+        )
+
+        response = handler(make_v2_event(query_string="a=1"), None)
+
+        assert response["headers"] == {
+            "content-type": "text/plain",
+            "access-control-allow-origin": "*",
+        }
+
+    def test_post_processing_skipped(self) -> None:
+        processed = []
+
+        class Recorder(Middleware):
+            def process_response(
+                self, environ: dict[str, Any], response: dict[str, Any]
+            ) -> dict[str, Any]:
+                processed.append(response)
+                return response
+
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            App(),
+            limits=RequestLimits(max_query_params=0),
+            middleware=[Recorder()],
+            on_timing=timings.append,
+            server_timing=True,
+        )
+
+        response = handler(make_v2_event(query_string="a=1"), None)
+
+        assert response["statusCode"] == 414
+        assert "server-timing" not in response["headers"]
+        assert processed == []
+        assert timings == []
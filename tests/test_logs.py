@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+import pytest
+
+from apig_wsgi import make_lambda_handler
+from apig_wsgi.logs import ErrorsBuffer, background_writer, get_errors_buffer
+from tests.test_apig_wsgi import ContextStub, make_v1_event, make_v2_event
+
+
+def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+    errors = environ["wsgi.errors"]
+    errors.write("First line\n")
+    errors.writelines(["Second ", "line\n"])
+    errors.flush()
+    if environ["PATH_INFO"] == "/error":
+        raise ValueError("Boom")
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"Hello World"]
+
+
+class TestErrorsBuffer:
+    def test_tagged_value(self) -> None:
+        buffer = ErrorsBuffer()
+        buffer.request_id = "abc"
+        buffer.write("One\nTwo\nThree")
+
+        assert buffer.tagged_value() == "abc\tOne\nabc\tTwo\nabc\tThree"
+
+    def test_tagged_value_no_request_id(self) -> None:
+        buffer = ErrorsBuffer()
+        buffer.write("One\n")
+
+        assert buffer.tagged_value() == "One\n"
+
+    def test_tagged_value_empty(self) -> None:
+        buffer = ErrorsBuffer()
+        buffer.request_id = "abc"
+
+        assert buffer.tagged_value() == ""
+
+    def test_reused_per_thread(self) -> None:
+        buffer = get_errors_buffer("a")
+        buffer.write("Old")
+
+        reused = get_errors_buffer("b")
+
+        assert reused is buffer
+        assert reused.getvalue() == ""
+        assert reused.request_id == "b"
+
+        buffers = []
+        thread = threading.Thread(target=lambda: buffers.append(get_errors_buffer("c")))
+        thread.start()
+        thread.join()
+        assert buffers[0] is not buffer
+
+
+class TestBufferErrors:
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            make_lambda_handler(app, buffer_errors="async")  # type: ignore [arg-type]
+
+        assert str(excinfo.value) == "Unknown buffer_errors value 'async'"
+
+    def test_default_unbuffered(self, capsys: pytest.CaptureFixture[str]) -> None:
+        handler = make_lambda_handler(app)
+
+        handler(make_v2_event(), ContextStub(aws_request_id="abc"))
+
+        assert capsys.readouterr().err == "First line\nSecond line\n"
+
+    @pytest.mark.parametrize("make_event", [make_v1_event, make_v2_event])
+    def test_sync(self, capsys: pytest.CaptureFixture[str], make_event: Any) -> None:
+        handler = make_lambda_handler(app, buffer_errors="sync")
+
+        response = handler(make_event(), ContextStub(aws_request_id="abc"))
+
+        assert response["statusCode"] == 200
+        assert capsys.readouterr().err == "abc\tFirst line\nabc\tSecond line\n"
+
+    def test_sync_single_write(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        writes: list[str] = []
+
+        class Stderr:
+            def write(self, text: str) -> int:
+                writes.append(text)
+                return len(text)
+
+            def flush(self) -> None:
+                pass
+
+        monkeypatch.setattr("sys.stderr", Stderr())
+        handler = make_lambda_handler(app, buffer_errors="sync")
+
+        handler(make_v2_event(), ContextStub(aws_request_id="abc"))
+
+        assert writes == ["abc\tFirst line\nabc\tSecond line\n"]
+
+    def test_sync_no_context(self, capsys: pytest.CaptureFixture[str]) -> None:
+        handler = make_lambda_handler(app, buffer_errors="sync")
+
+        handler(make_v2_event(), None)
+
+        assert capsys.readouterr().err == "First line\nSecond line\n"
+
+    def test_sync_error(self, capsys: pytest.CaptureFixture[str]) -> None:
+        handler = make_lambda_handler(app, buffer_errors="sync")
+
+        with pytest.raises(ValueError):
+            handler(make_v2_event(path="/error"), ContextStub(aws_request_id="abc"))
+
+        assert capsys.readouterr().err == "abc\tFirst line\nabc\tSecond line\n"
+
+    def test_sync_separate_invocations(
+        self, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        handler = make_lambda_handler(app, buffer_errors="sync", server_timing=True)
+
+        handler(make_v2_event(), ContextStub(aws_request_id="a"))
+        handler(make_v2_event(), ContextStub(aws_request_id="b"))
+
+        assert capsys.readouterr().err == (
+            "a\tFirst line\na\tSecond line\nb\tFirst line\nb\tSecond line\n"
+        )
+
+    def test_background(self, capsys: pytest.CaptureFixture[str]) -> None:
+        handler = make_lambda_handler(app, buffer_errors="background")
+
+        for request_id in ("a", "b"):
+            handler(make_v2_event(), ContextStub(aws_request_id=request_id))
+        background_writer.join()
+
+        assert capsys.readouterr().err == (
+            "a\tFirst line\na\tSecond line\nb\tFirst line\nb\tSecond line\n"
+        )
+
+    def test_background_nothing_written(
+        self, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        def quiet_app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+            start_response("200 OK", [])
+            return []
+
+        handler = make_lambda_handler(quiet_app, buffer_errors="background")
+
+        handler(make_v2_event(), ContextStub(aws_request_id="a"))
+        background_writer.join()
+
+        assert capsys.readouterr().err == ""
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from apig_wsgi import make_lambda_handler
+from apig_wsgi.memory import MemoryStats, MemoryWatchdog
+from tests.test_apig_wsgi import ContextStub, make_v2_event
+
+MIB = 1024 * 1024
+
+
+def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"Hello World\n"]
+
+
+class FakeStatm:
+    """
+    A statm file reporting a chosen resident set size, changed by reads.
+    """
+
+    def __init__(self, path: Path, page_size: int) -> None:
+        self.path = path
+        self.page_size = page_size
+
+    def set_rss(self, rss_bytes: int) -> None:
+        pages = rss_bytes // self.page_size
+        self.path.write_text(f"{pages * 2} {pages} 100 10 0 {pages} 0\n")
+
+
+@pytest.fixture()
+def statm(tmp_path: Path) -> FakeStatm:
+    page_size = MemoryWatchdog().page_size
+    return FakeStatm(tmp_path / "statm", page_size)
+
+
+class TestMemoryWatchdog:
+    def test_invalid_every(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            MemoryWatchdog(0)
+
+        assert str(excinfo.value) == "Sampling interval must be at least 1."
+
+    def test_invalid_thresholds(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            MemoryWatchdog(collect_threshold=0.9, recycle_threshold=0.8)
+
+        assert str(excinfo.value) == (
+            "Thresholds must satisfy 0 < collect_threshold <= recycle_threshold."
+        )
+
+    def test_read_rss(self) -> None:
+        watchdog = MemoryWatchdog()
+
+        rss = watchdog.read_rss()
+
+        if Path("/proc/self/statm").exists():
+            assert rss is not None
+            assert rss > 0
+        else:
+            assert rss is None
+
+    def test_read_rss_missing(self, tmp_path: Path) -> None:
+        watchdog = MemoryWatchdog(statm_path=str(tmp_path / "missing"))
+
+        assert watchdog.read_rss() is None
+
+    def test_every(self, statm: FakeStatm) -> None:
+        statm.set_rss(10 * MIB)
+        watchdog = MemoryWatchdog(3, statm_path=str(statm.path))
+        handler = make_lambda_handler(app, memory_watchdog=watchdog)
+
+        for _ in range(7):
+            response = handler(make_v2_event(), ContextStub(memory_limit_in_mb=128))
+            assert response["statusCode"] == 200
+
+        assert watchdog.stats == MemoryStats(
+            rss_bytes=10 * MIB, limit_bytes=128 * MIB, samples=2
+        )
+        assert watchdog.stats.usage == 10 / 128
+        assert watchdog.recycle is False
+
+    def test_no_context(self, statm: FakeStatm) -> None:
+        statm.set_rss(10 * MIB)
+        watchdog = MemoryWatchdog(1, statm_path=str(statm.path))
+        handler = make_lambda_handler(app, memory_watchdog=watchdog)
+
+        handler(make_v2_event(), None)
+
+        assert watchdog.stats.samples == 0
+        assert watchdog.stats.usage is None
+
+    def test_collect(self, statm: FakeStatm) -> None:
+        statm.set_rss(110 * MIB)
+        recycled: list[MemoryStats] = []
+        watchdog = MemoryWatchdog(
+            1, statm_path=str(statm.path), on_recycle=recycled.append
+        )
+
+        watchdog.check(128)
+
+        assert watchdog.stats.collections == 1
+        assert watchdog.stats.rss_after_collect_bytes == 110 * MIB
+        assert watchdog.recycle is False
+        assert recycled == []
+
+    def test_recycle(self, statm: FakeStatm) -> None:
+        statm.set_rss(120 * MIB)
+        recycled: list[MemoryStats] = []
+        watchdog = MemoryWatchdog(
+            1, statm_path=str(statm.path), on_recycle=recycled.append
+        )
+        handler = make_lambda_handler(app, memory_watchdog=watchdog)
+
+        handler(make_v2_event(), ContextStub(memory_limit_in_mb=128))
+
+        assert watchdog.recycle is True
+        assert recycled == [watchdog.stats]
+        assert watchdog.stats.collections == 1
+
+    def test_string_limit(self, statm: FakeStatm) -> None:
+        statm.set_rss(64 * MIB)
+        watchdog = MemoryWatchdog(statm_path=str(statm.path))
+
+        watchdog.check("128")
+
+        assert watchdog.stats.usage == 0.5
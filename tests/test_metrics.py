@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import json
+import time
+from io import StringIO
+from typing import Any
+
+import pytest
+
+from apig_wsgi import Timing, make_lambda_handler
+from apig_wsgi.metrics import (
+    EMFMetrics,
+    Histogram,
+    LatencyHistograms,
+    bucket_bounds,
+    bucket_index,
+)
+from tests.test_apig_wsgi import make_v2_event
+
+
+def make_timing(**kwargs: Any) -> Timing:
+    values: dict[str, Any] = {
+        "version": "2.0",
+        "method": "GET",
+        "path": "/",
+        "status_code": 200,
+        "dispatch_ns": 1_000,
+        "environ_ns": 20_000,
+        "app_ns": 3_000_000,
+        "consume_ns": 5_000,
+        "encode_ns": 300_000,
+        "request_body_bytes": 10,
+        "response_body_bytes": 100,
+        "base64_encoded": False,
+    }
+    values.update(kwargs)
+    return Timing(**values)
+
+
+def read_lines(stream: StringIO) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class TestEMFMetrics:
+    def test_one_line(self) -> None:
+        stream = StringIO()
+        metrics = EMFMetrics("MyApp", stream=stream)
+
+        metrics(make_timing())
+
+        (line,) = read_lines(stream)
+        aws = line.pop("_aws")
+        assert isinstance(aws["Timestamp"], int)
+        (directive,) = aws["CloudWatchMetrics"]
+        assert directive["Namespace"] == "MyApp"
+        assert directive["Dimensions"] == [["Method", "StatusCode", "EventVersion"]]
+        assert {"Name": "AppTime", "Unit": "Milliseconds"} in directive["Metrics"]
+        assert line == {
+            "Method": "GET",
+            "StatusCode": "200",
+            "EventVersion": "2.0",
+            "EnvironTime": 0.021,
+            "AppTime": 3.0,
+            "ConsumeTime": 0.005,
+            "EncodeTime": 0.3,
+            "TotalTime": 3.326,
+            "RequestBodySize": 10,
+            "ResponseBodySize": 100,
+            "Base64Expansion": 0,
+            "ColdStart": 1,
+        }
+
+    def test_cold_start_once(self) -> None:
+        stream = StringIO()
+        metrics = EMFMetrics("MyApp", stream=stream)
+
+        metrics(make_timing())
+        metrics(make_timing())
+
+        lines = read_lines(stream)
+        assert [line["ColdStart"] for line in lines] == [1, 0]
+
+    def test_base64_expansion(self) -> None:
+        stream = StringIO()
+        metrics = EMFMetrics("MyApp", stream=stream)
+
+        metrics(make_timing(base64_encoded=True, response_body_bytes=100))
+
+        (line,) = read_lines(stream)
+        assert line["Base64Expansion"] == 36
+
+    def test_route(self) -> None:
+        stream = StringIO()
+        metrics = EMFMetrics(
+            "MyApp",
+            route=lambda timing: timing.path.rsplit("/", 1)[0] + "/{id}",
+            stream=stream,
+        )
+
+        metrics(make_timing(path="/users/123"))
+
+        (line,) = read_lines(stream)
+        assert line["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [
+            ["Route", "Method", "StatusCode", "EventVersion"]
+        ]
+        assert line["Route"] == "/users/{id}"
+
+    def test_flush_every(self) -> None:
+        stream = StringIO()
+        metrics = EMFMetrics("MyApp", flush_every=3, stream=stream)
+
+        metrics(make_timing(app_ns=1_000_000))
+        metrics(make_timing(app_ns=2_000_000, status_code=404))
+        assert stream.getvalue() == ""
+        metrics(make_timing(app_ns=3_000_000))
+
+        lines = read_lines(stream)
+        assert len(lines) == 2
+        assert lines[0]["StatusCode"] == "200"
+        assert lines[0]["AppTime"] == [1.0, 3.0]
+        assert lines[0]["ColdStart"] == [1, 0]
+        assert lines[1]["StatusCode"] == "404"
+        assert lines[1]["AppTime"] == 2.0
+
+    def test_flush_interval(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = [1000.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        stream = StringIO()
+        metrics = EMFMetrics(
+            "MyApp", flush_every=1_000, flush_interval=10.0, stream=stream
+        )
+
+        metrics(make_timing())
+        now[0] += 9.0
+        metrics(make_timing())
+        assert stream.getvalue() == ""
+        now[0] += 1.0
+        metrics(make_timing())
+
+        (line,) = read_lines(stream)
+        assert len(line["AppTime"]) == 3
+
+    def test_flush_interval_disabled(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = [1000.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        stream = StringIO()
+        metrics = EMFMetrics(
+            "MyApp", flush_every=1_000, flush_interval=None, stream=stream
+        )
+
+        metrics(make_timing())
+        now[0] += 3600.0
+        metrics(make_timing())
+
+        assert stream.getvalue() == ""
+
+    def test_timestamp_first_value(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = [1000.0]
+        monkeypatch.setattr(time, "time", lambda: now[0])
+        stream = StringIO()
+        metrics = EMFMetrics("MyApp", flush_every=1_000, stream=stream)
+
+        metrics(make_timing())
+        now[0] += 5.0
+        metrics(make_timing(status_code=404))
+        now[0] += 5.0
+        metrics(make_timing())
+        metrics.flush()
+
+        lines = read_lines(stream)
+        assert [line["_aws"]["Timestamp"] for line in lines] == [
+            1_000_000,
+            1_005_000,
+        ]
+
+    def test_flush_max_values(self) -> None:
+        stream = StringIO()
+        metrics = EMFMetrics("MyApp", flush_every=1_000, stream=stream)
+
+        for _ in range(100):
+            metrics(make_timing())
+
+        (line,) = read_lines(stream)
+        assert len(line["AppTime"]) == 100
+
+    def test_flush_empty(self) -> None:
+        stream = StringIO()
+        metrics = EMFMetrics("MyApp", stream=stream)
+
+        metrics.flush()
+
+        assert stream.getvalue() == ""
+
+    def test_flush_every_invalid(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            EMFMetrics("MyApp", flush_every=0)
+
+        assert str(excinfo.value) == "flush_every must be at least 1."
+
+    def test_default_stdout(self, capsys: pytest.CaptureFixture[str]) -> None:
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"Hi"]
+
+        handler = make_lambda_handler(app, on_timing=EMFMetrics("MyApp"))
+
+        handler(make_v2_event(path="/hello"), None)
+
+        out = capsys.readouterr().out
+        assert out.count("\n") == 1
+        line = json.loads(out)
+        assert "Route" not in line
+        assert line["ResponseBodySize"] == 2
+
+
+class TestHistogram:
+    def test_bucket_bounds(self) -> None:
+        for value in [*range(200), 1_000_000, 123_456_789, 2**40 + 5]:
+            low, high = bucket_bounds(bucket_index(value))
+            assert low <= value <= high
+
+    def test_bucket_relative_error(self) -> None:
+        low, high = bucket_bounds(bucket_index(123_456_789))
+        assert (high - low) / low < 1 / 16
+
+    def test_empty(self) -> None:
+        assert Histogram().percentile(0.5) == 0
+
+    def test_percentiles(self) -> None:
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value * 1_000)
+
+        assert histogram.count == 1000
+        assert histogram.min == 1_000
+        assert histogram.max == 1_000_000
+        assert histogram.percentile(0.5) == pytest.approx(500_000, rel=0.04)
+        assert histogram.percentile(0.99) == pytest.approx(990_000, rel=0.04)
+        assert histogram.percentile(1.0) == 1_000_000
+        assert histogram.percentile(0.0) == 1_000
+
+    def test_merge(self) -> None:
+        first = Histogram()
+        second = Histogram()
+        for value in range(1, 11):
+            first.record(value)
+            second.record(value * 100)
+
+        first.merge(second)
+        first.merge(Histogram())
+
+        assert first.count == 20
+        assert first.total == 55 + 5500
+        assert first.min == 1
+        assert first.max == 1000
+        assert first.percentile(0.25) == 5
+
+    def test_merge_into_empty(self) -> None:
+        histogram = Histogram()
+        other = Histogram()
+        other.record(50)
+
+        histogram.merge(other)
+
+        assert (histogram.count, histogram.min, histogram.max) == (1, 50, 50)
+
+    def test_decreasing(self) -> None:
+        histogram = Histogram()
+        for value in (30, 20, 10):
+            histogram.record(value)
+
+        assert histogram.min == 10
+        assert histogram.max == 30
+
+
+class TestLatencyHistograms:
+    def test_flush_every(self) -> None:
+        stream = StringIO()
+        histograms = LatencyHistograms(
+            flush_interval=None, flush_every=3, stream=stream
+        )
+
+        histograms(make_timing(app_ns=1_000_000))
+        histograms(make_timing(app_ns=3_000_000))
+        assert stream.getvalue() == ""
+        histograms(make_timing(method="POST", status_code=201))
+
+        lines = read_lines(stream)
+        assert len(lines) == 2
+        assert lines[0]["method"] == "GET"
+        assert lines[0]["route"] == "*"
+        assert lines[0]["status"] == 200
+        assert lines[0]["count"] == 2
+        assert lines[0]["min_ms"] == 1.326
+        assert lines[0]["max_ms"] == 3.326
+        assert lines[0]["mean_ms"] == 2.326
+        assert set(lines[0]) >= {"p50_ms", "p90_ms", "p99_ms", "p999_ms"}
+        assert lines[1]["method"] == "POST"
+        assert lines[1]["status"] == 201
+
+        histograms(make_timing())
+        assert len(read_lines(stream)) == 2
+
+    def test_flush_interval(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = [1000.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        stream = StringIO()
+        histograms = LatencyHistograms(flush_interval=10.0, stream=stream)
+
+        histograms(make_timing())
+        now[0] += 9.0
+        histograms(make_timing())
+        assert stream.getvalue() == ""
+        now[0] += 1.0
+        histograms(make_timing())
+
+        (line,) = read_lines(stream)
+        assert line["count"] == 3
+
+    def test_route(self) -> None:
+        stream = StringIO()
+        histograms = LatencyHistograms(
+            route=lambda timing: "/users/{id}",
+            flush_interval=None,
+            flush_every=1,
+            stream=stream,
+        )
+
+        histograms(make_timing(path="/users/1"))
+
+        (line,) = read_lines(stream)
+        assert line["route"] == "/users/{id}"
+
+    def test_default_route_constant(self) -> None:
+        stream = StringIO()
+        histograms = LatencyHistograms(flush_interval=None, stream=stream)
+        for index in range(3):
+            histograms(make_timing(path=f"/users/{index}"))
+
+        histograms.flush()
+
+        (line,) = read_lines(stream)
+        assert line["route"] == "*"
+        assert line["count"] == 3
+
+    def test_max_keys(self) -> None:
+        stream = StringIO()
+        histograms = LatencyHistograms(
+            route=lambda timing: timing.path,
+            max_keys=2,
+            flush_interval=None,
+            stream=stream,
+        )
+        for index in range(5):
+            histograms(make_timing(path=f"/users/{index}"))
+        histograms(make_timing(path="/users/0"))
+
+        histograms.flush()
+
+        lines = read_lines(stream)
+        assert [(line["route"], line["count"]) for line in lines] == [
+            ("/users/0", 2),
+            ("/users/1", 1),
+            ("other", 3),
+        ]
+
+    def test_max_keys_invalid(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            LatencyHistograms(max_keys=0)
+
+        assert str(excinfo.value) == "max_keys must be at least 1."
+
+    def test_percentiles(self) -> None:
+        stream = StringIO()
+        histograms = LatencyHistograms(
+            flush_interval=None, percentiles=(0.75,), stream=stream
+        )
+        histograms(make_timing())
+
+        histograms.flush()
+
+        (line,) = read_lines(stream)
+        assert line["p75_ms"] == 3.326
+        assert "p50_ms" not in line
+
+    def test_flush_empty(self) -> None:
+        stream = StringIO()
+        histograms = LatencyHistograms(stream=stream)
+
+        histograms.flush()
+
+        assert stream.getvalue() == ""
+
+    def test_default_stdout(self, capsys: pytest.CaptureFixture[str]) -> None:
+        histograms = LatencyHistograms(flush_interval=None, flush_every=1)
+
+        histograms(make_timing())
+
+        line = json.loads(capsys.readouterr().out)
+        assert line["count"] == 1
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from apig_wsgi import Timing, make_lambda_handler
+from apig_wsgi.middleware import Middleware, compose
+from tests.test_apig_wsgi import make_v1_event, make_v2_event
+
+
+def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [environ.get("HTTP_X_USER", "anonymous").encode()]
+
+
+class RequireToken(Middleware):
+    def process_event(
+        self, event: dict[str, Any], context: Any
+    ) -> dict[str, Any] | None:
+        if event["headers"].get("x-token") != "secret":
+            return {"statusCode": 401, "headers": {}, "body": ""}
+        return None
+
+
+class SetUser(Middleware):
+    def process_environ(self, environ: dict[str, Any]) -> None:
+        environ["HTTP_X_USER"] = "alice"
+
+
+class AddHeader(Middleware):
+    def __init__(self, name: str, value: str) -> None:
+        self.name = name
+        self.value = value
+
+    def process_response(
+        self, environ: dict[str, Any], response: dict[str, Any]
+    ) -> dict[str, Any]:
+        response["headers"][self.name] = self.value
+        return response
+
+
+class Recorder(Middleware):
+    def __init__(self, name: str, calls: list[str]) -> None:
+        self.name = name
+        self.calls = calls
+
+    def process_event(
+        self, event: dict[str, Any], context: Any
+    ) -> dict[str, Any] | None:
+        self.calls.append(f"{self.name} event")
+        return None
+
+    def process_environ(self, environ: dict[str, Any]) -> None:
+        self.calls.append(f"{self.name} environ")
+
+    def process_response(
+        self, environ: dict[str, Any], response: dict[str, Any]
+    ) -> dict[str, Any]:
+        self.calls.append(f"{self.name} response")
+        return response
+
+
+parametrize_timed = pytest.mark.parametrize(
+    "timed", [pytest.param(False, id="untimed"), pytest.param(True, id="timed")]
+)
+
+
+class TestCompose:
+    def test_empty(self) -> None:
+        assert compose([]) == (None, None, None)
+
+    def test_unused_stages(self) -> None:
+        event_stage, environ_stage, response_stage = compose([SetUser()])
+
+        assert event_stage is None
+        assert environ_stage is not None
+        assert response_stage is None
+
+    def test_single_stage_not_wrapped(self) -> None:
+        middleware = SetUser()
+
+        _, environ_stage, _ = compose([middleware])
+
+        assert environ_stage == middleware.process_environ
+
+    def test_duck_typed(self) -> None:
+        class Plain:
+            def process_environ(self, environ: dict[str, Any]) -> None:
+                pass
+
+        plain = Plain()
+
+        assert compose([plain]) == (None, plain.process_environ, None)
+
+
+class TestMiddleware:
+    @parametrize_timed
+    def test_order(self, timed: bool) -> None:
+        calls: list[str] = []
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            middleware=[Recorder("a", calls), Recorder("b", calls)],
+            on_timing=timings.append if timed else None,
+        )
+
+        handler(make_v2_event(), None)
+
+        assert calls == [
+            "a event",
+            "b event",
+            "a environ",
+            "b environ",
+            "b response",
+            "a response",
+        ]
+
+    @parametrize_timed
+    def test_event_short_circuit(self, timed: bool) -> None:
+        calls: list[str] = []
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            middleware=[RequireToken(), Recorder("a", calls)],
+            on_timing=timings.append if timed else None,
+        )
+
+        response = handler(make_v2_event(), None)
+
+        assert response == {"statusCode": 401, "headers": {}, "body": ""}
+        assert calls == []
+        assert timings == []
+
+    def test_event_pass(self) -> None:
+        handler = make_lambda_handler(app, middleware=[RequireToken()])
+
+        response = handler(
+            make_v2_event(headers={"Host": "example.com", "x-token": "secret"}), None
+        )
+
+        assert response["statusCode"] == 200
+
+    @parametrize_timed
+    def test_environ(self, timed: bool) -> None:
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            middleware=[SetUser()],
+            on_timing=timings.append if timed else None,
+        )
+
+        response = handler(make_v1_event(), None)
+
+        assert response["body"] == "alice"
+
+    @parametrize_timed
+    def test_response(self, timed: bool) -> None:
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app,
+            middleware=[AddHeader("x-one", "1"), AddHeader("x-two", "2")],
+            on_timing=timings.append if timed else None,
+            server_timing=timed,
+        )
+
+        response = handler(make_v2_event(), None)
+
+        assert response["headers"]["x-one"] == "1"
+        assert response["headers"]["x-two"] == "2"
+        assert ("server-timing" in response["headers"]) is timed
+
+    def test_response_replaced(self) -> None:
+        class Replace(Middleware):
+            def process_response(
+                self, environ: dict[str, Any], response: dict[str, Any]
+            ) -> dict[str, Any]:
+                return {"statusCode": 204, "headers": {}, "body": ""}
+
+        handler = make_lambda_handler(app, middleware=[Replace()])
+
+        response = handler(make_v2_event(), None)
+
+        assert response == {"statusCode": 204, "headers": {}, "body": ""}
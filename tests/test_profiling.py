@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import pstats
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from apig_wsgi import make_lambda_handler
+from apig_wsgi.profiling import Profiler
+from tests.test_apig_wsgi import ContextStub, make_v2_event
+
+
+def app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"Hello World\n"]
+
+
+class TestProfiler:
+    def test_disabled(self) -> None:
+        assert Profiler.from_environ({}) is None
+
+    def test_from_environ(self, tmp_path: Path) -> None:
+        profiler = Profiler.from_environ(
+            {
+                "APIG_WSGI_PROFILE": "tracemalloc",
+                "APIG_WSGI_PROFILE_EVERY": "5",
+                "APIG_WSGI_PROFILE_DIR": str(tmp_path),
+                "APIG_WSGI_PROFILE_MAX_BYTES": "1000",
+            }
+        )
+
+        assert profiler is not None
+        assert profiler.mode == "tracemalloc"
+        assert profiler.every == 5
+        assert profiler.directory == tmp_path
+        assert profiler.max_bytes == 1000
+
+    def test_unknown_mode(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            Profiler("yappi")
+
+        assert str(excinfo.value) == (
+            "Unknown profiling mode 'yappi', should be one of: "
+            + "'cprofile', 'tracemalloc'"
+        )
+
+    def test_invalid_every(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            Profiler("cprofile", every=0)
+
+        assert str(excinfo.value) == "Profiling interval must be at least 1."
+
+    def test_cprofile_sampling(self, tmp_path: Path) -> None:
+        profiler = Profiler("cprofile", every=2, directory=tmp_path)
+        handler = profiler.wrap(make_lambda_handler(app))
+
+        response = handler(make_v2_event(), ContextStub(aws_request_id="req-1"))
+        assert response["body"] == "Hello World\n"
+        assert list(tmp_path.iterdir()) == []
+
+        response = handler(make_v2_event(), ContextStub(aws_request_id="req-2"))
+        assert response["body"] == "Hello World\n"
+        (path,) = tmp_path.iterdir()
+        assert path.name == "apig-wsgi-req-2.prof"
+        stats = pstats.Stats(str(path))
+        assert any(func[2] == "app" for func in stats.stats)  # type: ignore [attr-defined]
+
+    def test_tracemalloc(self, tmp_path: Path) -> None:
+        profiler = Profiler("tracemalloc", every=1, directory=tmp_path)
+        handler = profiler.wrap(make_lambda_handler(app))
+
+        handler(make_v2_event(), ContextStub(aws_request_id="req/1"))
+
+        (path,) = tmp_path.iterdir()
+        assert path.name == "apig-wsgi-req_1.tracemalloc"
+        snapshot = tracemalloc.Snapshot.load(str(path))
+        assert snapshot.traces is not None
+        assert not tracemalloc.is_tracing()
+
+    def test_tracemalloc_already_tracing(self, tmp_path: Path) -> None:
+        profiler = Profiler("tracemalloc", every=1, directory=tmp_path)
+        handler = profiler.wrap(make_lambda_handler(app))
+
+        tracemalloc.start()
+        try:
+            handler(make_v2_event(), ContextStub(aws_request_id="req-1"))
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+    def test_no_request_id(self, tmp_path: Path) -> None:
+        profiler = Profiler("cprofile", every=1, directory=tmp_path)
+        handler = profiler.wrap(make_lambda_handler(app))
+
+        handler(make_v2_event(), None)
+
+        (path,) = tmp_path.iterdir()
+        assert path.name == "apig-wsgi-1.prof"
+
+    def test_rotation(self, tmp_path: Path) -> None:
+        profiler = Profiler("cprofile", every=1, directory=tmp_path, max_bytes=1)
+        handler = profiler.wrap(make_lambda_handler(app))
+
+        for i in range(3):
+            handler(make_v2_event(), ContextStub(aws_request_id=f"req-{i}"))
+
+        assert [p.name for p in tmp_path.iterdir()] == ["apig-wsgi-req-2.prof"]
+
+    def test_exception_still_dumped(self, tmp_path: Path) -> None:
+        def broken_app(environ, start_response):
+            raise ValueError("Oops")
+
+        profiler = Profiler("cprofile", every=1, directory=tmp_path)
+        handler = profiler.wrap(make_lambda_handler(broken_app))
+
+        with pytest.raises(ValueError):
+            handler(make_v2_event(), ContextStub(aws_request_id="req-1"))
+
+        assert [p.name for p in tmp_path.iterdir()] == ["apig-wsgi-req-1.prof"]
+
+    @pytest.mark.parametrize("mode", ["cprofile", "tracemalloc"])
+    def test_write_error_logged(
+        self, tmp_path: Path, mode: str, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        profiler = Profiler(mode, every=1, directory=tmp_path / "missing")
+        handler = profiler.wrap(make_lambda_handler(app))
+
+        response = handler(make_v2_event(), ContextStub(aws_request_id="req-1"))
+
+        assert response["statusCode"] == 200
+        err = capsys.readouterr().err
+        assert err.startswith("apig-wsgi: could not write profile ")
+        assert "apig-wsgi-req-1" in err
+
+    def test_write_error_keeps_exception(self, tmp_path: Path) -> None:
+        def broken_app(environ, start_response):
+            raise ValueError("Oops")
+
+        profiler = Profiler("cprofile", every=1, directory=tmp_path / "missing")
+        handler = profiler.wrap(make_lambda_handler(broken_app))
+
+        with pytest.raises(ValueError, match="Oops"):
+            handler(make_v2_event(), ContextStub(aws_request_id="req-1"))
+
+    def test_make_lambda_handler_environ(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("APIG_WSGI_PROFILE", "cprofile")
+        monkeypatch.setenv("APIG_WSGI_PROFILE_EVERY", "1")
+        monkeypatch.setenv("APIG_WSGI_PROFILE_DIR", str(tmp_path))
+        handler = make_lambda_handler(app)
+
+        handler(make_v2_event(), ContextStub(aws_request_id="req-1"))
+
+        assert [p.name for p in tmp_path.iterdir()] == ["apig-wsgi-req-1.prof"]
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from apig_wsgi import make_lambda_handler
+from apig_wsgi.bench import load_events
+from apig_wsgi.recording import EventRecorder
+from tests.test_apig_wsgi import ContextStub, make_v1_event, make_v2_event
+
+
+def app(environ: dict[str, Any], start_response: Any) -> list[bytes]:
+    start_response(
+        "200 OK",
+        [("Content-Type", "text/plain"), ("Set-Cookie", "session=secret; Path=/")],
+    )
+    return [b"Hello World"]
+
+
+def read_records(path: Path) -> list[dict[str, Any]]:
+    with gzip.open(path, "rt") as file:
+        return [json.loads(line) for line in file]
+
+
+class TestEventRecorder:
+    def test_invalid_every(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            EventRecorder(0)
+
+        assert str(excinfo.value) == "Recording interval must be at least 1."
+
+    def test_invalid_flush_every(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            EventRecorder(flush_every=0)
+
+        assert str(excinfo.value) == "flush_every must be at least 1."
+
+    def test_sampling(self) -> None:
+        batches: list[list[dict[str, Any]]] = []
+        recorder = EventRecorder(3, callback=batches.append, flush_every=1)
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        for index in range(7):
+            handler(
+                make_v2_event(path=f"/{index}"), ContextStub(aws_request_id=str(index))
+            )
+
+        assert [batch[0]["event"]["rawPath"] for batch in batches] == ["/2", "/5"]
+        assert [batch[0]["request_id"] for batch in batches] == ["2", "5"]
+        assert "response" not in batches[0][0]
+
+    def test_buffered(self) -> None:
+        batches: list[list[dict[str, Any]]] = []
+        recorder = EventRecorder(1, callback=batches.append, flush_every=3)
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        for _ in range(2):
+            handler(make_v2_event(), None)
+        assert batches == []
+
+        handler(make_v2_event(), None)
+        assert len(batches) == 1
+        assert len(batches[0]) == 3
+
+    def test_flush_empty(self) -> None:
+        batches: list[list[dict[str, Any]]] = []
+        recorder = EventRecorder(callback=batches.append)
+
+        recorder.flush()
+
+        assert batches == []
+
+    def test_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "events.jsonl.gz"
+        recorder = EventRecorder(1, path=path, flush_every=2)
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        for _ in range(4):
+            handler(make_v2_event(), None)
+
+        records = read_records(path)
+        assert len(records) == 4
+        assert records[0]["event"]["version"] == "2.0"
+
+    def test_file_max_bytes(self, tmp_path: Path) -> None:
+        path = tmp_path / "events.jsonl.gz"
+        recorder = EventRecorder(1, path=path, flush_every=1, max_bytes=1)
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        for _ in range(3):
+            handler(make_v2_event(), None)
+
+        assert len(read_records(path)) == 1
+
+    def test_replayable(self, tmp_path: Path) -> None:
+        recorder = EventRecorder(1, path=tmp_path / "events.jsonl.gz", flush_every=1)
+        handler = make_lambda_handler(app, recorder=recorder)
+        handler(make_v2_event(path="/recorded"), None)
+
+        events = load_events(tmp_path, format="v2")
+
+        assert [event["rawPath"] for event in events] == ["/recorded"]
+
+    def test_body_before_removal(self) -> None:
+        batches: list[list[dict[str, Any]]] = []
+        recorder = EventRecorder(1, callback=batches.append, flush_every=1)
+        handler = make_lambda_handler(app, recorder=recorder, retain_full_event="none")
+
+        handler(make_v2_event(body="Hi"), None)
+
+        assert batches[0][0]["event"]["body"] == "Hi"
+
+    def test_responses(self) -> None:
+        batches: list[list[dict[str, Any]]] = []
+        recorder = EventRecorder(
+            1, callback=batches.append, flush_every=1, record_responses=True
+        )
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        response = handler(make_v1_event(), None)
+
+        recorded = batches[0][0]["response"]
+        assert recorded["multiValueHeaders"]["Set-Cookie"] == ["[REDACTED]"]
+        assert recorded["body"] == "Hello World"
+        # The returned response is untouched.
+        assert response["multiValueHeaders"]["Set-Cookie"] == ["session=secret; Path=/"]
+
+    def test_pending_truncated(self) -> None:
+        batches: list[list[dict[str, Any]]] = []
+        recorder = EventRecorder(
+            1,
+            callback=batches.append,
+            flush_every=10,
+            max_body_size=4,
+            record_responses=True,
+        )
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        handler(make_v2_event(body="Hello World"), None)
+
+        (record,) = recorder.pending
+        assert record["event"]["body"] == "Hell"
+        assert record["event"]["bodyTruncated"] is True
+        assert record["response"]["body"] == "Hell"
+
+    def test_write_error_logged(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        recorder = EventRecorder(
+            1, path=tmp_path / "missing" / "events.jsonl.gz", flush_every=1
+        )
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["statusCode"] == 200
+        assert capsys.readouterr().err.startswith(
+            "apig-wsgi: could not write recorded events: FileNotFoundError("
+        )
+        assert recorder.pending == []
+
+    def test_callback_error_logged(self, capsys: pytest.CaptureFixture[str]) -> None:
+        def callback(records: list[dict[str, Any]]) -> None:
+            raise RuntimeError("Queue unavailable")
+
+        recorder = EventRecorder(1, callback=callback, flush_every=1)
+        handler = make_lambda_handler(app, recorder=recorder)
+
+        response = handler(make_v2_event(), None)
+
+        assert response["statusCode"] == 200
+        assert "RuntimeError('Queue unavailable')" in capsys.readouterr().err
+
+
+class TestRedact:
+    def test_headers(self) -> None:
+        recorder = EventRecorder()
+        event = make_v1_event(
+            headers={
+                "Authorization": ["Bearer abc"],
+                "X-API-Key": ["key"],
+                "Accept": ["text/html"],
+            }
+        )
+        event["headers"] = {"Authorization": "Bearer abc", "Accept": "text/html"}
+
+        redacted = recorder.redact(event)
+
+        assert redacted["multiValueHeaders"] == {
+            "Authorization": ["[REDACTED]"],
+            "X-API-Key": ["[REDACTED]"],
+            "Accept": ["text/html"],
+        }
+        assert redacted["headers"] == {
+            "Authorization": "[REDACTED]",
+            "Accept": "text/html",
+        }
+        # The original is untouched.
+        assert event["headers"]["Authorization"] == "Bearer abc"
+
+    def test_custom_headers(self) -> None:
+        recorder = EventRecorder(redact_headers=["X-Secret"])
+
+        redacted = recorder.redact(
+            {"headers": {"x-secret": "1", "authorization": "Bearer abc"}}
+        )
+
+        assert redacted["headers"] == {
+            "x-secret": "[REDACTED]",
+            "authorization": "Bearer abc",
+        }
+
+    def test_v2_cookies(self) -> None:
+        recorder = EventRecorder()
+
+        redacted = recorder.redact(make_v2_event(cookies=["a=1", "b=2"]))
+
+        assert redacted["cookies"] == ["[REDACTED]", "[REDACTED]"]
+
+    def test_named_cookies(self) -> None:
+        recorder = EventRecorder(redact_headers=(), redact_cookies=["session"])
+
+        redacted = recorder.redact(
+            {
+                "cookies": ["session=abc", "theme=dark"],
+                "headers": {"cookie": "theme=dark; session=abc"},
+                "multiValueHeaders": {"Set-Cookie": ["session=xyz; Path=/"]},
+            }
+        )
+
+        assert redacted["cookies"] == ["session=[REDACTED]", "theme=dark"]
+        assert redacted["headers"] == {"cookie": "theme=dark; session=[REDACTED]"}
+        assert redacted["multiValueHeaders"] == {
+            "Set-Cookie": ["session=[REDACTED]; Path=/"]
+        }
+
+    def test_no_redaction(self) -> None:
+        recorder = EventRecorder(redact_headers=())
+
+        redacted = recorder.redact({"cookies": ["a=1"], "headers": {"cookie": "a=1"}})
+
+        assert redacted == {"cookies": ["a=1"], "headers": {"cookie": "a=1"}}
+
+    def test_truncate_body(self) -> None:
+        recorder = EventRecorder(max_body_size=10)
+
+        redacted = recorder.redact({"body": "x" * 20, "isBase64Encoded": False})
+
+        assert redacted["body"] == "x" * 10
+        assert redacted["bodyTruncated"] is True
+
+    def test_truncate_base64_body(self) -> None:
+        recorder = EventRecorder(max_body_size=10)
+
+        redacted = recorder.redact({"body": "A" * 20, "is_base64_encoded": True})
+
+        assert redacted["body"] == "A" * 8
+
+    def test_short_body(self) -> None:
+        recorder = EventRecorder(max_body_size=10)
+
+        redacted = recorder.redact({"body": "short"})
+
+        assert redacted == {"body": "short"}
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from typing import Any
+
+from apig_wsgi import make_lambda_handler
+from apig_wsgi.routing import Router
+from tests.test_apig_wsgi import make_v1_event, make_v2_event
+
+
+class RecordingApp:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.environ: dict[str, Any] | None = None
+
+    def __call__(self, environ, start_response):
+        self.environ = environ
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [self.name.encode()]
+
+
+def call(router: Router, path: str, host: str = "example.com") -> dict[str, Any]:
+    environ = {
+        "PATH_INFO": path,
+        "SCRIPT_NAME": "",
+        "SERVER_NAME": host,
+        "HTTP_HOST": host,
+    }
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+
+    body = b"".join(router(environ, start_response))
+    return {"status": statuses[0], "body": body, "environ": environ}
+
+
+class TestRouter:
+    def test_prefix(self) -> None:
+        router = Router({"/admin": RecordingApp("admin"), "": RecordingApp("root")})
+
+        result = call(router, "/admin/users")
+
+        assert result["body"] == b"admin"
+        assert result["environ"]["SCRIPT_NAME"] == "/admin"
+        assert result["environ"]["PATH_INFO"] == "/users"
+
+    def test_prefix_exact(self) -> None:
+        router = Router({"/admin/": RecordingApp("admin")})
+
+        result = call(router, "/admin")
+
+        assert result["body"] == b"admin"
+        assert result["environ"]["SCRIPT_NAME"] == "/admin"
+        assert result["environ"]["PATH_INFO"] == ""
+
+    def test_prefix_trailing_slash(self) -> None:
+        router = Router({"/admin": RecordingApp("admin")})
+
+        result = call(router, "/admin/")
+
+        assert result["environ"]["SCRIPT_NAME"] == "/admin"
+        assert result["environ"]["PATH_INFO"] == "/"
+
+    def test_prefix_segment_boundary(self) -> None:
+        router = Router({"/admin": RecordingApp("admin"), "/": RecordingApp("root")})
+
+        result = call(router, "/administrator")
+
+        assert result["body"] == b"root"
+        assert result["environ"]["SCRIPT_NAME"] == ""
+        assert result["environ"]["PATH_INFO"] == "/administrator"
+
+    def test_longest_prefix(self) -> None:
+        router = Router(
+            {
+                "/api": RecordingApp("api"),
+                "/api/v2": RecordingApp("api-v2"),
+            }
+        )
+
+        result = call(router, "/api/v2/users")
+
+        assert result["body"] == b"api-v2"
+        assert result["environ"]["SCRIPT_NAME"] == "/api/v2"
+        assert result["environ"]["PATH_INFO"] == "/users"
+
+    def test_not_found(self) -> None:
+        router = Router({"/admin": RecordingApp("admin")})
+
+        result = call(router, "/other")
+
+        assert result["status"] == "404 Not Found"
+        assert result["body"] == b"Not Found"
+
+    def test_path_without_slash(self) -> None:
+        router = Router({"/admin": RecordingApp("admin")})
+
+        result = call(router, "other")
+
+        assert result["status"] == "404 Not Found"
+
+    def test_host(self) -> None:
+        router = Router(
+            {
+                "admin.example.com": RecordingApp("admin"),
+                "/": RecordingApp("root"),
+            }
+        )
+
+        result = call(router, "/users", host="Admin.Example.com:443")
+
+        assert result["body"] == b"admin"
+        assert result["environ"]["SCRIPT_NAME"] == ""
+        assert result["environ"]["PATH_INFO"] == "/users"
+
+    def test_host_fallback(self) -> None:
+        router = Router(
+            {
+                "admin.example.com": RecordingApp("admin"),
+                "/": RecordingApp("root"),
+            }
+        )
+
+        result = call(router, "/users", host="www.example.com")
+
+        assert result["body"] == b"root"
+
+    def test_host_prefix(self) -> None:
+        router = Router(
+            {
+                "example.com/hooks": RecordingApp("hooks"),
+                "example.com": RecordingApp("main"),
+            }
+        )
+
+        result = call(router, "/hooks/github")
+
+        assert result["body"] == b"hooks"
+        assert result["environ"]["SCRIPT_NAME"] == "/hooks"
+        assert result["environ"]["PATH_INFO"] == "/github"
+
+    def test_host_prefix_falls_back_to_prefix(self) -> None:
+        router = Router(
+            {
+                "example.com/hooks": RecordingApp("hooks"),
+                "/": RecordingApp("root"),
+            }
+        )
+
+        result = call(router, "/other")
+
+        assert result["body"] == b"root"
+
+    def test_host_only_not_found(self) -> None:
+        router = Router({"admin.example.com": RecordingApp("admin")})
+
+        result = call(router, "/", host="www.example.com")
+
+        assert result["status"] == "404 Not Found"
+
+
+class TestMakeLambdaHandler:
+    def test_v1(self) -> None:
+        admin = RecordingApp("admin")
+        handler = make_lambda_handler({"/admin": admin, "/": RecordingApp("root")})
+
+        response = handler(make_v1_event(path="/admin/login"), None)
+
+        assert response["body"] == "admin"
+        assert admin.environ is not None
+        assert admin.environ["SCRIPT_NAME"] == "/admin"
+        assert admin.environ["PATH_INFO"] == "/login"
+
+    def test_v2_not_found(self) -> None:
+        handler = make_lambda_handler({"/admin": RecordingApp("admin")})
+
+        response = handler(make_v2_event(path="/"), None)
+
+        assert response["statusCode"] == 404
+        assert response["body"] == "Not Found"
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import http.client
+import threading
+from collections.abc import Generator, Iterable
+from typing import Any
+
+import pytest
+
+from apig_wsgi import get_version
+from apig_wsgi.serve import (
+    LocalContext,
+    Server,
+    make_event,
+    make_server,
+    response_to_http,
+)
+
+
+def app(environ: dict[str, Any], start_response: Any) -> Iterable[bytes]:
+    if environ["PATH_INFO"] == "/error":
+        raise ValueError("Boom")
+    body = environ["wsgi.input"].read()
+    content_type = "application/octet-stream" if body else "text/plain"
+    start_response(
+        "201 Created",
+        [
+            ("Content-Type", content_type),
+            ("Set-Cookie", "a=1"),
+            ("Set-Cookie", "b=2"),
+            ("X-Path", environ["PATH_INFO"]),
+            ("X-Query", environ["QUERY_STRING"]),
+            ("X-Cookie", environ.get("HTTP_COOKIE", "")),
+            ("X-Remote-Addr", environ["REMOTE_ADDR"]),
+        ],
+    )
+    return [body or b"Hello World"]
+
+
+@pytest.fixture(params=["1.0", "alb", "2.0"])
+def server(request: pytest.FixtureRequest) -> Generator[Server]:
+    server = make_server(
+        app, format=request.param, port=0, quiet=True, binary_support=True
+    )
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+def request(
+    server: Server,
+    method: str,
+    target: str,
+    *,
+    body: bytes | None = None,
+    headers: dict[str, str] | None = None,
+) -> http.client.HTTPResponse:
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    connection.request(method, target, body=body, headers=headers or {})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response
+
+
+def make_test_event(format: str, **kwargs: Any) -> dict[str, Any]:
+    values: dict[str, Any] = {
+        "method": "GET",
+        "target": "/",
+        "headers": [("Host", "example.com")],
+        "body": b"",
+        "source_ip": "10.0.0.1",
+    }
+    values.update(kwargs)
+    return make_event(format, **values)
+
+
+class TestMakeEvent:
+    @pytest.mark.parametrize("format", ["1.0", "alb", "2.0"])
+    def test_version(self, format: str) -> None:
+        assert get_version(make_test_event(format)) == format
+
+    def test_unknown_format(self) -> None:
+        with pytest.raises(ValueError) as excinfo:
+            make_test_event("3.0")
+
+        assert str(excinfo.value) == "Unknown format '3.0'"
+
+    def test_v1(self) -> None:
+        event = make_test_event(
+            "1.0",
+            target="/a%20b?x=1&x=2&y=a%26b",
+            headers=[("Host", "example.com"), ("Accept", "a"), ("Accept", "b")],
+        )
+
+        assert event["path"] == "/a%20b"
+        assert event["multiValueQueryStringParameters"] == {
+            "x": ["1", "2"],
+            "y": ["a&b"],
+        }
+        assert event["queryStringParameters"] == {"x": "2", "y": "a&b"}
+        assert event["multiValueHeaders"]["Accept"] == ["a", "b"]
+        assert event["multiValueHeaders"]["X-Forwarded-For"] == ["10.0.0.1"]
+        assert event["headers"]["Accept"] == "b"
+        assert event["requestContext"]["identity"]["sourceIp"] == "10.0.0.1"
+
+    def test_alb(self) -> None:
+        event = make_test_event("alb", target="/?y=a%26b&z")
+
+        assert event["multiValueQueryStringParameters"] == {
+            "y": ["a%26b"],
+            "z": [""],
+        }
+        assert "queryStringParameters" not in event
+        assert event["multiValueHeaders"]["host"] == ["example.com"]
+        assert "headers" not in event
+
+    def test_alb_single_value(self) -> None:
+        event = make_test_event("alb", target="/?y=1&y=2", multi_value=False)
+
+        assert event["queryStringParameters"] == {"y": "2"}
+        assert event["headers"]["host"] == "example.com"
+        assert "multiValueHeaders" not in event
+
+    def test_alb_no_query(self) -> None:
+        event = make_test_event("alb", multi_value=False)
+
+        assert event["queryStringParameters"] is None
+
+    def test_v2(self) -> None:
+        event = make_test_event(
+            "2.0",
+            target="/path?x=1&x=2",
+            headers=[
+                ("Host", "example.com"),
+                ("Cookie", "a=1; b=2"),
+                ("Accept", "a"),
+                ("Accept", "b"),
+            ],
+        )
+
+        assert event["rawPath"] == "/path"
+        assert event["rawQueryString"] == "x=1&x=2"
+        assert event["queryStringParameters"] == {"x": "1,2"}
+        assert event["cookies"] == ["a=1", "b=2"]
+        assert event["headers"] == {"host": "example.com", "accept": "a,b"}
+        assert event["requestContext"]["http"]["sourceIp"] == "10.0.0.1"
+
+    @pytest.mark.parametrize("format", ["1.0", "alb", "2.0"])
+    def test_body_text(self, format: str) -> None:
+        event = make_test_event(format, body="é".encode())
+
+        assert event["body"] == "é"
+        assert event["isBase64Encoded"] is False
+
+    @pytest.mark.parametrize("format", ["1.0", "alb", "2.0"])
+    def test_body_binary(self, format: str) -> None:
+        event = make_test_event(format, body=b"\xff")
+
+        assert event["body"] == "/w=="
+        assert event["isBase64Encoded"] is True
+
+
+class TestResponseToHttp:
+    def test_multi_value_headers(self) -> None:
+        assert response_to_http(
+            {
+                "statusCode": 200,
+                "multiValueHeaders": {"Set-Cookie": ["a=1", "b=2"]},
+                "isBase64Encoded": False,
+                "body": "Hi",
+            }
+        ) == (200, [("Set-Cookie", "a=1"), ("Set-Cookie", "b=2")], b"Hi")
+
+    def test_cookies(self) -> None:
+        assert response_to_http(
+            {
+                "statusCode": 200,
+                "headers": {"content-type": "text/plain"},
+                "cookies": ["a=1"],
+                "isBase64Encoded": True,
+                "body": "/w==",
+            }
+        ) == (200, [("content-type", "text/plain"), ("Set-Cookie", "a=1")], b"\xff")
+
+
+class TestLocalContext:
+    def test_remaining_time(self) -> None:
+        context = LocalContext(timeout_ms=10_000)
+
+        assert 9_000 < context.get_remaining_time_in_millis() <= 10_000
+        assert context.aws_request_id != LocalContext().aws_request_id
+
+
+class TestServer:
+    def test_unknown_format(self) -> None:
+        with pytest.raises(ValueError):
+            make_server(app, format="3.0", port=0)
+
+    def test_get(self, server: Server) -> None:
+        response = request(
+            server,
+            "GET",
+            "/some%20path?q=a+b",
+            headers={"Cookie": "c=3; d=4"},
+        )
+
+        assert response.status == 201
+        assert response.getheader("Content-Type") == "text/plain"
+        assert response.getheader("Content-Length") == "11"
+        assert response.headers.get_all("Set-Cookie") == ["a=1", "b=2"]
+        assert response.getheader("X-Path") == "/some path"
+        assert response.getheader("X-Query") == "q=a+b"
+        assert response.getheader("X-Cookie") in ("c=3; d=4", "c=3;d=4")
+        assert response.getheader("X-Remote-Addr") == "127.0.0.1"
+
+    def test_binary_body(self, server: Server) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request("POST", "/", body=b"\x00\xff")
+        response = connection.getresponse()
+
+        assert response.getheader("Content-Type") == "application/octet-stream"
+        assert response.read() == b"\x00\xff"
+        connection.close()
+
+    def test_head(self, server: Server) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request("HEAD", "/")
+        response = connection.getresponse()
+
+        assert response.status == 201
+        assert response.read() == b""
+        connection.close()
+
+    def test_keep_alive(self, server: Server) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        for _ in range(2):
+            connection.request("GET", "/")
+            assert connection.getresponse().read() == b"Hello World"
+        connection.close()
+
+    def test_error(self, server: Server, capsys: pytest.CaptureFixture[str]) -> None:
+        response = request(server, "GET", "/error")
+
+        assert response.status == 502
+        assert "ValueError: Boom" in capsys.readouterr().err
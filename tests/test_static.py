@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import gzip
+from base64 import b64decode, b64encode
+from pathlib import Path
+
+import pytest
+
+from apig_wsgi import Timing, make_lambda_handler
+from apig_wsgi.static import StaticFiles
+from tests.test_apig_wsgi import make_v1_event, make_v2_event
+
+CSS = "body { color: red; }\n" * 50
+
+
+def app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"From app"]
+
+
+@pytest.fixture
+def static_dir(tmp_path: Path) -> Path:
+    (tmp_path / "robots.txt").write_text("User-agent: *\n")
+    (tmp_path / "favicon.png").write_bytes(b"\x89PNG\xff\xfe")
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text(CSS)
+    (tmp_path / "blob").write_bytes(b"\x00\x01")
+    return tmp_path
+
+
+class TestStaticFiles:
+    def test_text(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v2_event(path="/robots.txt"), None)
+
+        etag = response["headers"]["etag"]
+        assert etag.startswith('"') and etag.endswith('"')
+        assert response == {
+            "statusCode": 200,
+            "cookies": [],
+            "headers": {
+                "content-type": "text/plain; charset=utf-8",
+                "content-length": "14",
+                "etag": etag,
+            },
+            "isBase64Encoded": False,
+            "body": "User-agent: *\n",
+        }
+
+    def test_binary(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v2_event(path="/favicon.png"), None)
+
+        assert response["headers"]["content-type"] == "image/png"
+        assert response["isBase64Encoded"] is True
+        assert response["body"] == b64encode(b"\x89PNG\xff\xfe").decode()
+
+    def test_unknown_content_type(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v2_event(path="/blob"), None)
+
+        assert response["headers"]["content-type"] == "application/octet-stream"
+        assert response["isBase64Encoded"] is True
+
+    def test_binary_without_binary_support(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v1_event(path="/favicon.png"), None)
+
+        assert response["body"] == "From app"
+
+    def test_text_without_binary_support(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v1_event(path="/robots.txt"), None)
+
+        assert response["multiValueHeaders"]["Content-Type"] == [
+            "text/plain; charset=utf-8"
+        ]
+        assert response["isBase64Encoded"] is False
+        assert response["body"] == "User-agent: *\n"
+
+    def test_nested(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v2_event(path="/css/site.css"), None)
+
+        assert response["headers"]["content-type"] == "text/css; charset=utf-8"
+        assert response["headers"]["vary"] == "Accept-Encoding"
+        assert response["body"] == CSS
+
+    def test_gzip(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(
+            make_v2_event(
+                path="/css/site.css", headers={"Accept-Encoding": "gzip, br"}
+            ),
+            None,
+        )
+
+        headers = response["headers"]
+        assert headers["content-encoding"] == "gzip"
+        assert headers["vary"] == "Accept-Encoding"
+        body = b64decode(response["body"])
+        assert headers["content-length"] == str(len(body))
+        assert response["isBase64Encoded"] is True
+        assert gzip.decompress(body) == CSS.encode()
+
+    def test_gzip_without_binary_support(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(
+            make_v1_event(path="/css/site.css", headers={"Accept-Encoding": ["gzip"]}),
+            None,
+        )
+
+        assert "Content-Encoding" not in response["multiValueHeaders"]
+        assert response["body"] == CSS
+
+    def test_prefix(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(
+            app, static_files=StaticFiles(static_dir, prefix="/static/")
+        )
+
+        response = handler(make_v2_event(path="/static/robots.txt"), None)
+        assert response["body"] == "User-agent: *\n"
+
+        response = handler(make_v2_event(path="/robots.txt"), None)
+        assert response["body"] == "From app"
+
+    def test_max_age(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(
+            app, static_files=StaticFiles(static_dir, max_age=3600)
+        )
+
+        response = handler(make_v2_event(path="/robots.txt"), None)
+
+        assert response["headers"]["cache-control"] == "public, max-age=3600"
+
+    def test_not_modified(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(
+            app, static_files=StaticFiles(static_dir, max_age=60)
+        )
+        etag = handler(make_v2_event(path="/robots.txt"), None)["headers"]["etag"]
+
+        response = handler(
+            make_v2_event(path="/robots.txt", headers={"If-None-Match": etag}),
+            None,
+        )
+
+        assert response == {
+            "statusCode": 304,
+            "cookies": [],
+            "headers": {"etag": etag, "cache-control": "public, max-age=60"},
+            "isBase64Encoded": True,
+            "body": "",
+        }
+
+    def test_head(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v2_event(method="HEAD", path="/robots.txt"), None)
+
+        assert response["statusCode"] == 200
+        assert response["headers"]["content-length"] == "14"
+        assert response["body"] == ""
+
+    def test_post_goes_to_app(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v2_event(method="POST", path="/robots.txt"), None)
+
+        assert response["body"] == "From app"
+
+    def test_missing_goes_to_app(self, static_dir: Path) -> None:
+        handler = make_lambda_handler(app, static_files=StaticFiles(static_dir))
+
+        response = handler(make_v2_event(path="/missing.txt"), None)
+
+        assert response["body"] == "From app"
+
+    def test_timing(self, static_dir: Path) -> None:
+        timings: list[Timing] = []
+        handler = make_lambda_handler(
+            app, static_files=StaticFiles(static_dir), on_timing=timings.append
+        )
+
+        handler(make_v2_event(path="/robots.txt"), None)
+        handler(make_v2_event(path="/missing.txt"), None)
+
+        assert timings[0].app_ns == 0
+        assert timings[0].consume_ns == 0
+        assert timings[0].response_body_bytes == 14
+        assert timings[1].response_body_bytes == 8